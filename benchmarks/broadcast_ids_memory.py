@@ -0,0 +1,110 @@
+"""
+Бенчмарк памяти broadcast_to_users: gather по корутине на получателя против
+потока ID через пул отправителей.
+
+Запуск (ни Redis, ни Postgres не нужны):
+    PYTHONPATH=bot python benchmarks/broadcast_ids_memory.py [размеры через запятую]
+
+Отправка мгновенная, ограничитель частоты отключён — замеряется только
+накладная память рассылки (пик tracemalloc). Прежней схеме передаётся
+готовый список ID и она создаёт корутину и словарь результата на каждого
+получателя; новой — генератор, как при чтении ID из файла.
+"""
+
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "bot"))
+
+os.environ.setdefault("BOT_TOKEN", "123456:BENCHMARK")
+os.environ.setdefault("PG_USER", "bench")
+os.environ.setdefault("PG_PASSWORD", "bench")
+os.environ.setdefault("PG_DATABASE", "bench")
+os.environ.setdefault("LOGGING_CHAT_ID", "0")
+
+from loguru import logger
+
+import managers  # noqa: F401 — как и в main.py, managers загружаются раньше services
+from services import broadcast_service
+from services.broadcast_service import BroadcastService
+
+
+WORKERS = 30
+
+
+class FakeTemplate:
+    def with_bot(self, bot):
+        return self
+
+    async def send(self, user_id: int) -> None:
+        await asyncio.sleep(0)
+
+
+class NoLimit:
+    """Ограничитель без ограничений: в замер попадает только сама рассылка"""
+
+    def limiter(self, max_rate: float) -> "NoLimit":
+        return self
+
+    async def acquire(self) -> None:
+        pass
+
+    def on_success(self) -> None:
+        pass
+
+    async def on_retry_after(self, seconds: float) -> None:
+        pass
+
+
+async def legacy_broadcast(users: int) -> int:
+    """Прежняя схема: список ID, корутина на каждого и gather всех сразу"""
+    user_ids = list(range(1, users + 1))
+    template = FakeTemplate()
+    semaphore = asyncio.Semaphore(WORKERS)
+    rate_limiter = NoLimit()
+
+    async def send_with_limits(user_id: int) -> dict:
+        async with semaphore:
+            return await BroadcastService._send_to_user(template, user_id, rate_limiter)
+
+    results = await asyncio.gather(*[send_with_limits(user_id) for user_id in user_ids])
+    return sum(result['status'] == 'success' for result in results)
+
+
+async def stream_broadcast(users: int) -> int:
+    stats = await BroadcastService.broadcast_to_users(
+        bot=None,
+        user_ids=(user_id for user_id in range(1, users + 1)),
+        template=FakeTemplate(),
+        concurrent_limit=WORKERS
+    )
+    return stats['success']
+
+
+async def measure(name: str, broadcast, users: int) -> None:
+    tracemalloc.start()
+    started_at = time.perf_counter()
+    sent = await broadcast(users)
+    elapsed = time.perf_counter() - started_at
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:>7} {users:>9}: {sent:>9} sent, peak {peak / 1024 / 1024:8.2f} MiB, {elapsed:6.2f}s (traced)")
+
+
+async def main(sizes: list[int]) -> None:
+    logger.remove()
+    broadcast_service.broadcast_limiter = NoLimit()
+
+    for users in sizes:
+        await measure("gather", legacy_broadcast, users)
+        await measure("stream", stream_broadcast, users)
+
+
+if __name__ == "__main__":
+    asyncio.run(main([
+        int(size) for size in (sys.argv[1] if len(sys.argv) > 1 else "10000,100000,300000").split(",")
+    ]))
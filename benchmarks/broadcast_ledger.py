@@ -0,0 +1,98 @@
+"""
+Бенчмарк журнала возобновляемой рассылки (DeliveryLedger).
+
+Запуск (ни Redis, ни Postgres не нужны):
+    PYTHONPATH=bot python benchmarks/broadcast_ledger.py [получателей] [отправителей]
+
+Получатели завершаются не по порядку: из окна в [отправителей] отправок
+случайно завершается любая, а 1% отправок висит в окне в 50 раз дольше
+(повтор после 429). Замеряется процессорное время begin/finish/drain на
+миллион получателей и размер того, что пишется в Redis: сколько id
+добавляет в ZSET один сброс раз в секунду при 30 msg/s и сколько их
+лежит в ZSET в худший момент.
+"""
+
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "bot"))
+
+os.environ.setdefault("BOT_TOKEN", "123456:BENCHMARK")
+os.environ.setdefault("PG_USER", "bench")
+os.environ.setdefault("PG_PASSWORD", "bench")
+os.environ.setdefault("PG_DATABASE", "bench")
+os.environ.setdefault("LOGGING_CHAT_ID", "0")
+
+from managers import DeliveryLedger
+
+
+RATE = 30
+SLOW_EVERY = 100
+SLOW_FACTOR = 50
+
+
+def schedule(users: int, workers: int) -> list[tuple[bool, int]]:
+    """Порядок событий (True — выбран, False — завершён) для заданного окна отправок"""
+    rng = random.Random(42)
+    events: list[tuple[bool, int]] = []
+    # [осталось шагов до завершения, user_id]
+    inflight: list[list[int]] = []
+    next_id = 1
+    while next_id <= users or inflight:
+        while len(inflight) < workers and next_id <= users:
+            events.append((True, next_id))
+            steps = workers * (SLOW_FACTOR if rng.randrange(SLOW_EVERY) == 0 else 1)
+            inflight.append([rng.randrange(1, steps + 1), next_id])
+            next_id += 1
+
+        index = min(range(len(inflight)), key=lambda i: inflight[i][0])
+        steps, user_id = inflight.pop(index)
+        for item in inflight:
+            item[0] -= steps
+        events.append((False, user_id))
+    return events
+
+
+def replay(events: list[tuple[bool, int]], zset: set[int] | None) -> tuple[DeliveryLedger, int, int]:
+    ledger = DeliveryLedger()
+    finished = max_flush = max_zset = 0
+    for started, user_id in events:
+        if started:
+            ledger.begin(user_id)
+            continue
+        ledger.finish(user_id, "success")
+        finished += 1
+        if finished % RATE == 0:
+            drained = ledger.drain()
+            if zset is not None:
+                # То же, что делает CHECKPOINT_SCRIPT: ZADD и ZREMRANGEBYSCORE
+                zset.update(drained)
+                zset.difference_update([user_id for user_id in zset if user_id <= ledger.checkpoint])
+                max_flush = max(max_flush, len(drained))
+                max_zset = max(max_zset, len(zset))
+    ledger.drain()
+    return ledger, max_flush, max_zset
+
+
+def run(users: int, workers: int) -> None:
+    events = schedule(users, workers)
+
+    started_at = time.process_time()
+    ledger, _, _ = replay(events, zset=None)
+    cpu = time.process_time() - started_at
+
+    _, max_flush, max_zset = replay(events, zset=set())
+
+    print(f"Recipients: {users}, workers: {workers}, checkpoint: {ledger.checkpoint}")
+    print(f"Ledger CPU: {cpu * 1_000_000 / users:.3f}s per 1M recipients")
+    print(f"Checkpoint every {RATE} sends: up to {max_flush} ids per call, ZSET up to {max_zset} ids")
+
+
+if __name__ == "__main__":
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    )
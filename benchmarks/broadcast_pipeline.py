@@ -0,0 +1,159 @@
+"""
+Бенчмарк рассылки: пачки с asyncio.gather против конвейера с пулом отправителей.
+
+Запуск (ни Redis, ни Postgres не нужны):
+    PYTHONPATH=bot python benchmarks/broadcast_pipeline.py [пользователей] [max_rate]
+
+Bot API имитируется задержкой с разбросом: обычно 30–80 мс, 2% запросов
+висят 1–2 с. Выборка страницы из БД — 20 мс. Старая схема ждёт самую
+медленную отправку пачки и только потом выбирает следующую страницу;
+конвейер ограничен лишь частотой max_rate.
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "bot"))
+
+os.environ.setdefault("BOT_TOKEN", "123456:BENCHMARK")
+os.environ.setdefault("PG_USER", "bench")
+os.environ.setdefault("PG_PASSWORD", "bench")
+os.environ.setdefault("PG_DATABASE", "bench")
+os.environ.setdefault("LOGGING_CHAT_ID", "0")
+
+from loguru import logger
+
+from managers import RateLimiter
+from services import broadcast_service
+from services.broadcast_service import BroadcastService
+
+
+BATCH_SIZE = 100
+WORKERS = 30
+PAGE_LATENCY = 0.02
+
+
+class FakeTemplate:
+    """Template, отправка которого имитирует Bot API с разбросом задержек"""
+
+    def __init__(self, seed: int = 42) -> None:
+        self.random = random.Random(seed)
+        self.sent = 0
+
+    def with_bot(self, bot):
+        return self
+
+    async def send(self, user_id: int) -> None:
+        if self.random.random() < 0.02:
+            delay = self.random.uniform(1.0, 2.0)
+        else:
+            delay = self.random.uniform(0.03, 0.08)
+        await asyncio.sleep(delay)
+        self.sent += 1
+
+
+class FakeUser:
+    __slots__ = ("id",)
+
+    def __init__(self, user_id: int) -> None:
+        self.id = user_id
+
+
+class FakeQuery:
+    """Минимум QuerySet для keyset-выборки: filter(id__gt).order_by().limit().all()"""
+
+    def __init__(self, total: int, last_id: int = 0, limit: int = BATCH_SIZE) -> None:
+        self.total = total
+        self.last_id = last_id
+        self.page_size = limit
+
+    def filter(self, id__gt: int = 0, **kwargs) -> "FakeQuery":
+        return FakeQuery(self.total, max(self.last_id, id__gt), self.page_size)
+
+    def order_by(self, *fields) -> "FakeQuery":
+        return self
+
+    def limit(self, limit: int) -> "FakeQuery":
+        return FakeQuery(self.total, self.last_id, limit)
+
+    async def count(self) -> int:
+        return self.total
+
+    async def all(self) -> list[FakeUser]:
+        await asyncio.sleep(PAGE_LATENCY)
+        end = min(self.total, self.last_id + self.page_size)
+        return [FakeUser(user_id) for user_id in range(self.last_id + 1, end + 1)]
+
+
+class FakeBotUser:
+    total = 0
+
+    @classmethod
+    def all(cls) -> FakeQuery:
+        return FakeQuery(cls.total)
+
+
+class LocalBudget:
+    """Локальный ограничитель вместо общего бюджета в Redis"""
+
+    def limiter(self, max_rate: float) -> RateLimiter:
+        return RateLimiter(max_rate=max_rate)
+
+
+async def legacy_broadcast(template: FakeTemplate, max_rate: int) -> None:
+    """Прежняя схема: страница -> gather всей пачки -> следующая страница"""
+    query = FakeBotUser.all().filter(is_banned=False)
+    semaphore = asyncio.Semaphore(WORKERS)
+    rate_limiter = RateLimiter(max_rate=max_rate)
+
+    async def send_with_limits(user):
+        async with semaphore:
+            return await BroadcastService._send_to_user(template, user.id, rate_limiter)
+
+    last_id = 0
+    while True:
+        users = await query.filter(id__gt=last_id).order_by('id').limit(BATCH_SIZE).all()
+        if not users:
+            break
+        await asyncio.gather(*[send_with_limits(user) for user in users], return_exceptions=True)
+        last_id = users[-1].id
+
+
+async def pipeline_broadcast(template: FakeTemplate, max_rate: int) -> None:
+    await BroadcastService.broadcast_template(
+        bot=None,
+        template=template,
+        batch_size=BATCH_SIZE,
+        concurrent_limit=WORKERS,
+        max_rate=max_rate
+    )
+
+
+async def run(name: str, broadcast, users: int, max_rate: int) -> None:
+    template = FakeTemplate()
+    started_at = time.perf_counter()
+    await broadcast(template, max_rate)
+    elapsed = time.perf_counter() - started_at
+    print(f"{name:>8}: {template.sent} sent in {elapsed:6.2f}s, {template.sent / elapsed:7.1f} msg/s")
+
+
+async def main(users: int, max_rate: int) -> None:
+    logger.remove()
+    FakeBotUser.total = users
+    broadcast_service.BotUser = FakeBotUser
+    broadcast_service.broadcast_limiter = LocalBudget()
+
+    print(f"Users: {users}, max_rate: {max_rate}/s, workers: {WORKERS}, page: {BATCH_SIZE}")
+    await run("batch", legacy_broadcast, users, max_rate)
+    await run("pipeline", pipeline_broadcast, users, max_rate)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 3000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    ))
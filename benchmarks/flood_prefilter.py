@@ -0,0 +1,116 @@
+"""
+Бенчмарк локального фильтра антифлуда: флуд одного пользователя.
+
+Запуск (нужен локальный redis-server, база очищается):
+    PYTHONPATH=bot python benchmarks/flood_prefilter.py [обновлений_в_секунду] [секунд] [redis_url]
+
+Один пользователь шлёт сообщения с заданной частотой через AntiFloodMiddleware.
+Без локального фильтра (ANTIFLOOD_LOCAL_SIZE=0) каждое обновление — это
+EVALSHA в Redis; с фильтром Redis спрашивается примерно раз в интервал лимита.
+Строки лога считаются отдельным sink'ом loguru.
+"""
+
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "bot"))
+
+os.environ.setdefault("BOT_TOKEN", "123456:BENCHMARK")
+os.environ.setdefault("PG_USER", "bench")
+os.environ.setdefault("PG_PASSWORD", "bench")
+os.environ.setdefault("PG_DATABASE", "bench")
+os.environ.setdefault("LOGGING_CHAT_ID", "0")
+
+from aiogram.types import Update
+from loguru import logger
+from redis.asyncio import Redis
+
+from managers import FloodManager
+from middlewares import AntiFloodMiddleware
+
+
+LIMITS = {"message": (3.0, 3), "callback": (3.0, 1), "chat": (10.0, 20)}
+BATCH = 100
+
+
+def make_update(update_id: int) -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 1700000000,
+            "from": {"id": 1, "is_bot": False, "first_name": "Flooder"},
+            "chat": {"id": 1, "type": "private"},
+            "text": "spam",
+        },
+    })
+
+
+class CountingRedis(Redis):
+    """Redis-клиент, считающий выполненные команды"""
+    commands = 0
+
+    async def execute_command(self, *args, **options):
+        CountingRedis.commands += 1
+        return await super().execute_command(*args, **options)
+
+
+async def run(name: str, redis: Redis, local_size: int, rate: int, seconds: float) -> None:
+    await redis.flushdb()
+    flood = FloodManager(redis=redis, limits=LIMITS, local_size=local_size)
+    middleware = AntiFloodMiddleware(flood=flood, log_interval=1.0)
+    passed = 0
+
+    async def handler(event, data):
+        nonlocal passed
+        passed += 1
+
+    log_lines = 0
+
+    def sink(message) -> None:
+        nonlocal log_lines
+        log_lines += 1
+
+    sink_id = logger.add(sink, level="WARNING")
+    CountingRedis.commands = 0
+    update = make_update(1)
+    sent = 0
+    started_at = time.perf_counter()
+    while (elapsed := time.perf_counter() - started_at) < seconds:
+        # Держим заданную частоту пачками по BATCH обновлений
+        if sent > elapsed * rate:
+            await asyncio.sleep(BATCH / rate)
+            continue
+        for _ in range(BATCH):
+            await middleware(handler, update, {})
+        sent += BATCH
+    elapsed = time.perf_counter() - started_at
+    logger.remove(sink_id)
+
+    print(
+        f"{name:>8}: sent {sent / elapsed:8.0f} updates/s, passed {passed}, "
+        f"{CountingRedis.commands / elapsed:8.1f} Redis calls/s, {log_lines / elapsed:6.1f} log lines/s"
+    )
+
+
+async def main(rate: int, seconds: float, redis_url: str) -> None:
+    logger.remove()
+    redis = CountingRedis.from_url(redis_url)
+
+    print(f"Single user flood: {rate} updates/s for {seconds:.0f}s, redis: {redis_url}")
+    await run("redis", redis, 0, rate, seconds)
+    await run("local", redis, 10_000, rate, seconds)
+
+    await redis.flushdb()
+    await redis.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 10_000,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 5.0,
+        sys.argv[3] if len(sys.argv) > 3 else "redis://localhost:6379/15"
+    ))
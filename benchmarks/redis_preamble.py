@@ -0,0 +1,150 @@
+"""
+Бенчмарк Redis-преамбулы: отдельные запросы middleware против одного EVALSHA.
+
+Запуск (нужен локальный redis-server, база очищается):
+    PYTHONPATH=bot python benchmarks/redis_preamble.py [количество_обновлений] [redis_url]
+
+Старая цепочка: скрипт антифлуда (GCRA), GET локали, GET снимка пользователя.
+Новая: PreambleMiddleware, затем те же AntiFloodMiddleware и чтения,
+которые берут данные из data["preamble"] и LRU. Чтение состояния FSM
+одинаково в обоих случаях и не учитывается.
+"""
+
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "bot"))
+
+os.environ.setdefault("BOT_TOKEN", "123456:BENCHMARK")
+os.environ.setdefault("PG_USER", "bench")
+os.environ.setdefault("PG_PASSWORD", "bench")
+os.environ.setdefault("PG_DATABASE", "bench")
+os.environ.setdefault("LOGGING_CHAT_ID", "0")
+
+from aiogram.types import Update
+from loguru import logger
+from redis.asyncio import Redis
+from tortoise import Tortoise
+
+from managers import FloodManager, RedisManager
+from managers.user_cache_manager import CachedUser, UserCacheManager, _encoder
+from middlewares import AntiFloodMiddleware, PreambleMiddleware
+
+
+USERS = 1000
+
+# Лимиты с запасом: бенчмарк измеряет запросы, а не срабатывания антифлуда
+LIMITS = {"message": (1000.0, 1000), "callback": (1000.0, 1000), "chat": (1000.0, 1000)}
+
+
+def make_update(update_id: int) -> Update:
+    user_id = update_id % USERS + 1
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 1700000000,
+            "from": {"id": user_id, "is_bot": False, "first_name": "Bench"},
+            "chat": {"id": user_id, "type": "private"},
+            "text": "hello",
+        },
+    })
+
+
+class CountingRedis(Redis):
+    """Redis-клиент, считающий выполненные команды (= round trips без пайплайнов)"""
+    commands = 0
+
+    async def execute_command(self, *args, **options):
+        CountingRedis.commands += 1
+        return await super().execute_command(*args, **options)
+
+
+async def seed(redis: Redis) -> None:
+    now = datetime.now(timezone.utc)
+    pipe = redis.pipeline(transaction=False)
+    for user_id in range(1, USERS + 1):
+        pipe.set(RedisManager.make_key("user", user_id, "locale"), "ru")
+        pipe.set(UserCacheManager.key(user_id), _encoder.encode(CachedUser(
+            username=None, full_name="Bench", language_code="ru",
+            is_banned=False, created_at=now, updated_at=now
+        )))
+    await pipe.execute()
+
+
+async def legacy_chain(redis: Redis, flood: FloodManager, update: Update) -> None:
+    user_id = update.message.from_user.id
+
+    async def after_flood(event, data):
+        await RedisManager.get_string(redis, RedisManager.make_key("user", user_id, "locale"))
+        await redis.get(UserCacheManager.key(user_id))
+
+    await AntiFloodMiddleware(flood=flood)(after_flood, update, {})
+
+
+async def preamble_chain(preamble: PreambleMiddleware, update: Update) -> None:
+    antiflood = AntiFloodMiddleware(flood=preamble.flood)
+
+    async def after_preamble(event, data):
+        async def handler(event, data):
+            # Локаль и снимок уже в data["preamble"]
+            assert data["preamble"].locale == "ru"
+
+        await antiflood(handler, event, data)
+
+    await preamble(after_preamble, update, {"event_from_user": update.message.from_user})
+
+
+async def run(name: str, chain, updates: int, concurrency: int) -> None:
+    queue = [make_update(update_id) for update_id in range(updates)]
+    latencies: list[float] = []
+
+    async def worker(batch: list[Update]) -> None:
+        for update in batch:
+            started_at = time.perf_counter()
+            await chain(update)
+            latencies.append(time.perf_counter() - started_at)
+
+    CountingRedis.commands = 0
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker(queue[idx::concurrency]) for idx in range(concurrency)))
+    elapsed = time.perf_counter() - started_at
+
+    latencies.sort()
+    print(
+        f"{name:>9} x{concurrency:<3}: {updates / elapsed:8.0f} updates/s, "
+        f"p50 {latencies[len(latencies) // 2] * 1e3:5.2f} ms, "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1e3:5.2f} ms, "
+        f"{CountingRedis.commands / updates:.1f} Redis calls/update"
+    )
+
+
+async def main(updates: int, redis_url: str) -> None:
+    logger.remove()
+    # Модели нужны, чтобы восстанавливать BotUser из снимка; в БД запросов нет
+    await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["models"]})
+    redis = CountingRedis.from_url(redis_url)
+    await redis.flushdb()
+    await seed(redis)
+    flood = FloodManager(redis=redis, limits=LIMITS)
+    preamble = PreambleMiddleware(redis=redis, flood=flood)
+
+    print(f"Updates per scenario: {updates}, redis: {redis_url}")
+    for concurrency in (1, 50):
+        await run("legacy", lambda update: legacy_chain(redis, flood, update), updates, concurrency)
+        await run("preamble", lambda update: preamble_chain(preamble, update), updates, concurrency)
+
+    await redis.flushdb()
+    await redis.aclose()
+    await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 5000,
+        sys.argv[2] if len(sys.argv) > 2 else "redis://localhost:6379/15"
+    ))
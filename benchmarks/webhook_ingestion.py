@@ -0,0 +1,121 @@
+"""
+Бенчмарк приёма webhook: старый FastAPI-эндпоинт против голого Starlette-роута с msgspec.
+
+Запуск:
+    PYTHONPATH=bot python benchmarks/webhook_ingestion.py [количество_запросов]
+
+Оба эндпоинта прогоняются через ASGI in-process (без сети) и кормят пустой
+Dispatcher, поэтому разница отражает только стоимость разбора и валидации.
+"""
+
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "bot"))
+
+os.environ.setdefault("BOT_TOKEN", "123456:BENCHMARK")
+os.environ.setdefault("PG_USER", "bench")
+os.environ.setdefault("PG_PASSWORD", "bench")
+os.environ.setdefault("PG_DATABASE", "bench")
+
+import httpx
+import msgspec
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from fastapi import FastAPI, Response
+from starlette.requests import Request
+
+from utils import decode_update, build_update
+
+
+SAMPLE_UPDATE = {
+    "update_id": 100500,
+    "message": {
+        "message_id": 42,
+        "date": 1700000000,
+        "from": {
+            "id": 123456789,
+            "is_bot": False,
+            "first_name": "Bench",
+            "last_name": "User",
+            "username": "bench_user",
+            "language_code": "ru",
+        },
+        "chat": {
+            "id": 123456789,
+            "type": "private",
+            "first_name": "Bench",
+            "username": "bench_user",
+        },
+        "text": "/start hello",
+        "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+    },
+}
+
+
+def build_legacy_app(bot: Bot, dispatcher: Dispatcher) -> FastAPI:
+    """Эндпоинт в том виде, в каком он был до перехода на msgspec"""
+    app = FastAPI()
+
+    @app.post("/webhook")
+    async def webhook_endpoint(update: dict):
+        telegram_update = Update(**update)
+        await dispatcher.feed_webhook_update(bot, telegram_update)
+        return Response(status_code=200)
+
+    return app
+
+
+def build_fast_app(bot: Bot, dispatcher: Dispatcher) -> FastAPI:
+    """Голый Starlette-роут с однократным декодированием"""
+    app = FastAPI()
+
+    async def webhook_endpoint(request: Request) -> Response:
+        raw_update = decode_update(await request.body())
+        await dispatcher.feed_webhook_update(bot, build_update(bot, raw_update))
+        return Response(status_code=200)
+
+    app.add_route("/webhook", webhook_endpoint, methods=["POST"])
+    return app
+
+
+async def run(app: FastAPI, body: bytes, requests: int) -> tuple[float, float]:
+    transport = httpx.ASGITransport(app=app)
+    headers = {"content-type": "application/json"}
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Прогрев
+        for _ in range(100):
+            await client.post("/webhook", content=body, headers=headers)
+
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        for _ in range(requests):
+            response = await client.post("/webhook", content=body, headers=headers)
+            assert response.status_code == 200
+        cpu = time.process_time() - cpu_start
+        wall = time.perf_counter() - wall_start
+
+    return wall, cpu
+
+
+async def main(requests: int) -> None:
+    bot = Bot(token=os.environ["BOT_TOKEN"])
+    body = msgspec.json.encode(SAMPLE_UPDATE)
+
+    print(f"Requests per endpoint: {requests}")
+    for name, factory in (("legacy", build_legacy_app), ("msgspec", build_fast_app)):
+        wall, cpu = await run(factory(bot, Dispatcher()), body, requests)
+        print(
+            f"{name:>8}: {requests / wall:8.0f} req/s, "
+            f"{cpu / requests * 1e6:7.1f} µs CPU/update"
+        )
+
+    await bot.session.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
@@ -0,0 +1,153 @@
+"""
+Бенчмарк ответа методом API в теле webhook против обычной отправки.
+
+Запуск:
+    PYTHONPATH=bot python benchmarks/webhook_reply.py [количество_обновлений] [задержка_мс]
+
+Поднимает фейковый Bot API на aiohttp с искусственной задержкой и считает
+исходящие запросы и время обработки обновления для /start (одно сообщение)
+и нажатия кнопки меню (редактирование + ответ на callback).
+"""
+
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "bot"))
+
+os.environ.setdefault("BOT_TOKEN", "123456:BENCHMARK")
+os.environ.setdefault("PG_USER", "bench")
+os.environ.setdefault("PG_PASSWORD", "bench")
+os.environ.setdefault("PG_DATABASE", "bench")
+os.environ.setdefault("LOGGING_CHAT_ID", "0")
+
+from aiogram import Bot, Dispatcher, F
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.filters import CommandStart
+from aiogram.types import CallbackQuery, Message
+from aiohttp import web
+
+from middlewares import WebhookReplyMiddleware
+from routes import webhook as webhook_module
+from utils import Template, build_update
+
+
+class FakeBotAPI:
+    """Фейковый Bot API: отвечает успехом с задержкой и считает запросы"""
+
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.requests = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        method = request.match_info["method"].lower()
+        if method in ("sendmessage", "editmessagetext"):
+            result = {
+                "message_id": 1,
+                "date": int(time.time()),
+                "chat": {"id": 42, "type": "private"},
+                "text": "ok",
+            }
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+
+def make_update(update_id: int, kind: str) -> dict:
+    user = {"id": 42, "is_bot": False, "first_name": "Bench"}
+    chat = {"id": 42, "type": "private"}
+    if kind == "command":
+        return {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": 1700000000,
+                "from": user,
+                "chat": chat,
+                "text": "/start",
+                "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+            },
+        }
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": user,
+            "chat_instance": "1",
+            "data": "menu",
+            "message": {
+                "message_id": 1,
+                "date": 1700000000,
+                "chat": chat,
+                "text": "menu",
+            },
+        },
+    }
+
+
+def build_dispatcher() -> Dispatcher:
+    dispatcher = Dispatcher()
+
+    @dispatcher.message(CommandStart())
+    async def start(message: Message) -> None:
+        await message.answer("Привет!")
+
+    @dispatcher.callback_query(F.data == "menu")
+    async def menu(callback: CallbackQuery) -> None:
+        await Template(text="Меню").edit(callback)
+
+    return dispatcher
+
+
+async def run(api: FakeBotAPI, base_url: str, kind: str, updates: int, reply: bool) -> tuple[float, float]:
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=AiohttpSession(api=TelegramAPIServer.from_base(base_url)))
+    if reply:
+        bot.session.middleware(WebhookReplyMiddleware())
+
+    webhook_module.bot = bot
+    webhook_module.dispatcher = build_dispatcher()
+
+    api.requests = 0
+    started_at = time.perf_counter()
+    for update_id in range(updates):
+        await webhook_module.feed_with_reply(build_update(bot, make_update(update_id, kind)))
+    elapsed = time.perf_counter() - started_at
+
+    await bot.session.close()
+    return api.requests / updates, elapsed / updates * 1000
+
+
+async def main(updates: int, latency_ms: float) -> None:
+    api = FakeBotAPI(latency_ms / 1000)
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", api.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    base_url = f"http://127.0.0.1:{port}"
+
+    print(f"Updates per scenario: {updates}, fake API latency: {latency_ms:.0f} ms")
+    for kind in ("command", "callback"):
+        for reply in (False, True):
+            outbound, latency = await run(api, base_url, kind, updates, reply)
+            mode = "webhook reply" if reply else "plain"
+            print(
+                f"{kind:>8} / {mode:<13}: {outbound:.2f} outbound requests/update, "
+                f"{latency:6.1f} ms handling/update"
+            )
+
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 20
+    ))
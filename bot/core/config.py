@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic import Field, SecretStr
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -19,9 +21,55 @@ class Settings(BaseSettings):
     # App Port
     app_port: int = Field(default=5000)
 
+    # Количество процессов uvicorn; set_webhook и возобновление рассылок выполняет
+    # только процесс-лидер, остальные пробуют занять его место раз в треть TTL лока
+    app_workers: int = Field(default=1)
+    leader_lock_ttl_ms: int = Field(default=30_000)
+
     # Webhook settings
     webhook_url: str | None = None
     
+    # Update processing mode:
+    # sync  - webhook ждёт завершения хендлеров
+    # queue - webhook сразу отвечает 200, обновления обрабатывает пул воркеров
+    # stream - webhook пишет обновление в Redis Stream, обрабатывают воркеры любых нод
+    update_mode: Literal["sync", "queue", "stream"] = Field(default="sync")
+    update_drain_timeout: float = Field(default=10.0)
+
+    # Отвечать первым вызовом Bot API прямо в теле webhook (только update_mode=sync)
+    webhook_reply: bool = Field(default=False)
+
+    # Дорожки обработки (update_mode=queue/stream): порядок внутри чата, параллельность между чатами
+    update_lanes: int = Field(default=16)
+    update_lane_size: int = Field(default=100)
+
+    # Отбрасывание низкоприоритетных обновлений при перегрузке:
+    # мягкий порог — chat_member и прочие, жёсткий — ещё и сообщения.
+    # Глубина — обновления в дорожках (в режиме sync — в обработке), латентность — в секундах.
+    # Выключено по умолчанию: в режиме sync глубина мала, и порог латентности
+    # срабатывает уже при паре медленных обновлений
+    admission_enabled: bool = Field(default=False)
+    admission_soft_depth: int = Field(default=800)
+    admission_hard_depth: int = Field(default=1400)
+    admission_soft_latency: float = Field(default=1.0)
+    admission_hard_latency: float = Field(default=3.0)
+
+    # Дедупликация повторных доставок update_id
+    update_dedup_enabled: bool = Field(default=True)
+    update_dedup_redis: bool = Field(default=True)
+    update_dedup_window: int = Field(default=10_000)
+    update_dedup_ttl: int = Field(default=3600)
+
+    # Redis Streams ingestion (update_mode=stream)
+    update_stream_group: str = Field(default="bot-workers")
+    update_stream_consumers: int = Field(default=1)
+    update_stream_maxlen: int = Field(default=100_000)
+    update_stream_batch_size: int = Field(default=16)
+    update_stream_block_ms: int = Field(default=5000)
+    update_stream_claim_idle_ms: int = Field(default=60_000)
+    update_stream_max_deliveries: int = Field(default=5)
+    update_stream_max_inflight: int = Field(default=256)
+
     # Default user language
     default_language: str = Field(default="ru")
 
@@ -45,12 +93,69 @@ class Settings(BaseSettings):
     
     redis_cache_ttl: int = Field(default=7)
 
+    # Пул соединений Redis. По умолчанию — по соединению на дорожку и запас
+    # на webhook, фоновые задачи и рассылки. Когда пул занят, запрос ждёт
+    # свободного соединения до redis_pool_timeout секунд, а не падает
+    redis_max_connections: int | None = Field(default=None)
+    redis_pool_timeout: float = Field(default=10.0)
+
+    # Кэш регистрации пользователей: LRU в процессе (размер, TTL в секундах) + снимок в Redis
+    user_cache_size: int = Field(default=10_000)
+    user_cache_local_ttl: float = Field(default=60.0)
+    user_cache_ttl: int = Field(default=86400)
+
+    # Антифлуд (GCRA): действий в секунду и burst для сообщений и нажатий пользователя
+    # и общий лимит группы
+    antiflood_message_rate: float = Field(default=3.0)
+    antiflood_message_burst: int = Field(default=3)
+    antiflood_callback_rate: float = Field(default=3.0)
+    antiflood_callback_burst: int = Field(default=1)
+    antiflood_chat_rate: float = Field(default=10.0)
+    antiflood_chat_burst: int = Field(default=20)
+    # Локальный фильтр флуда перед Redis (ключей в памяти) и интервал сводок в логах
+    antiflood_local_size: int = Field(default=10_000)
+    antiflood_log_interval: float = Field(default=60.0)
+
+    # Один EVALSHA на обновление вместо отдельных запросов антифлуда, локали и кэша пользователя
+    redis_preamble: bool = Field(default=True)
+
+    # L1-кэш локалей в памяти процесса (размер, TTL в секундах), инвалидация через pub/sub
+    locale_cache_size: int = Field(default=10_000)
+    locale_cache_ttl: float = Field(default=300.0)
+
+    # Write-behind запись пользователей: пачкой раз в interval секунд или по batch_size строк
+    user_write_behind: bool = Field(default=False)
+    user_write_interval: float = Field(default=0.3)
+    user_write_batch_size: int = Field(default=500)
+    user_write_max_pending: int = Field(default=5000)
+
+    # Пакетная запись is_banned (блокировки бота из рассылок и my_chat_member)
+    ban_write_interval: float = Field(default=1.0)
+    ban_write_batch_size: int = Field(default=1000)
+
+    # Общий бюджет рассылок в Redis: сколько токенов процесс берёт за один запрос
+    broadcast_lease_size: int = Field(default=5)
+    # Реестр file_id загруженных медиа (Template) и служебный чат, куда медиа
+    # рассылки загружаются до первого получателя (None — без предзагрузки)
+    media_registry: bool = Field(default=True)
+    media_registry_local_size: int = Field(default=1000)
+    media_upload_chat_id: int | None = Field(default=None)
+    # Возобновляемые рассылки: как часто (в секундах) прогресс сохраняется в Redis
+    broadcast_checkpoint_interval: float = Field(default=1.0)
+    # Прогресс рассылок: публикация в Redis (секунды), чат для сообщения о статусе
+    # и минимальный интервал между его правками
+    broadcast_progress_interval: float = Field(default=1.0)
+    broadcast_status_chat_id: int | None = Field(default=None)
+    broadcast_status_interval: float = Field(default=5.0)
+
     logging_enabled: bool = Field(default=False)
     logging_chat_id: int = None
     errors_thread_id: int = Field(default=1)
 
     # Admin settings
     admin_ids: list[int] = Field(default_factory=list)
+    # Токен служебных HTTP-роутов (заголовок X-Admin-Token); не задан — роуты отключены
+    admin_api_token: SecretStr | None = None
 
     @property
     def tortoise_url(self) -> str:
@@ -61,6 +166,11 @@ class Settings(BaseSettings):
             f"{self.pg_host}:{self.pg_port}/{self.pg_database}"
         )
 
+    @property
+    def redis_pool_size(self) -> int:
+        """Размер общего пула соединений Redis"""
+        return self.redis_max_connections or self.update_lanes + 32
+
     @property
     def redis_url(self) -> str:
         """Построить Redis DSN"""
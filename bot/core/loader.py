@@ -6,6 +6,7 @@ from aiogram.fsm.storage.base import DefaultKeyBuilder
 from aiogram.fsm.storage.redis import RedisStorage
 from fastapi import FastAPI
 import msgspec
+from redis.asyncio import BlockingConnectionPool, Redis
 
 from .config import settings
 
@@ -26,15 +27,30 @@ TORTOISE_CONFIG = {
 
 bot = Bot(token=settings.bot_token.get_secret_value(), default=DefaultBotProperties(parse_mode=ParseMode.HTML))
 
-storage = RedisStorage.from_url(
-    url=settings.redis_url,
+
+
+def create_redis(max_connections: int) -> Redis:
+    """
+    Клиент Redis со своим пулом соединений.
+
+    Пул блокирующий: при исчерпании соединений запрос ждёт освобождения
+    (до REDIS_POOL_TIMEOUT), а не падает с MaxConnectionsError. Отдельные
+    клиенты нужны для долгих команд — блокирующего XREADGROUP и pub/sub
+    подписок, — чтобы они не занимали соединения общего пула.
+    """
+    return Redis(connection_pool=BlockingConnectionPool.from_url(
+        settings.redis_url,
+        max_connections=max_connections,
+        timeout=settings.redis_pool_timeout,
+        decode_responses=False
+    ))
+
+
+storage = RedisStorage(
+    redis=create_redis(settings.redis_pool_size),
     key_builder=DefaultKeyBuilder(with_bot_id=True, with_destiny=True),
     json_loads=msgspec.json.decode,
-    json_dumps=partial(lambda obj: str(msgspec.json.encode(obj), encoding="utf-8")),
-    connection_kwargs={
-        "max_connections": 10,
-        "decode_responses": False,
-    }
+    json_dumps=partial(lambda obj: str(msgspec.json.encode(obj), encoding="utf-8"))
 )
 
 dispatcher = Dispatcher(storage=storage,
@@ -0,0 +1,143 @@
+"""Лёгкие in-process метрики без внешних зависимостей"""
+
+from bisect import bisect_left
+from typing import Any, Callable
+
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter:
+    """Монотонно растущий счётчик"""
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        self.value += amount
+
+    def collect(self) -> int:
+        return self.value
+
+
+class Gauge:
+    """Мгновенное значение: задаётся вручную или вычисляется функцией при сборе"""
+    __slots__ = ("value", "func")
+
+    def __init__(self, func: Callable[[], float] | None = None) -> None:
+        self.value: float = 0
+        self.func = func
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+    def collect(self) -> float:
+        return self.func() if self.func else self.value
+
+
+class Histogram:
+    """Гистограмма с фиксированными бакетами (значения в секундах или штуках)"""
+    __slots__ = ("buckets", "counts", "count", "sum", "max")
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля по верхней границе бакета"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for idx, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.buckets[idx] if idx < len(self.buckets) else self.max
+        return self.max
+
+    def collect(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "avg": round(self.sum / self.count, 6) if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "max": round(self.max, 6),
+        }
+
+
+class MetricsRegistry:
+    """
+    Реестр метрик процесса.
+
+    Метрика с одинаковым именем и метками создаётся один раз,
+    повторные вызовы возвращают тот же объект.
+
+    Примеры использования:
+        metrics.counter("updates_total", type="message").inc()
+        metrics.histogram("handler_seconds").observe(0.012)
+        metrics.gauge("queue_depth", func=queue.qsize)
+    """
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Counter | Gauge | Histogram] = {}
+
+    @staticmethod
+    def _make_name(name: str, labels: dict[str, Any]) -> str:
+        if not labels:
+            return name
+        rendered = ",".join(f"{key}={value}" for key, value in sorted(labels.items()))
+        return f"{name}{{{rendered}}}"
+
+    def counter(self, name: str, **labels: Any) -> Counter:
+        key = self._make_name(name, labels)
+        metric = self._metrics.get(key)
+        if metric is None:
+            metric = self._metrics[key] = Counter()
+        return metric
+
+    def gauge(self, name: str, func: Callable[[], float] | None = None, **labels: Any) -> Gauge:
+        key = self._make_name(name, labels)
+        metric = self._metrics.get(key)
+        if metric is None:
+            metric = self._metrics[key] = Gauge(func)
+        elif func is not None:
+            metric.func = func
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+        **labels: Any
+    ) -> Histogram:
+        key = self._make_name(name, labels)
+        metric = self._metrics.get(key)
+        if metric is None:
+            metric = self._metrics[key] = Histogram(buckets)
+        return metric
+
+    def snapshot(self) -> dict[str, Any]:
+        """Текущие значения всех метрик"""
+        return {name: metric.collect() for name, metric in sorted(self._metrics.items())}
+
+
+# Синглтон метрик
+metrics = MetricsRegistry()
@@ -60,4 +60,4 @@ chat-stats =
     🆔 Chat ID: <code>{ $chat_id }</code>
 
 # Flood
-antiflood-warning = ⚠️ Wait a bit before pressing it again.
\ No newline at end of file
+antiflood-warning = ⚠️ Wait { $seconds } s before pressing it again.
\ No newline at end of file
@@ -60,4 +60,4 @@ chat-stats =
     🆔 ID чата: <code>{ $chat_id }</code>
 
 # Флуд
-antiflood-warning = ⚠️ Подождите немного, перед повторным нажатием
\ No newline at end of file
+antiflood-warning = ⚠️ Подождите { $seconds } сек. перед повторным нажатием
\ No newline at end of file
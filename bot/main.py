@@ -1,14 +1,26 @@
+from contextlib import asynccontextmanager
+
 from aiogram.types import WebhookInfo
+from fastapi import FastAPI
 import uvicorn
 from loguru import logger
 
-from managers import DatabaseManager
-from middlewares import AntiFloodMiddleware, i18n_middleware, UserRegistrationMiddleware
-from routes import webhook_router
+from managers import (
+    DatabaseManager, ban_writer, broadcast_jobs, leader, media_registry, update_queue, update_stream, user_writer,
+    locale_cache
+)
+from middlewares import (
+    AntiFloodMiddleware, i18n_middleware, MiddlewarePipeline, PreambleMiddleware,
+    UpdateTypeMiddleware, UserRegistrationMiddleware, WebhookReplyErrorsMiddleware,
+    WebhookReplyMiddleware
+)
+from routes import webhook_router, metrics_router, broadcasts_router
+from services import BroadcastService
 from core import setup_logging
 from core.config import settings
 from core.loader import dispatcher, app, bot
 from handlers import routers
+from utils import Template
 
 
 async def set_webhook():
@@ -16,60 +28,143 @@ async def set_webhook():
     webhook_url = settings.webhook_url.rstrip("/")
     webhook_path = f"{webhook_url}/{settings.bot_token.get_secret_value()}"
     
+    # Типы обновлений без хендлеров Telegram не будет присылать вовсе
+    allowed_updates = dispatcher.resolve_used_update_types()
+
     old_webhook: WebhookInfo = await bot.get_webhook_info()
     
-    if old_webhook.url == webhook_path:
+    if old_webhook.url == webhook_path and set(old_webhook.allowed_updates or []) == set(allowed_updates):
         logger.info("The current webhook is already setup!")
         return
     
-    await bot.set_webhook(webhook_path)
+    await bot.set_webhook(webhook_path, allowed_updates=allowed_updates)
     logger.info(f"Webhook setup: {webhook_url}/{settings.bot_token.get_secret_value()[0:6]}...")
     
 
 async def register_middlewares():
-    # Регистрируем middleware на уровне диспетчера
-    user_middleware = UserRegistrationMiddleware()
-    dispatcher.update.outer_middleware(user_middleware)
-    logger.debug("UserRegistration middleware registered")
-    
-    # Регистрируем AntiFloodMiddleware для предотвращения флуда
-    flood_middleware = AntiFloodMiddleware(redis=dispatcher.storage.redis, min_interval=0.3) # 0.3 секунды между действиями
-    dispatcher.update.outer_middleware(flood_middleware)
-    logger.debug("AntiFloodMiddleware middleware registered")
+    # Outer middleware выполняются по стоимости: фильтры без I/O, затем Redis,
+    # затем Postgres — отброшенное обновление не доходит до БД
+    pipeline = MiddlewarePipeline()
+
+    pipeline.add(UpdateTypeMiddleware(allowed=dispatcher.resolve_used_update_types()))
 
-    # Регистрируем i18n middleware
+    # i18n регистрирует хуки диспетчера сам, а место в цепочке задаёт pipeline.
+    # Контекст ленивый (без запросов), поэтому доступен уже антифлуду
     i18n_middleware.setup(dispatcher=dispatcher)
+    dispatcher.update.outer_middleware.unregister(i18n_middleware)
     await i18n_middleware.core.startup()
-    logger.debug("i18n middleware registered")
+    pipeline.add(i18n_middleware, name="I18nMiddleware")
+
+    # Общий Redis-запрос для антифлуда, локали и кэша пользователя — первым из Redis
+    if settings.redis_preamble:
+        pipeline.add(PreambleMiddleware(redis=dispatcher.storage.redis))
+
+    # AntiFloodMiddleware для предотвращения флуда
+    pipeline.add(AntiFloodMiddleware(log_interval=settings.antiflood_log_interval))
+
+    # Регистрация пользователя — единственное звено с запросами к Postgres
+    pipeline.add(UserRegistrationMiddleware())
+
+    pipeline.setup(dispatcher)
+
+    # Ответ первым вызовом Bot API в теле webhook возможен только при синхронной обработке
+    if settings.webhook_reply and settings.update_mode == "sync":
+        bot.session.middleware(WebhookReplyMiddleware())
+        # Отправки обработчиков ошибок не должны становиться ответом на webhook
+        dispatcher.errors.outer_middleware(WebhookReplyErrorsMiddleware())
+        logger.debug("WebhookReply middleware registered")
+
+
+async def start_services():
+    """
+    Общий запуск webhook-процесса и воркера стрима (bot/worker.py):
+    middleware, БД и фоновые менеджеры, от которых зависят хендлеры.
+    """
+    await register_middlewares()
+    await DatabaseManager.init()
+    # Файлы и URL из Template загружаются один раз, дальше отправляются по file_id
+    if settings.media_registry:
+        Template.use_media_registry(media_registry)
+    await locale_cache.start()
+    if settings.user_write_behind:
+        await user_writer.start()
+    await ban_writer.start()
+
+
+async def stop_services():
+    """Общая остановка webhook-процесса и воркера стрима"""
+    # Сначала дорабатываем принятые обновления, пока живы сессия и БД
+    await update_stream.stop(timeout=settings.update_drain_timeout)
+    await update_queue.stop(timeout=settings.update_drain_timeout)
+    # Прогресс рассылок сохраняется, продолжит их следующий запуск
+    await broadcast_jobs.stop()
+    # Записываем накопленных пользователей и блокировки до закрытия БД
+    await user_writer.stop()
+    await ban_writer.stop()
+    await locale_cache.stop()
+    await leader.release()
+    await bot.session.close()
+    await DatabaseManager.close()
+
+
+async def on_elected():
+    """Работа лидера: webhook и рассылки, прерванные перезапуском или падением"""
+    await set_webhook()
+    await BroadcastService.resume_jobs(bot)
 
 
 async def on_startup():    
     app.include_router(webhook_router)
+    app.include_router(metrics_router)
+    app.include_router(broadcasts_router)
     
     dispatcher.include_routers(*routers)
     
-    await set_webhook()
-    await register_middlewares()
-    await DatabaseManager.init()
+    await start_services()
+    # При нескольких процессах работу лидера выполняет один процесс, а если
+    # лидер умрёт — тот, кто займёт его место
+    await leader.acquire(on_elected=on_elected)
+
+    if settings.update_mode in ("queue", "stream"):
+        await update_queue.start()
+    if settings.update_mode == "stream":
+        await update_stream.start()
 
 
 async def on_shutdown():
     """Действия при остановке"""
-    await bot.session.close()
-    await DatabaseManager.close()
+    await stop_services()
     logger.info("Bot stopped")
 
 
-if __name__ == "__main__":
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    # Выполняется в каждом процессе uvicorn: сессия бота, пулы Redis и БД
+    # создаются заново в каждом воркере и не разделяются между процессами
     setup_logging()
-    
-    app.add_event_handler("startup", on_startup)
-    app.add_event_handler("shutdown", on_shutdown)
+    await on_startup()
+    yield
+    await on_shutdown()
 
+
+# Присваивание, а не регистрация обработчиков: при APP_WORKERS > 1 воркеры
+# импортируют модуль повторно, и хуки не должны задваиваться
+app.router.lifespan_context = lifespan
+
+
+if __name__ == "__main__":
+    if settings.update_mode == "queue" and settings.app_workers > 1:
+        # Дорожки у каждого процесса свои, а uvicorn раскидывает запросы одного чата по воркерам
+        logger.warning(
+            "UPDATE_MODE=queue keeps per-chat order only within one process; "
+            f"with APP_WORKERS={settings.app_workers} use UPDATE_MODE=stream"
+        )
     uvicorn.run(
-        app,
+        # Несколько воркеров uvicorn запускает только по строке импорта
+        app if settings.app_workers == 1 else "main:app",
         host="0.0.0.0",
         port=settings.app_port,
+        workers=settings.app_workers,
         access_log=False,
         log_config=None
     )
\ No newline at end of file
@@ -1,5 +1,57 @@
 from .database_manager import DatabaseManager
 from .redis_manager import RedisManager
+from .user_cache_manager import UserCacheManager, user_cache
+from .user_writer_manager import UserWriteError, UserWriterManager, user_writer
+from .ban_writer_manager import BanWriterManager, ban_writer
+from .locale_cache_manager import LocaleCacheManager, locale_cache
+from .flood_manager import FloodManager, flood
+from .broadcast_limiter_manager import BroadcastLimiterManager, RateLimiter, SharedRateLimiter, broadcast_limiter
+from .broadcast_job_manager import BroadcastJob, BroadcastJobManager, DeliveryLedger, broadcast_jobs
+from .media_registry_manager import MediaRegistryManager, media_registry
+from .broadcast_progress_manager import BroadcastProgress, BroadcastProgressManager, broadcast_progress
 from .i18n_manager import I18nManager
+from .admission_manager import AdmissionManager, admission
+from .update_queue_manager import UpdateQueueManager, update_queue
+from .update_stream_manager import UpdateStreamManager, update_stream
+from .update_dedup_manager import UpdateDedupManager, update_dedup
+from .leader_manager import LeaderManager, leader
 
-__all__ = ["DatabaseManager", "RedisManager", "I18nManager"]
\ No newline at end of file
+__all__ = [
+    "DatabaseManager",
+    "RedisManager",
+    "I18nManager",
+    "AdmissionManager",
+    "admission",
+    "UpdateQueueManager",
+    "update_queue",
+    "UpdateStreamManager",
+    "update_stream",
+    "UpdateDedupManager",
+    "update_dedup",
+    "LeaderManager",
+    "leader",
+    "UserCacheManager",
+    "user_cache",
+    "UserWriteError",
+    "UserWriterManager",
+    "user_writer",
+    "BanWriterManager",
+    "ban_writer",
+    "LocaleCacheManager",
+    "locale_cache",
+    "FloodManager",
+    "flood",
+    "BroadcastLimiterManager",
+    "RateLimiter",
+    "SharedRateLimiter",
+    "broadcast_limiter",
+    "BroadcastJob",
+    "BroadcastJobManager",
+    "DeliveryLedger",
+    "broadcast_jobs",
+    "MediaRegistryManager",
+    "media_registry",
+    "BroadcastProgress",
+    "BroadcastProgressManager",
+    "broadcast_progress"
+]
@@ -0,0 +1,135 @@
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from loguru import logger
+
+from core.config import settings
+from core.metrics import metrics
+from utils import RawUpdate, get_event_type
+
+
+class AdmissionManager:
+    """
+    Контроль допуска обновлений при перегрузке.
+
+    Обновления делятся на приоритеты:
+    - HIGH — callback_query и запросы, ответа на которые ждёт пользователь,
+      а также my_chat_member: это единственный источник блокировки и
+      разблокировки бота пользователем, и его потеря портит is_banned;
+    - NORMAL — сообщения;
+    - LOW — chat_member и всё остальное.
+
+    Нагрузка оценивается по глубине очереди (в режиме sync — по числу
+    обновлений в обработке) и по скользящему среднему времени обработки.
+    При превышении мягких порогов отбрасываются LOW, при превышении жёстких —
+    ещё и NORMAL. HIGH не отбрасываются никогда, их сдерживает backpressure
+    очереди. Telegram в любом случае получает 200.
+    """
+
+    HIGH, NORMAL, LOW = 0, 1, 2
+
+    PRIORITIES = {
+        "callback_query": HIGH,
+        "inline_query": HIGH,
+        "pre_checkout_query": HIGH,
+        "shipping_query": HIGH,
+        "my_chat_member": HIGH,
+        "message": NORMAL,
+        "edited_message": NORMAL,
+        "business_message": NORMAL,
+    }
+
+    # Вес нового замера в скользящем среднем времени обработки
+    LATENCY_ALPHA = 0.2
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        soft_depth: int = 800,
+        hard_depth: int = 1400,
+        soft_latency: float = 1.0,
+        hard_latency: float = 3.0
+    ) -> None:
+        self.enabled = enabled
+        self.soft_depth = soft_depth
+        self.hard_depth = hard_depth
+        self.soft_latency = soft_latency
+        self.hard_latency = hard_latency
+
+        self.inflight = 0
+        self.latency = 0.0
+        self._level = 0
+
+        metrics.gauge("admission_level", func=lambda: self._level)
+        metrics.gauge("admission_latency_seconds", func=lambda: round(self.latency, 6))
+
+    def priority(self, raw_update: RawUpdate) -> int:
+        """Приоритет обновления по типу события"""
+        return self.PRIORITIES.get(get_event_type(raw_update), self.LOW)
+
+    def level(self, depth: int) -> int:
+        """
+        Уровень перегрузки: 0 — норма, 1 — мягкий порог, 2 — жёсткий.
+
+        Время обработки учитывается, только пока есть необработанные
+        обновления: иначе устаревшее среднее не даст выйти из перегрузки.
+        """
+        latency = self.latency if depth else 0.0
+
+        if depth >= self.hard_depth or latency >= self.hard_latency:
+            return 2
+        if depth >= self.soft_depth or latency >= self.soft_latency:
+            return 1
+        return 0
+
+    def admit(self, raw_update: RawUpdate, depth: int) -> bool:
+        """
+        Решает, принимать ли обновление в обработку.
+
+        Args:
+            raw_update: Декодированное обновление
+            depth: Текущая глубина очереди или число обновлений в обработке
+
+        Returns:
+            False, если обновление нужно отбросить
+        """
+        if not self.enabled:
+            return True
+
+        level = self.level(depth)
+        if level != self._level:
+            logger.warning(f"Admission level changed: {self._level} -> {level} (depth {depth})")
+            self._level = level
+
+        if self.priority(raw_update) <= self.LOW - level:
+            return True
+
+        event_type = get_event_type(raw_update) or "unknown"
+        metrics.counter("update_shed_total", type=event_type).inc()
+        logger.debug(f"Update {raw_update.get('update_id')} ({event_type}) shed, level {level}")
+        return False
+
+    def observe(self, seconds: float) -> None:
+        """Учитывает время обработки одного обновления"""
+        self.latency += self.LATENCY_ALPHA * (seconds - self.latency)
+
+    @contextmanager
+    def track(self) -> Iterator[None]:
+        """Считает обновление находящимся в обработке и замеряет её время"""
+        self.inflight += 1
+        started_at = time.monotonic()
+        try:
+            yield
+        finally:
+            self.inflight -= 1
+            self.observe(time.monotonic() - started_at)
+
+
+admission = AdmissionManager(
+    enabled=settings.admission_enabled,
+    soft_depth=settings.admission_soft_depth,
+    hard_depth=settings.admission_hard_depth,
+    soft_latency=settings.admission_soft_latency,
+    hard_latency=settings.admission_hard_latency
+)
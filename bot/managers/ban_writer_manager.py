@@ -0,0 +1,156 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+from loguru import logger
+
+from core.config import settings
+from core.metrics import metrics
+from models import BotUser
+from .user_cache_manager import UserCacheManager, user_cache
+
+
+FLUSH_SIZE_BUCKETS = (1, 10, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class BanWriterManager:
+    """
+    Пакетная запись is_banned для пользователей, заблокировавших бота или
+    вернувшихся.
+
+    Переходы (user_id, banned) из рассылок и my_chat_member копятся в памяти
+    (последний переход пользователя побеждает) и раз в interval секунд или
+    по batch_size пользователей пишутся одним UPDATE на значение:
+    UPDATE users SET is_banned = $1 ... WHERE id = ANY($2) в PostgreSQL,
+    WHERE id IN (...) в остальных СУБД. Строки, где значение уже такое,
+    не переписываются. После записи снимки пользователей сбрасываются из
+    кэша одним DEL.
+
+    put() не делает I/O, поэтому в цикле отправки рассылки нет записей в БД.
+    """
+
+    def __init__(
+        self,
+        cache: UserCacheManager,
+        interval: float = 1.0,
+        batch_size: int = 1000
+    ) -> None:
+        self.cache = cache
+        self.interval = interval
+        self.batch_size = batch_size
+
+        self._pending: dict[int, bool] = {}
+        # Пачка, которая сейчас пишется: pending() видит и её
+        self._flushing: dict[int, bool] = {}
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+        metrics.gauge("ban_write_pending", func=lambda: len(self._pending))
+        self._flush_size = metrics.histogram("ban_write_flush_size", buckets=FLUSH_SIZE_BUCKETS)
+        self._flush_time = metrics.histogram("ban_write_flush_seconds")
+        self._failed = metrics.counter("ban_write_failed_total")
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def pending(self, user_id: int) -> bool | None:
+        """Ещё не записанное (или записываемое прямо сейчас) значение is_banned или None"""
+        banned = self._pending.get(user_id)
+        return banned if banned is not None else self._flushing.get(user_id)
+
+    def put(self, user_id: int, banned: bool) -> None:
+        """Ставит переход в очередь на запись"""
+        self._pending[user_id] = banned
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        """Запускает периодическую запись"""
+        if self._task:
+            return
+        self._task = asyncio.create_task(self._flush_loop(), name="ban-writer")
+        logger.info(f"Ban writer started: every {self.interval}s or {self.batch_size} users")
+
+    async def stop(self) -> None:
+        """Останавливает запись по таймеру и записывает всё, что осталось"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        await self.flush()
+        if self._pending:
+            logger.error(f"Ban writer stopped with {len(self._pending)} unsaved users")
+
+    async def flush(self) -> int:
+        """
+        Записывает накопленные переходы в БД.
+
+        Returns:
+            Количество пользователей, переходы которых записаны
+        """
+        async with self._lock:
+            if not self._pending:
+                return 0
+
+            flushing = self._flushing = self._pending
+            self._pending = {}
+            started_at = time.monotonic()
+            user_ids = list(flushing)
+
+            groups: dict[bool, list[int]] = {True: [], False: []}
+            for user_id, banned in flushing.items():
+                groups[banned].append(user_id)
+
+            try:
+                for banned, ids in groups.items():
+                    for start in range(0, len(ids), self.batch_size):
+                        await self._update(ids[start:start + self.batch_size], banned)
+            except Exception as e:
+                self._failed.inc()
+                logger.error(f"Failed to flush {len(flushing)} ban states: {e}")
+                # UPDATE идемпотентен: возвращаем всё, кроме перезаписанных новыми переходами
+                for user_id, banned in flushing.items():
+                    self._pending.setdefault(user_id, banned)
+                return 0
+            finally:
+                self._flushing = {}
+
+            self._flush_size.observe(len(flushing))
+            self._flush_time.observe(time.monotonic() - started_at)
+
+        await self.cache.invalidate_many(user_ids)
+        logger.debug(f"Flushed {len(flushing)} ban states")
+        return len(flushing)
+
+    @staticmethod
+    async def _update(user_ids: list[int], banned: bool) -> None:
+        updated_at = datetime.now(timezone.utc)
+        db = BotUser._meta.db
+        if getattr(db.capabilities, "dialect", None) == "postgres":
+            # Один параметр-массив вместо IN со списком: один план на любое число id
+            await db.execute_query(
+                f'UPDATE "{BotUser._meta.db_table}" SET "is_banned" = $1, "updated_at" = $2 '
+                f'WHERE "id" = ANY($3::bigint[]) AND "is_banned" <> $1',
+                [banned, updated_at, user_ids]
+            )
+            return
+        await BotUser.filter(id__in=user_ids, is_banned=not banned).update(is_banned=banned, updated_at=updated_at)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+
+ban_writer = BanWriterManager(
+    cache=user_cache,
+    interval=settings.ban_write_interval,
+    batch_size=settings.ban_write_batch_size
+)
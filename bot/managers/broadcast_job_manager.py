@@ -0,0 +1,313 @@
+import asyncio
+import os
+import socket
+import time
+import uuid
+from collections import deque
+from typing import Any, Coroutine, Iterable
+
+import msgspec
+from loguru import logger
+from redis.asyncio import Redis
+
+from core.loader import bot, storage
+from core.metrics import metrics
+from .redis_manager import RedisManager
+
+
+# Сброс контрольной точки — один Lua-вызов раз в секунду
+CHECKPOINT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5)
+
+
+class BroadcastJob(msgspec.Struct):
+    """Сохранённая рассылка: шаблон (Template.to_dict()), параметры и прогресс"""
+    id: str
+    template: dict
+    params: dict
+    estimated: int = 0
+    status: str = "running"
+    checkpoint: int = 0
+    success: int = 0
+    failed: int = 0
+    blocked: int = 0
+
+    @property
+    def counters(self) -> dict[str, int]:
+        return {"success": self.success, "failed": self.failed, "blocked": self.blocked}
+
+
+class DeliveryLedger:
+    """
+    Прогресс одной рассылки в памяти: контрольная точка и завершённые id над ней.
+
+    Получатели выбираются по возрастанию id, а завершаются в любом порядке.
+    checkpoint — наибольший id, до которого включительно завершены все
+    получатели; завершённые выше него id хранятся отдельно, пока
+    checkpoint до них не дойдёт. Их число ограничено окном отправок,
+    которые обогнали самую медленную, поэтому весь журнал в Redis — одно
+    число и короткий ZSET, сколько бы ни было получателей.
+
+    begin() и finish() — O(1) амортизированно.
+    """
+
+    def __init__(
+        self,
+        checkpoint: int = 0,
+        delivered: Iterable[int] = (),
+        counters: dict[str, int] | None = None
+    ) -> None:
+        self.checkpoint = checkpoint
+        self.counters = {"success": 0, "failed": 0, "blocked": 0, **(counters or {})}
+        # Завершены в прошлых запусках, выше checkpoint
+        self._delivered = set(delivered)
+        self._inflight: deque[int] = deque()
+        self._done: set[int] = set()
+        self._unsaved: list[int] = []
+
+    @property
+    def total(self) -> int:
+        return sum(self.counters.values())
+
+    def begin(self, user_id: int) -> bool:
+        """
+        Отмечает получателя выбранным (id должны возрастать).
+
+        Returns:
+            False, если получатель уже завершён в прошлом запуске и отправлять не нужно
+        """
+        self._inflight.append(user_id)
+        if user_id in self._delivered:
+            self._delivered.discard(user_id)
+            self._done.add(user_id)
+            self._advance()
+            return False
+        return True
+
+    def finish(self, user_id: int, status: str) -> None:
+        """Отмечает отправку получателю завершённой со статусом success/failed/blocked"""
+        self.counters[status if status in self.counters else "failed"] += 1
+        self._done.add(user_id)
+        self._unsaved.append(user_id)
+        self._advance()
+
+    def drain(self) -> list[int]:
+        """Завершённые с прошлого вызова id, которые не покрывает checkpoint"""
+        unsaved, self._unsaved = self._unsaved, []
+        return [user_id for user_id in unsaved if user_id > self.checkpoint]
+
+    def restore(self, user_ids: list[int]) -> None:
+        """Возвращает id, которые не удалось сохранить, до следующего drain()"""
+        self._unsaved[:0] = user_ids
+
+    def _advance(self) -> None:
+        while self._inflight and self._inflight[0] in self._done:
+            self.checkpoint = self._inflight.popleft()
+            self._done.discard(self.checkpoint)
+
+
+class BroadcastJobManager:
+    """
+    Хранилище возобновляемых рассылок в Redis.
+
+    Рассылка — хэш broadcast:{bot_id}:job:{id} (шаблон, параметры, статус,
+    контрольная точка и счётчики) и ZSET завершённых получателей выше
+    контрольной точки (score = user_id). Незавершённые рассылки — в
+    множестве broadcast:{bot_id}:jobs.
+
+    Выполняет рассылку один процесс: claim() ставит лок с токеном, а
+    checkpoint() продлевает его тем же Lua-вызовом, которым пишет прогресс,
+    — процесс, потерявший лок, не перезапишет чужой прогресс. Лок упавшего
+    процесса истекает через lock_ttl_ms: resume_jobs нового лидера ждёт
+    этого, повторяя claim(), и продолжает рассылку.
+    """
+
+    # KEYS: лок, хэш рассылки, журнал; ARGV: токен, TTL лока в мс, checkpoint,
+    # success, failed, blocked, затем завершённые id выше checkpoint.
+    # Возвращает 0, если лок принадлежит другому процессу
+    CHECKPOINT_SCRIPT = """
+    if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+        return 0
+    end
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    for i = 7, #ARGV do
+        redis.call('ZADD', KEYS[3], ARGV[i], ARGV[i])
+    end
+    redis.call('ZREMRANGEBYSCORE', KEYS[3], '-inf', ARGV[3])
+    redis.call('HSET', KEYS[2], 'checkpoint', ARGV[3], 'success', ARGV[4], 'failed', ARGV[5], 'blocked', ARGV[6])
+    return 1
+    """
+
+    RELEASE_SCRIPT = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('DEL', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        prefix: str,
+        lock_ttl_ms: int = 30_000,
+        finished_ttl: int = 7 * 86400
+    ) -> None:
+        self.redis = redis
+        self.prefix = prefix
+        self.lock_ttl_ms = lock_ttl_ms
+        self.finished_ttl = finished_ttl
+        self.token = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._checkpoint = redis.register_script(self.CHECKPOINT_SCRIPT)
+        self._release = redis.register_script(self.RELEASE_SCRIPT)
+        self._tasks: set[asyncio.Task] = set()
+
+        self._checkpoint_time = metrics.histogram("broadcast_checkpoint_seconds", buckets=CHECKPOINT_BUCKETS)
+        self._checkpoint_failed = metrics.counter("broadcast_checkpoint_failed_total")
+
+    def _job_key(self, job_id: str, *parts: str) -> str:
+        return RedisManager.make_key(self.prefix, "job", job_id, *parts)
+
+    @property
+    def _active_key(self) -> str:
+        return RedisManager.make_key(self.prefix, "jobs")
+
+    async def create(self, template: dict, params: dict, estimated: int = 0) -> BroadcastJob:
+        """Сохраняет новую рассылку и добавляет её в незавершённые"""
+        job = BroadcastJob(id=uuid.uuid4().hex, template=template, params=params, estimated=estimated)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self._job_key(job.id), mapping={
+                "spec": msgspec.json.encode({"template": job.template, "params": job.params}),
+                "estimated": job.estimated,
+                "status": job.status,
+                "checkpoint": 0,
+                "success": 0,
+                "failed": 0,
+                "blocked": 0
+            })
+            pipe.sadd(self._active_key, job.id)
+            await pipe.execute()
+        return job
+
+    async def get(self, job_id: str) -> BroadcastJob | None:
+        raw = await self.redis.hgetall(self._job_key(job_id))
+        if not raw:
+            return None
+        fields = {
+            (key.decode() if isinstance(key, bytes) else key): value.decode() if isinstance(value, bytes) else value
+            for key, value in raw.items()
+        }
+        spec = msgspec.json.decode(fields["spec"])
+        return BroadcastJob(
+            id=job_id,
+            template=spec["template"],
+            params=spec["params"],
+            estimated=int(fields.get("estimated", 0)),
+            status=fields["status"],
+            checkpoint=int(fields.get("checkpoint", 0)),
+            success=int(fields.get("success", 0)),
+            failed=int(fields.get("failed", 0)),
+            blocked=int(fields.get("blocked", 0))
+        )
+
+    async def active(self) -> list[str]:
+        """ID незавершённых рассылок"""
+        return [
+            job_id.decode() if isinstance(job_id, bytes) else job_id
+            for job_id in await self.redis.smembers(self._active_key)
+        ]
+
+    async def delivered(self, job_id: str) -> list[int]:
+        """Завершённые получатели выше контрольной точки"""
+        return [int(user_id) for user_id in await self.redis.zrange(self._job_key(job_id, "ledger"), 0, -1)]
+
+    async def claim(self, job_id: str, wait: float = 0) -> bool:
+        """
+        Берёт рассылку на выполнение этим процессом.
+
+        Args:
+            wait: Сколько секунд повторять попытку, пока лок занят. Лок
+                упавшего процесса истекает за lock_ttl_ms, а живой владелец
+                продлевает его на каждой контрольной точке
+
+        Returns:
+            False, если лок так и не освободился
+        """
+        key = self._job_key(job_id, "lock")
+        deadline = time.monotonic() + wait
+        while not await self.redis.set(key, self.token, nx=True, px=self.lock_ttl_ms):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            # Следующая попытка — когда истечёт текущий TTL лока
+            ttl_ms = await self.redis.pttl(key)
+            await asyncio.sleep(min(remaining, ttl_ms / 1000 if ttl_ms > 0 else 0.1))
+        return True
+
+    async def release(self, job_id: str) -> None:
+        try:
+            await self._release(keys=[self._job_key(job_id, "lock")], args=[self.token])
+        except Exception as e:
+            logger.warning(f"Failed to release broadcast job {job_id}: {e}")
+
+    async def checkpoint(self, job_id: str, ledger: DeliveryLedger) -> bool:
+        """
+        Сохраняет прогресс и продлевает лок.
+
+        Returns:
+            False, если рассылку выполняет другой процесс. Ошибка Redis не
+            считается потерей лока: id вернутся в ledger до следующей попытки.
+        """
+        user_ids = ledger.drain()
+        started_at = time.perf_counter()
+        try:
+            owned = await self._checkpoint(
+                keys=[self._job_key(job_id, "lock"), self._job_key(job_id), self._job_key(job_id, "ledger")],
+                args=[
+                    self.token, self.lock_ttl_ms, ledger.checkpoint,
+                    ledger.counters["success"], ledger.counters["failed"], ledger.counters["blocked"],
+                    *user_ids
+                ]
+            )
+        except Exception as e:
+            self._checkpoint_failed.inc()
+            logger.warning(f"Failed to checkpoint broadcast job {job_id}: {e}")
+            ledger.restore(user_ids)
+            return True
+        self._checkpoint_time.observe(time.perf_counter() - started_at)
+        return bool(owned)
+
+    async def complete(self, job_id: str, status: str = "done") -> None:
+        """Завершает рассылку: журнал удаляется, хэш хранится finished_ttl секунд"""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self._job_key(job_id), "status", status)
+            pipe.expire(self._job_key(job_id), self.finished_ttl)
+            pipe.delete(self._job_key(job_id, "ledger"))
+            pipe.srem(self._active_key, job_id)
+            await pipe.execute()
+
+    def spawn(self, coro: Coroutine[Any, Any, Any], job_id: str) -> asyncio.Task:
+        """Выполняет рассылку в фоне; stop() прервёт её с сохранением прогресса"""
+        task = asyncio.create_task(coro, name=f"broadcast-{job_id}")
+        self._tasks.add(task)
+        task.add_done_callback(self._on_done)
+        return task
+
+    def _on_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.opt(exception=task.exception()).error(f"Broadcast {task.get_name()} failed")
+
+    async def stop(self) -> None:
+        """Прерывает выполняемые рассылки; их продолжит следующий запуск"""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if tasks:
+            logger.info(f"Suspended {len(tasks)} broadcast jobs")
+
+
+broadcast_jobs = BroadcastJobManager(
+    redis=storage.redis,
+    prefix=RedisManager.make_key("broadcast", bot.id)
+)
@@ -0,0 +1,235 @@
+import asyncio
+import time
+from collections import deque
+
+from loguru import logger
+from redis.asyncio import Redis
+
+from core.config import settings
+from core.loader import bot, storage
+from core.metrics import metrics
+from .redis_manager import RedisManager
+
+
+class RateLimiter:
+    """
+    Локальный ограничитель: не больше max_rate отправок в секунду.
+
+    Окно — burst = max(1, int(max_rate)) слотов за burst / max_rate секунд,
+    поэтому дробная частота соблюдается точно: при 0.5/s — один слот
+    раз в 2 секунды. Каждый acquire() за O(1) резервирует слот не раньше,
+    чем через окно после слота, зарезервированного burst вызовов назад,
+    и ждёт его уже после резервирования — без блокировок и сна под ними.
+    """
+
+    def __init__(self, max_rate: float = 20):
+        self.timestamps: deque[float] = deque()
+        self.set_rate(max_rate)
+        self.paused_until = 0.0
+        self.throttled = 0
+
+    def set_rate(self, max_rate: float) -> None:
+        """Меняет частоту, сохраняя уже зарезервированные слоты"""
+        burst = max(1, int(max_rate))
+        self.max_rate = max_rate
+        self.period = burst / max_rate
+        self.timestamps = deque(self.timestamps, maxlen=burst)
+
+    async def acquire(self):
+        now = time.monotonic()
+        slot = max(now, self.paused_until)
+        if len(self.timestamps) == self.timestamps.maxlen:
+            slot = max(slot, self.timestamps[0] + self.period)
+        self.timestamps.append(slot)
+
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def pause(self, seconds: float) -> None:
+        """Не выдаёт слоты ближайшие seconds секунд"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def on_success(self) -> None:
+        """Отправка прошла (локальному ограничителю не нужно)"""
+
+    async def on_retry_after(self, seconds: float) -> None:
+        """Telegram ответил 429: пауза на retry_after"""
+        self.throttled += 1
+        self.pause(seconds)
+
+
+class BroadcastLimiterManager:
+    """
+    Общий для всех процессов и нод бюджет отправки рассылок в Redis.
+
+    Бюджет — GCRA-ведро по ключу с ID бота: одно целое число (TAT в мс по
+    часам Redis). Процесс берёт токены арендой по lease_size штук за один
+    Lua-вызов и раздаёт их локально за O(1) без блокировок; пока аренду
+    ждут, остальные отправки ждут тот же запрос, а не делают свои.
+
+    pause() сдвигает TAT ведра вперёд: после 429 от Telegram ни один
+    процесс не получит токенов до конца штрафного окна.
+
+    Если Redis недоступен, на fallback_seconds используется локальный
+    RateLimiter с той же частотой.
+    """
+
+    # KEYS[1] — ведро; ARGV: интервал на токен в мс, размер аренды.
+    # Ёмкость ведра равна аренде: после простоя аренда выдаётся сразу.
+    # Возвращает {выдано токенов, через сколько мс будет доступна аренда}
+    LEASE_SCRIPT = """
+    local time = redis.call('TIME')
+    local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+    local interval = tonumber(ARGV[1])
+    local lease = tonumber(ARGV[2])
+    local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+    if now < tat then
+        return {0, tat - now}
+    end
+    tat = now + interval * lease
+    redis.call('SET', KEYS[1], tat, 'PX', tat - now + interval)
+    return {lease, 0}
+    """
+
+    # KEYS[1] — ведро; ARGV[1] — пауза в мс. TAT только сдвигается вперёд
+    PAUSE_SCRIPT = """
+    local time = redis.call('TIME')
+    local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+    local paused_until = now + tonumber(ARGV[1])
+    if paused_until > tonumber(redis.call('GET', KEYS[1]) or 0) then
+        redis.call('SET', KEYS[1], paused_until, 'PX', paused_until - now + 1000)
+    end
+    return paused_until - now
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        key: str,
+        lease_size: int = 5,
+        fallback_seconds: float = 30.0
+    ) -> None:
+        self.redis = redis
+        self.key = key
+        self.lease_size = lease_size
+        self.fallback_seconds = fallback_seconds
+        self._script = redis.register_script(self.LEASE_SCRIPT)
+        self._pause_script = redis.register_script(self.PAUSE_SCRIPT)
+
+        self._tokens = 0
+        self._lease: asyncio.Task | None = None
+        self._fallback_until = 0.0
+        self._local: RateLimiter | None = None
+
+        self._leases = metrics.counter("broadcast_limiter_leases_total")
+        self._fallbacks = metrics.counter("broadcast_limiter_fallbacks_total")
+        self._pauses = metrics.counter("broadcast_limiter_pauses_total")
+
+    def limiter(self, max_rate: float) -> "SharedRateLimiter":
+        """Ограничитель с интерфейсом RateLimiter для одной рассылки"""
+        return SharedRateLimiter(self, max_rate)
+
+    async def acquire(self, rate: float) -> None:
+        """Берёт один токен из общего бюджета, ожидая, если он исчерпан"""
+        while self._tokens <= 0:
+            if self._lease is None:
+                self._lease = asyncio.create_task(self._refill(rate))
+            await asyncio.shield(self._lease)
+        self._tokens -= 1
+
+    async def pause(self, seconds: float) -> None:
+        """Останавливает выдачу токенов во всех процессах на seconds секунд"""
+        self._pauses.inc()
+        # Арендованные токены попали бы в штрафное окно
+        self._tokens = 0
+        if self._local is not None:
+            self._local.pause(seconds)
+        try:
+            await self._pause_script(keys=[self.key], args=[max(1, round(seconds * 1000))])
+        except Exception as e:
+            logger.warning(f"Failed to pause broadcast budget in Redis: {e}")
+
+    async def _refill(self, rate: float) -> None:
+        try:
+            if time.monotonic() < self._fallback_until:
+                await self._local_acquire(rate)
+                return
+
+            interval_ms = max(1, round(1000 / rate))
+            while True:
+                granted, wait_ms = await self._script(
+                    keys=[self.key],
+                    args=[interval_ms, self.lease_size]
+                )
+                if granted:
+                    self._leases.inc()
+                    self._tokens += int(granted)
+                    return
+                await asyncio.sleep(int(wait_ms) / 1000)
+        except Exception as e:
+            logger.warning(f"Broadcast budget in Redis unavailable, using local limiter: {e}")
+            self._fallbacks.inc()
+            self._fallback_until = time.monotonic() + self.fallback_seconds
+            await self._local_acquire(rate)
+        finally:
+            self._lease = None
+
+    async def _local_acquire(self, rate: float) -> None:
+        if self._local is None:
+            self._local = RateLimiter(max_rate=rate)
+        elif self._local.max_rate != rate:
+            # AIMD меняет частоту почти на каждой отправке: слоты не сбрасываем
+            self._local.set_rate(rate)
+        await self._local.acquire()
+        self._tokens += 1
+
+
+class SharedRateLimiter:
+    """
+    Адаптер BroadcastLimiterManager с интерфейсом RateLimiter для одной рассылки.
+
+    Частота подстраивается по AIMD: после каждых ~rate успешных отправок
+    (примерно раз в секунду) растёт на increase, после 429 умножается на
+    decrease — не чаще раза за штрафное окно, сколько бы одновременных
+    отправок его ни получили. Так рассылка держится около максимальной
+    частоты, которую Telegram выдерживает, но не выше max_rate.
+    """
+
+    def __init__(
+        self,
+        manager: BroadcastLimiterManager,
+        max_rate: float,
+        min_rate: float = 1.0,
+        increase: float = 1.0,
+        decrease: float = 0.5
+    ) -> None:
+        self.manager = manager
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, max_rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.rate = float(max_rate)
+        self.throttled = 0
+        self._penalty_until = 0.0
+
+    async def acquire(self) -> None:
+        await self.manager.acquire(self.rate)
+
+    def on_success(self) -> None:
+        self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+
+    async def on_retry_after(self, seconds: float) -> None:
+        self.throttled += 1
+        now = time.monotonic()
+        if now >= self._penalty_until:
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            logger.warning(f"Broadcast hit flood control: pausing for {seconds}s, rate lowered to {self.rate:.1f}/s")
+        self._penalty_until = max(self._penalty_until, now + seconds)
+        await self.manager.pause(seconds)
+
+
+broadcast_limiter = BroadcastLimiterManager(
+    redis=storage.redis,
+    key=RedisManager.make_key("broadcast", bot.id, "budget"),
+    lease_size=settings.broadcast_lease_size
+)
@@ -0,0 +1,291 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any
+
+import msgspec
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from loguru import logger
+from redis.asyncio import Redis
+
+from core.config import settings
+from core.loader import bot, storage
+from .redis_manager import RedisManager
+
+
+class BroadcastProgress:
+    """
+    Прогресс одной рассылки: счётчики, скорость и ETA.
+
+    record() — O(1) в цикле отправки. Раз в interval секунд фоновая задача
+    публикует снимок в Redis и, если прошло не меньше status_interval
+    секунд с прошлой правки и текст изменился, правит сообщение о статусе в
+    чате администраторов. Правки сливаются: между ними меняются только
+    счётчики, поэтому лимит правок чата не превышается при любой скорости
+    рассылки, а после 429 следующая правка ждёт retry_after.
+
+    Скорость — по отправкам за последние window секунд, ETA — остаток
+    оценки числа получателей при этой скорости.
+    """
+
+    def __init__(
+        self,
+        manager: "BroadcastProgressManager",
+        broadcast_id: str,
+        estimated: int,
+        rate_limiter: Any = None,
+        chat_id: int | None = None,
+        counters: dict[str, int] | None = None,
+        bot: Bot | None = None
+    ) -> None:
+        self.manager = manager
+        self.bot = bot or manager.bot
+        self.id = broadcast_id
+        self.estimated = estimated
+        self.rate_limiter = rate_limiter
+        self.chat_id = chat_id
+        self.counters = {"success": 0, "failed": 0, "blocked": 0, **(counters or {})}
+        self.status = "running"
+        self.started_at = time.time()
+
+        self._samples: deque[tuple[float, int]] = deque()
+        self._task: asyncio.Task | None = None
+        self._message_id: int | None = None
+        self._last_text: str | None = None
+        self._next_edit_at = 0.0
+
+    @property
+    def processed(self) -> int:
+        return sum(self.counters.values())
+
+    def record(self, status: str) -> None:
+        """Учитывает завершённую отправку (success/failed/blocked)"""
+        self.counters[status if status in self.counters else "failed"] += 1
+
+    def rate(self) -> float:
+        """Отправок в секунду за последние window секунд"""
+        if len(self._samples) < 2:
+            return 0.0
+        (first_at, first), (last_at, last) = self._samples[0], self._samples[-1]
+        return (last - first) / (last_at - first_at) if last_at > first_at else 0.0
+
+    def snapshot(self) -> dict:
+        rate = self.rate()
+        remaining = max(0, self.estimated - self.processed)
+        return {
+            "id": self.id,
+            "status": self.status,
+            "started_at": self.started_at,
+            "updated_at": time.time(),
+            "estimated": self.estimated,
+            "processed": self.processed,
+            **self.counters,
+            "throttled": getattr(self.rate_limiter, "throttled", 0),
+            "rate": round(rate, 2),
+            "rate_limit": getattr(self.rate_limiter, "rate", None) or getattr(self.rate_limiter, "max_rate", None),
+            "eta": round(remaining / rate) if rate > 0 and self.status == "running" else None
+        }
+
+    def _sample(self) -> None:
+        now = time.monotonic()
+        self._samples.append((now, self.processed))
+        # Самый старый сэмпл — не позже начала окна
+        while len(self._samples) > 2 and self._samples[1][0] <= now - self.manager.window:
+            self._samples.popleft()
+
+    async def __aenter__(self) -> "BroadcastProgress":
+        self._sample()
+        await self.manager.publish(self.snapshot())
+        if self.chat_id is not None:
+            await self._send_status()
+        self._task = asyncio.create_task(self._run(), name=f"broadcast-progress-{self.id}")
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        if exc_type is None:
+            self.status = "done"
+        elif issubclass(exc_type, asyncio.CancelledError):
+            self.status = "suspended"
+        else:
+            self.status = "failed"
+        self._sample()
+        await self.manager.publish(self.snapshot())
+        await self._edit_status(final=True)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.manager.interval)
+            self._sample()
+            await self.manager.publish(self.snapshot())
+            await self._edit_status()
+
+    async def _send_status(self) -> None:
+        text = self.manager.format_status(self.snapshot())
+        try:
+            message = await self.bot.send_message(chat_id=self.chat_id, text=text)
+        except Exception as e:
+            logger.warning(f"Failed to send broadcast status to chat {self.chat_id}: {e}")
+            return
+        self._message_id = message.message_id
+        self._last_text = text
+        self._next_edit_at = time.monotonic() + self.manager.status_interval
+
+    async def _edit_status(self, final: bool = False, retry: bool = True) -> None:
+        if self._message_id is None:
+            return
+
+        now = time.monotonic()
+        if now < self._next_edit_at:
+            # Приостановленную при остановке процесса рассылку не задерживаем
+            if not final or self.status == "suspended":
+                return
+            # Итог важнее задержки: ждём конца интервала или штрафа за 429
+            await asyncio.sleep(min(self._next_edit_at - now, self.manager.status_interval * 10))
+
+        text = self.manager.format_status(self.snapshot())
+        if text == self._last_text:
+            return
+        try:
+            await self.bot.edit_message_text(chat_id=self.chat_id, message_id=self._message_id, text=text)
+        except TelegramRetryAfter as e:
+            self._next_edit_at = time.monotonic() + e.retry_after
+            logger.debug(f"Broadcast status edits paused for {e.retry_after}s")
+            if final and retry:
+                await self._edit_status(final=True, retry=False)
+            return
+        except TelegramBadRequest as e:
+            if "message is not modified" not in str(e).lower():
+                logger.warning(f"Failed to edit broadcast status: {e}")
+                self._message_id = None
+            return
+        except Exception as e:
+            logger.warning(f"Failed to edit broadcast status: {e}")
+            return
+        self._last_text = text
+        self._next_edit_at = time.monotonic() + self.manager.status_interval
+
+
+class BroadcastProgressManager:
+    """
+    Публикация прогресса рассылок в Redis для администраторов и дашбордов.
+
+    Снимок рассылки — JSON по ключу broadcast:{bot_id}:progress:{id} с TTL,
+    последние рассылки — в ZSET broadcast:{bot_id}:progress по времени
+    старта. Читается он без запросов к Postgres (см. routes/broadcasts.py).
+    """
+
+    STATUS_ICONS = {"running": "⏳", "done": "✅", "suspended": "⏸", "failed": "❌"}
+
+    def __init__(
+        self,
+        redis: Redis,
+        bot: Bot,
+        prefix: str,
+        interval: float = 1.0,
+        status_interval: float = 5.0,
+        window: float = 60.0,
+        ttl: int = 7 * 86400,
+        keep: int = 100
+    ) -> None:
+        self.redis = redis
+        self.bot = bot
+        self.prefix = prefix
+        self.interval = interval
+        self.status_interval = status_interval
+        self.window = window
+        self.ttl = ttl
+        self.keep = keep
+
+    def track(
+        self,
+        broadcast_id: str,
+        estimated: int,
+        rate_limiter: Any = None,
+        chat_id: int | None = None,
+        counters: dict[str, int] | None = None,
+        bot: Bot | None = None
+    ) -> BroadcastProgress:
+        """
+        Прогресс рассылки как асинхронный контекстный менеджер.
+
+        Args:
+            broadcast_id: ID рассылки
+            estimated: Оценка числа получателей для ETA
+            rate_limiter: Ограничитель рассылки — из него берутся число 429 и текущая частота
+            chat_id: Чат для сообщения о статусе или None
+            counters: Счётчики прошлых запусков возобновлённой рассылки
+            bot: Бот для сообщения о статусе, по умолчанию бот процесса
+        """
+        return BroadcastProgress(self, broadcast_id, estimated, rate_limiter, chat_id, counters, bot)
+
+    def _key(self, broadcast_id: str) -> str:
+        return RedisManager.make_key(self.prefix, broadcast_id)
+
+    async def publish(self, snapshot: dict) -> None:
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.set(self._key(snapshot["id"]), msgspec.json.encode(snapshot), ex=self.ttl)
+                pipe.zadd(self.prefix, {snapshot["id"]: snapshot["started_at"]})
+                pipe.zremrangebyrank(self.prefix, 0, -self.keep - 1)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to publish broadcast progress: {e}")
+
+    async def get(self, broadcast_id: str) -> dict | None:
+        raw = await self.redis.get(self._key(broadcast_id))
+        return msgspec.json.decode(raw) if raw else None
+
+    async def recent(self, limit: int = 20) -> list[dict]:
+        """Снимки последних рассылок, новые первыми"""
+        broadcast_ids = await self.redis.zrevrange(self.prefix, 0, limit - 1)
+        if not broadcast_ids:
+            return []
+        values = await self.redis.mget([
+            self._key(broadcast_id.decode() if isinstance(broadcast_id, bytes) else broadcast_id)
+            for broadcast_id in broadcast_ids
+        ])
+        return [msgspec.json.decode(value) for value in values if value]
+
+    def format_status(self, snapshot: dict) -> str:
+        """Текст сообщения о статусе рассылки"""
+        lines = [
+            f"{self.STATUS_ICONS.get(snapshot['status'], '📣')} Рассылка {snapshot['id'][:8]}",
+            f"Обработано: {snapshot['processed']} из ~{snapshot['estimated']}",
+            f"✉️ Доставлено: {snapshot['success']}",
+            f"🚫 Заблокировали: {snapshot['blocked']}",
+            f"⚠️ Ошибки: {snapshot['failed']}",
+            f"🐢 429: {snapshot['throttled']}",
+        ]
+        if snapshot["status"] == "running":
+            lines.append(f"Скорость: {snapshot['rate']:.1f} сообщ./с")
+            if snapshot["eta"] is not None:
+                lines.append(f"Осталось: ~{self.format_duration(snapshot['eta'])}")
+        else:
+            lines.append(f"Длительность: {self.format_duration(snapshot['updated_at'] - snapshot['started_at'])}")
+        return "\n".join(lines)
+
+    @staticmethod
+    def format_duration(seconds: float) -> str:
+        seconds = int(seconds)
+        hours, rest = divmod(seconds, 3600)
+        minutes, seconds = divmod(rest, 60)
+        if hours:
+            return f"{hours} ч {minutes:02d} мин"
+        if minutes:
+            return f"{minutes} мин {seconds:02d} с"
+        return f"{seconds} с"
+
+
+broadcast_progress = BroadcastProgressManager(
+    redis=storage.redis,
+    bot=bot,
+    prefix=RedisManager.make_key("broadcast", bot.id, "progress"),
+    interval=settings.broadcast_progress_interval,
+    status_interval=settings.broadcast_status_interval
+)
@@ -0,0 +1,202 @@
+import time
+from collections import OrderedDict, deque
+
+from aiogram.types import Update
+from redis.asyncio import Redis
+
+from core.config import settings
+from core.loader import storage
+from core.metrics import metrics
+from .redis_manager import RedisManager
+
+
+class _LocalWindow:
+    """Время последних burst разрешённых Redis действий по ключу в этом процессе"""
+    __slots__ = ("admitted",)
+
+    def __init__(self, burst: int) -> None:
+        self.admitted: deque[float] = deque(maxlen=burst)
+
+    def retry_after(self, now: float, interval: float) -> float:
+        # burst действий за последний интервал: GCRA в Redis точно откажет
+        if len(self.admitted) < self.admitted.maxlen:
+            return 0.0
+        return max(self.admitted[0] + interval - now, 0.0)
+
+
+class FloodManager:
+    """
+    Атомарный ограничитель частоты действий (GCRA) на стороне Redis.
+
+    Для каждой области (scope) хранится одно целое число — теоретическое
+    время следующего действия (TAT) в миллисекундах по часам Redis.
+    Проверка и обновление всех областей выполняются одним Lua-скриптом,
+    поэтому два одновременных обновления от одного пользователя не могут
+    пройти оба. Действие засчитывается, только если разрешено во всех
+    областях сразу.
+
+    Области:
+    - message / callback — отдельно для сообщений и нажатий кнопок пользователя;
+    - chat — общий лимит группы на сообщения и нажатия всех участников.
+
+    Перед Redis работает локальный фильтр процесса (precheck/record):
+    скользящее окно разрешённых действий по каждому ключу и время, до
+    которого набор ключей уже отклонён Redis. Окно учитывает только
+    действия, прошедшие Redis, поэтому локальный отказ никогда не строже
+    общего. Флудящий пользователь отсекается без сетевых запросов, а Redis
+    спрашивается, лишь когда лимит может снова пропустить действие.
+    """
+
+    # Lua-функция gcra(keys, args): args — пары (интервал в мс, burst) по ключам.
+    # Возвращает 0, если действие разрешено, иначе через сколько мс повторить
+    GCRA_FUNCTION = """
+    local function gcra(keys, args)
+        local time = redis.call('TIME')
+        local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+        local retry_after = 0
+        local tats = {}
+        for i, key in ipairs(keys) do
+            local interval = tonumber(args[2 * i - 1])
+            local burst = tonumber(args[2 * i])
+            local tat = math.max(tonumber(redis.call('GET', key) or now), now)
+            local allow_at = tat - interval * (burst - 1)
+            if now < allow_at then
+                retry_after = math.max(retry_after, allow_at - now)
+            end
+            tats[i] = tat + interval
+        end
+        if retry_after == 0 then
+            for i, key in ipairs(keys) do
+                redis.call('SET', key, tats[i], 'PX', tats[i] - now)
+            end
+        end
+        return retry_after
+    end
+    """
+
+    SCRIPT = GCRA_FUNCTION + "return gcra(KEYS, ARGV)"
+
+    GROUP_CHATS = ("group", "supergroup")
+
+    def __init__(self, redis: Redis, limits: dict[str, tuple[float, int]], local_size: int = 10_000) -> None:
+        """
+        Args:
+            redis: Клиент Redis
+            limits: Область -> (действий в секунду, burst)
+            local_size: Сколько ключей хранит локальный фильтр (0 — выключен)
+        """
+        self.redis = redis
+        self.limits = {
+            scope: (max(1, round(1000 / rate)), burst)
+            for scope, (rate, burst) in limits.items()
+        }
+        self.local_size = local_size
+        self._script = redis.register_script(self.SCRIPT)
+
+        self._windows: OrderedDict[str, _LocalWindow] = OrderedDict()
+        self._blocked: OrderedDict[tuple[str, ...], float] = OrderedDict()
+
+        self._local_rejects = metrics.counter("flood_rejected_total", source="local")
+        self._redis_rejects = metrics.counter("flood_rejected_total", source="redis")
+        self._redis_checks = metrics.counter("flood_redis_checks_total")
+
+    def scopes(self, event: Update) -> tuple[list[str], list[int]]:
+        """
+        Ключи и аргументы скрипта для обновления.
+
+        Returns:
+            Ключи областей и плоский список (интервал в мс, burst) по ним;
+            пустые списки, если обновление не ограничивается
+        """
+        if event.message and event.message.from_user:
+            scope, user, chat = "message", event.message.from_user, event.message.chat
+        elif event.callback_query:
+            callback = event.callback_query
+            scope, user, chat = "callback", callback.from_user, callback.message.chat if callback.message else None
+        else:
+            return [], []
+
+        keys = [RedisManager.make_key("flood", user.id, scope)]
+        args = list(self.limits[scope])
+        if chat is not None and chat.type in self.GROUP_CHATS:
+            keys.append(RedisManager.make_key("flood", "chat", chat.id))
+            args.extend(self.limits["chat"])
+        return keys, args
+
+    def precheck(self, keys: list[str], args: list[int]) -> float:
+        """
+        Локальная проверка без запросов к Redis.
+
+        Returns:
+            0, если решение за Redis, иначе через сколько секунд повторить
+        """
+        if not keys or not self.local_size:
+            return 0.0
+
+        now = time.monotonic()
+        retry_after = self._blocked.get(tuple(keys), now) - now
+        for idx, key in enumerate(keys):
+            window = self._windows.get(key)
+            if window is not None:
+                retry_after = max(retry_after, window.retry_after(now, args[2 * idx] / 1000))
+
+        if retry_after <= 0:
+            return 0.0
+        self._local_rejects.inc()
+        return retry_after
+
+    def record(self, keys: list[str], args: list[int], retry_after: float) -> None:
+        """Запоминает ответ Redis для локального фильтра"""
+        self._redis_checks.inc()
+        if not keys or not self.local_size:
+            return
+
+        now = time.monotonic()
+        if retry_after:
+            # Набор ключей целиком: отказ мог дать любой из них
+            self._redis_rejects.inc()
+            self._remember(self._blocked, tuple(keys), now + retry_after)
+            return
+
+        for idx, key in enumerate(keys):
+            window = self._windows.get(key)
+            if window is None or window.admitted.maxlen != args[2 * idx + 1]:
+                window = _LocalWindow(args[2 * idx + 1])
+            window.admitted.append(now)
+            self._remember(self._windows, key, window)
+
+    def _remember(self, entries: OrderedDict, key, value) -> None:
+        entries[key] = value
+        entries.move_to_end(key)
+        if len(entries) > self.local_size:
+            entries.popitem(last=False)
+
+    async def check(self, event: Update) -> float:
+        """
+        Засчитывает действие и проверяет лимиты.
+
+        Returns:
+            0, если действие разрешено, иначе через сколько секунд повторить
+        """
+        keys, args = self.scopes(event)
+        if not keys:
+            return 0.0
+
+        retry_after = self.precheck(keys, args)
+        if retry_after:
+            return retry_after
+
+        retry_after = await self._script(keys=keys, args=args) / 1000
+        self.record(keys, args, retry_after)
+        return retry_after
+
+
+flood = FloodManager(
+    redis=storage.redis,
+    limits={
+        "message": (settings.antiflood_message_rate, settings.antiflood_message_burst),
+        "callback": (settings.antiflood_callback_rate, settings.antiflood_callback_burst),
+        "chat": (settings.antiflood_chat_rate, settings.antiflood_chat_burst),
+    },
+    local_size=settings.antiflood_local_size
+)
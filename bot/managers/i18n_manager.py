@@ -1,3 +1,5 @@
+from typing import Any
+
 from aiogram.types import User
 from aiogram_i18n.managers import BaseManager
 from redis.asyncio import Redis
@@ -15,7 +17,11 @@ class I18nManager(BaseManager):
         self,
         event_from_user: User,
         redis: Redis,
+        preamble: Any = None,
     ) -> str:
+        # Локаль уже прочитана общим Redis-запросом PreambleMiddleware
+        if preamble is not None and preamble.locale:
+            return preamble.locale
         return await UserService.get_user_locale(redis, event_from_user.id)
 
     async def set_locale(
@@ -0,0 +1,128 @@
+import asyncio
+import os
+import socket
+import uuid
+from typing import Awaitable, Callable
+
+from aiogram import Bot
+from loguru import logger
+from redis.asyncio import Redis
+
+from core.config import settings
+from core.loader import bot, storage
+from .redis_manager import RedisManager
+
+
+class LeaderManager:
+    """
+    Выбор лидера среди процессов бота через Redis-лок.
+
+    При нескольких воркерах uvicorn (или нескольких нодах) только лидер
+    выполняет однократную работу при старте — например, set_webhook —
+    вместо того чтобы все процессы наперегонки дёргали Bot API.
+
+    Лок ставится через SET NX PX и продлевается фоновой задачей, пока процесс
+    жив. Продление и снятие выполняются Lua-скриптом с проверкой токена,
+    чтобы процесс не продлил и не снял чужой лок.
+
+    Ведомые не сдаются после первой попытки: та же фоновая задача раз в
+    треть TTL пробует взять лок, и если лидер умер, новый лидер выполняет
+    on_elected — работу лидера, которая иначе ждала бы перезапуска всех
+    процессов.
+    """
+
+    RENEW_SCRIPT = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    end
+    return 0
+    """
+
+    RELEASE_SCRIPT = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('DEL', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self, redis: Redis, bot: Bot, ttl_ms: int = 30_000) -> None:
+        self.redis = redis
+        self.ttl_ms = ttl_ms
+        self.key = RedisManager.make_key("leader", bot.id)
+        self.token = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+
+        self._renew = redis.register_script(self.RENEW_SCRIPT)
+        self._release = redis.register_script(self.RELEASE_SCRIPT)
+        self._task: asyncio.Task | None = None
+        self._on_elected: Callable[[], Awaitable[None]] | None = None
+
+    async def acquire(self, on_elected: Callable[[], Awaitable[None]] | None = None) -> bool:
+        """
+        Пытается стать лидером и запускает продление лока или повторные попытки.
+
+        Args:
+            on_elected: Работа лидера — выполняется сразу, если лок получен,
+                или позже, когда этот процесс станет лидером
+
+        Returns:
+            True, если лок получен этим процессом
+        """
+        self._on_elected = on_elected
+        if await self._try_acquire():
+            await self._elected()
+        else:
+            logger.info(f"Process {self.token} is a follower")
+
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop(), name="leader-lock")
+        return self.is_leader
+
+    async def release(self) -> None:
+        """Снимает лок, если он принадлежит этому процессу"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        if self.is_leader:
+            await self._release(keys=[self.key], args=[self.token])
+            self.is_leader = False
+
+    async def _try_acquire(self) -> bool:
+        self.is_leader = bool(
+            await self.redis.set(self.key, self.token, px=self.ttl_ms, nx=True)
+        )
+        return self.is_leader
+
+    async def _elected(self) -> None:
+        logger.info(f"Process {self.token} is the leader")
+        if self._on_elected is None:
+            return
+        try:
+            await self._on_elected()
+        except Exception as e:
+            logger.exception(f"Leader startup work failed: {e}")
+
+    async def _loop(self) -> None:
+        """Лидер продлевает лок, ведомый пытается его взять"""
+        interval = self.ttl_ms / 1000 / 3
+
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if self.is_leader:
+                    if not await self._renew(keys=[self.key], args=[self.token, self.ttl_ms]):
+                        self.is_leader = False
+                        logger.warning(f"Process {self.token} lost leadership")
+                elif await self._try_acquire():
+                    await self._elected()
+            except Exception as e:
+                logger.error(f"Failed to renew or acquire leader lock: {e}")
+
+
+leader = LeaderManager(
+    redis=storage.redis,
+    bot=bot,
+    ttl_ms=settings.leader_lock_ttl_ms
+)
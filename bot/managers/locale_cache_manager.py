@@ -0,0 +1,159 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+
+from loguru import logger
+from redis.asyncio import Redis
+
+from core.config import settings
+from core.loader import bot, create_redis, storage
+from core.metrics import metrics
+from .redis_manager import RedisManager
+
+
+class LocaleCacheManager:
+    """
+    L1-кэш локалей пользователей в памяти процесса перед ключом user:{id}:locale.
+
+    Для прогретых пользователей локаль определяется без сетевых запросов.
+    Согласованность между процессами и нодами держится через pub/sub канал:
+    invalidate() удаляет запись локально и публикует user_id, а слушатели
+    остальных процессов удаляют её у себя. Пока подписка не работает,
+    кэш не используется, а после переподключения очищается целиком —
+    пропущенные за это время инвалидации не оставят устаревших локалей.
+
+    Чтобы значение, прочитанное из Redis до пришедшей инвалидации, не легло
+    в кэш после неё, перед чтением берётся epoch, и set() с устаревшим
+    epoch игнорируется.
+
+    Подписка держит соединение постоянно, поэтому слушатель работает через
+    отдельный клиент subscriber, а не через общий пул.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        channel: str,
+        max_size: int = 10_000,
+        ttl: float = 300.0,
+        subscriber: Redis | None = None
+    ) -> None:
+        self.redis = redis
+        self.subscriber = subscriber or redis
+        self.channel = channel
+        self.max_size = max_size
+        self.ttl = ttl
+        # Отличает свои сообщения в канале от сообщений других процессов
+        self.node_id = f"{os.getpid()}:{id(self):x}"
+
+        self._local: OrderedDict[int, tuple[float, str]] = OrderedDict()
+        self.epoch = 0
+        self._subscribed = False
+        self._task: asyncio.Task | None = None
+
+        metrics.gauge("locale_cache_size", func=lambda: len(self._local))
+        self._hits = metrics.counter("locale_cache_hits_total")
+        self._misses = metrics.counter("locale_cache_misses_total")
+        self._local_invalidations = metrics.counter("locale_cache_invalidations_total", source="local")
+        self._remote_invalidations = metrics.counter("locale_cache_invalidations_total", source="remote")
+
+    def get(self, user_id: int) -> str | None:
+        """Локаль из памяти процесса или None"""
+        entry = self._local.get(user_id) if self._subscribed else None
+        if entry is not None:
+            expires_at, locale = entry
+            if expires_at > time.monotonic():
+                self._local.move_to_end(user_id)
+                self._hits.inc()
+                return locale
+            del self._local[user_id]
+
+        self._misses.inc()
+        return None
+
+    def set(self, user_id: int, locale: str, epoch: int) -> None:
+        """
+        Запоминает локаль, если кэш согласован с остальными процессами.
+
+        Args:
+            user_id: ID пользователя
+            locale: Локаль, прочитанная из Redis или БД
+            epoch: Значение self.epoch, взятое до чтения
+        """
+        if not self._subscribed or epoch != self.epoch:
+            return
+
+        self._local[user_id] = (time.monotonic() + self.ttl, locale)
+        self._local.move_to_end(user_id)
+        if len(self._local) > self.max_size:
+            self._local.popitem(last=False)
+
+    async def invalidate(self, user_id: int) -> None:
+        """Удаляет локаль пользователя из кэша во всех процессах"""
+        self._evict(user_id)
+        self._local_invalidations.inc()
+        try:
+            await self.redis.publish(self.channel, f"{self.node_id}:{user_id}")
+        except Exception as e:
+            logger.warning(f"Failed to publish locale invalidation for {user_id}: {e}")
+
+    async def start(self) -> None:
+        """Запускает слушателя канала инвалидаций"""
+        if self._task:
+            return
+        self._task = asyncio.create_task(self._listen_loop(), name="locale-cache-listener")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._reset()
+
+    def _evict(self, user_id: int) -> None:
+        self.epoch += 1
+        self._local.pop(user_id, None)
+
+    def _reset(self) -> None:
+        self.epoch += 1
+        self._subscribed = False
+        self._local.clear()
+
+    async def _listen_loop(self) -> None:
+        while True:
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Locale cache invalidation channel lost: {e}")
+            finally:
+                self._reset()
+            await asyncio.sleep(1)
+
+    async def _listen(self) -> None:
+        pubsub = self.subscriber.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(self.channel)
+            self._subscribed = True
+            logger.debug(f"Locale cache subscribed to {self.channel}")
+
+            async for message in pubsub.listen():
+                data = message["data"]
+                node_id, _, user_id = (data.decode() if isinstance(data, bytes) else data).rpartition(":")
+                if node_id == self.node_id:
+                    continue
+                self._evict(int(user_id))
+                self._remote_invalidations.inc()
+        finally:
+            await pubsub.aclose()
+
+
+locale_cache = LocaleCacheManager(
+    redis=storage.redis,
+    channel=RedisManager.make_key("locale", bot.id, "invalidate"),
+    max_size=settings.locale_cache_size,
+    ttl=settings.locale_cache_ttl,
+    subscriber=create_redis(1)
+)
@@ -0,0 +1,140 @@
+import os
+import weakref
+from collections import OrderedDict
+from hashlib import blake2b
+from typing import Any
+
+from aiogram.types import BufferedInputFile, FSInputFile, URLInputFile
+from loguru import logger
+from redis.asyncio import Redis
+
+from core.config import settings
+from core.loader import bot, storage
+from core.metrics import metrics
+from .redis_manager import RedisManager
+
+
+class MediaRegistryManager:
+    """
+    Реестр file_id загруженных ботом медиа по содержимому источника.
+
+    Ключ — хэш источника и вида медиа (photo/document):
+    - FSInputFile — абсолютный путь, mtime и размер файла;
+    - BufferedInputFile — содержимое;
+    - URL (строкой или URLInputFile) — сам URL.
+    Строки, не похожие на URL, — уже file_id и в реестр не попадают.
+
+    file_id действителен только для бота, который его получил, поэтому
+    ключи в Redis содержат ID бота: media:{bot_id}:{вид}:{хэш}. Перед Redis —
+    LRU в памяти процесса: file_id не меняется, инвалидация не нужна.
+    Template подставляет найденный file_id вместо повторной загрузки и
+    запоминает file_id после первой успешной отправки.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        prefix: str,
+        local_size: int = 1000,
+        ttl: int = 30 * 86400
+    ) -> None:
+        self.redis = redis
+        self.prefix = prefix
+        self.local_size = local_size
+        self.ttl = ttl
+        self._local: OrderedDict[str, str] = OrderedDict()
+        # Хэш содержимого BufferedInputFile считается один раз на объект, а не на отправку
+        self._digests: weakref.WeakKeyDictionary[BufferedInputFile, str] = weakref.WeakKeyDictionary()
+
+        self._hits = metrics.counter("media_registry_hits_total")
+        self._misses = metrics.counter("media_registry_misses_total")
+
+    def key(self, media: Any, kind: str) -> str | None:
+        """Ключ медиа в реестре или None, если кэшировать нечего"""
+        if isinstance(media, str):
+            if not media.startswith(("http://", "https://")):
+                return None
+            source = f"url:{media}".encode()
+        elif isinstance(media, URLInputFile):
+            source = f"url:{media.url}".encode()
+        elif isinstance(media, FSInputFile):
+            try:
+                stat = os.stat(media.path)
+            except OSError:
+                return None
+            source = f"file:{os.path.abspath(media.path)}:{stat.st_mtime_ns}:{stat.st_size}".encode()
+        elif isinstance(media, BufferedInputFile):
+            digest = self._digests.get(media)
+            if digest is None:
+                digest = self._digests[media] = blake2b(b"data:" + media.data, digest_size=16).hexdigest()
+            return RedisManager.make_key(self.prefix, kind, digest)
+        else:
+            return None
+        return RedisManager.make_key(self.prefix, kind, blake2b(source, digest_size=16).hexdigest())
+
+    async def resolve(self, items: list[tuple[Any, str]]) -> list[str | None]:
+        """
+        file_id для каждого (медиа, вид) или None.
+
+        Промахи LRU запрашиваются одним MGET; ошибки Redis считаются промахом.
+        """
+        keys = [self.key(media, kind) for media, kind in items]
+        file_ids: list[str | None] = [None] * len(items)
+        missing: list[int] = []
+        for index, key in enumerate(keys):
+            if key is None:
+                continue
+            file_id = self._local.get(key)
+            if file_id is not None:
+                self._local.move_to_end(key)
+                file_ids[index] = file_id
+            else:
+                missing.append(index)
+
+        if missing:
+            try:
+                values = await self.redis.mget([keys[index] for index in missing])
+            except Exception as e:
+                logger.warning(f"Media registry read failed: {e}")
+                values = [None] * len(missing)
+            for index, value in zip(missing, values):
+                if value is not None:
+                    file_ids[index] = value.decode() if isinstance(value, bytes) else value
+                    self._remember_local(keys[index], file_ids[index])
+
+        for key, file_id in zip(keys, file_ids):
+            if key is not None:
+                (self._hits if file_id is not None else self._misses).inc()
+        return file_ids
+
+    async def remember(self, items: list[tuple[Any, str, str]]) -> None:
+        """Запоминает file_id для каждого (медиа, вид, file_id)"""
+        entries = {}
+        for media, kind, file_id in items:
+            key = self.key(media, kind)
+            if key is not None:
+                entries[key] = file_id
+                self._remember_local(key, file_id)
+        if not entries:
+            return
+
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key, file_id in entries.items():
+                    pipe.set(key, file_id, ex=self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Media registry write failed: {e}")
+
+    def _remember_local(self, key: str, file_id: str) -> None:
+        self._local[key] = file_id
+        self._local.move_to_end(key)
+        if len(self._local) > self.local_size:
+            self._local.popitem(last=False)
+
+
+media_registry = MediaRegistryManager(
+    redis=storage.redis,
+    prefix=RedisManager.make_key("media", bot.id),
+    local_size=settings.media_registry_local_size
+)
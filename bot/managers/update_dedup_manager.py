@@ -0,0 +1,126 @@
+from collections import deque
+
+from aiogram import Bot
+from loguru import logger
+from redis.asyncio import Redis
+
+from core.config import settings
+from core.loader import bot, storage
+from core.metrics import metrics
+from .redis_manager import RedisManager
+
+
+class UpdateDedupManager:
+    """
+    Отсеивает повторные доставки одного и того же update_id.
+
+    Telegram повторяет webhook, если ответ задержался, и без этой проверки
+    обновление обрабатывается дважды. Проверка в два уровня:
+
+    - локальное окно последних window идентификаторов (set + deque) —
+      повторы, пришедшие на ту же ноду, отсекаются без обращения к Redis;
+    - битовая карта в Redis, общая для всех нод: update_id раскладывается
+      на чанк (ключ) и смещение, SETBIT атомарно ставит бит и возвращает
+      предыдущее значение. Идентификаторы идут подряд, поэтому живут один-два
+      чанка по 128 КБ, а старые удаляются по TTL.
+
+    update_id отмечается сразу при проверке, чтобы одновременные доставки на
+    разные ноды не прошли обе. Если передать обновление дальше не удалось,
+    отметку снимает forget(), и повтор от Telegram будет обработан.
+    """
+
+    CHUNK_BITS = 1 << 20
+
+    def __init__(
+        self,
+        redis: Redis | None,
+        bot: Bot,
+        enabled: bool = True,
+        window: int = 10_000,
+        ttl: int = 3600
+    ) -> None:
+        self.redis = redis
+        self.enabled = enabled
+        self.ttl = ttl
+        self.key_prefix = RedisManager.make_key("dedup", bot.id)
+
+        self._seen: set[int] = set()
+        self._order: deque[int] = deque()
+        self._window = window
+
+        metrics.gauge("update_dedup_window_size", func=lambda: len(self._seen))
+        self._local_duplicates = metrics.counter("update_duplicates_total", source="local")
+        self._redis_duplicates = metrics.counter("update_duplicates_total", source="redis")
+
+    async def is_duplicate(self, update_id: int) -> bool:
+        """
+        Отмечает update_id как увиденный и сообщает, встречался ли он раньше.
+
+        Ошибки Redis не блокируют обработку: обновление считается новым.
+        """
+        if not self.enabled:
+            return False
+
+        if update_id in self._seen:
+            self._local_duplicates.inc()
+            logger.debug(f"Duplicate update {update_id} dropped (local)")
+            return True
+
+        self._remember(update_id)
+
+        if self.redis is None:
+            return False
+
+        chunk, offset = divmod(update_id, self.CHUNK_BITS)
+        key = RedisManager.make_key(self.key_prefix, chunk)
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.setbit(key, offset, 1)
+            pipe.expire(key, self.ttl)
+            previous, _ = await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Dedup check failed for update {update_id}: {e}")
+            return False
+
+        if previous:
+            self._redis_duplicates.inc()
+            logger.debug(f"Duplicate update {update_id} dropped (redis)")
+            return True
+
+        return False
+
+    async def forget(self, update_id: int) -> None:
+        """
+        Снимает отметку update_id после неудачной передачи обновления.
+
+        Ошибки Redis только логируются: в худшем случае повтор будет отброшен,
+        как и до исправления.
+        """
+        if not self.enabled:
+            return
+
+        self._seen.discard(update_id)
+
+        if self.redis is None:
+            return
+
+        chunk, offset = divmod(update_id, self.CHUNK_BITS)
+        try:
+            await self.redis.setbit(RedisManager.make_key(self.key_prefix, chunk), offset, 0)
+        except Exception as e:
+            logger.warning(f"Failed to forget update {update_id}: {e}")
+
+    def _remember(self, update_id: int) -> None:
+        self._seen.add(update_id)
+        self._order.append(update_id)
+        if len(self._order) > self._window:
+            self._seen.discard(self._order.popleft())
+
+
+update_dedup = UpdateDedupManager(
+    redis=storage.redis if settings.update_dedup_redis else None,
+    bot=bot,
+    enabled=settings.update_dedup_enabled,
+    window=settings.update_dedup_window,
+    ttl=settings.update_dedup_ttl
+)
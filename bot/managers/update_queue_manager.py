@@ -0,0 +1,175 @@
+import asyncio
+import time
+
+from aiogram import Bot, Dispatcher
+from aiogram.methods import TelegramMethod
+from loguru import logger
+
+from core.config import settings
+from core.loader import dispatcher, bot
+from core.metrics import metrics
+from utils import RawUpdate, build_update, get_routing_key
+from .admission_manager import AdmissionManager, admission
+
+
+class UpdateQueueManager:
+    """
+    Планировщик обновлений по дорожкам (lanes).
+
+    Обновление попадает в дорожку по chat_id (или user_id), поэтому сообщения
+    одного чата обрабатываются строго по порядку и не гоняются друг с другом
+    в UserRegistrationMiddleware и FSM, а разные дорожки работают параллельно.
+
+    У каждой дорожки своя ограниченная очередь и один воркер. Когда очередь
+    дорожки заполнена, put() ждёт свободного места — это backpressure
+    для webhook или консьюмера стрима.
+
+    При перегрузке put() спрашивает AdmissionManager и не ставит в очередь
+    низкоприоритетные обновления: они считаются обработанными.
+
+    Порядок внутри чата гарантируется только в пределах процесса: при
+    APP_WORKERS > 1 запросы одного чата попадают в разные воркеры uvicorn.
+    Для нескольких процессов нужен режим stream.
+    """
+
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        lanes: int = 16,
+        lane_size: int = 100,
+        admission: AdmissionManager | None = None
+    ) -> None:
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.admission = admission
+        self.lanes: list[asyncio.Queue[tuple[float, RawUpdate, asyncio.Future]]] = [
+            asyncio.Queue(maxsize=lane_size) for _ in range(lanes)
+        ]
+        self._tasks: list[asyncio.Task] = []
+
+        metrics.gauge("update_queue_depth", func=self.qsize)
+        self._wait_time = [
+            metrics.histogram("update_lane_wait_seconds", lane=idx) for idx in range(lanes)
+        ]
+        self._process_time = [
+            metrics.histogram("update_lane_process_seconds", lane=idx) for idx in range(lanes)
+        ]
+        for idx, lane in enumerate(self.lanes):
+            metrics.gauge("update_lane_depth", func=lane.qsize, lane=idx)
+        self._processed = metrics.counter("update_queue_processed_total")
+        self._failed = metrics.counter("update_queue_failed_total")
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def qsize(self) -> int:
+        """Суммарное количество обновлений во всех дорожках"""
+        return sum(lane.qsize() for lane in self.lanes)
+
+    def lane_for(self, raw_update: RawUpdate) -> int:
+        """Номер дорожки для обновления"""
+        return get_routing_key(raw_update) % len(self.lanes)
+
+    async def start(self) -> None:
+        """Запускает по одному воркеру на дорожку"""
+        if self._tasks:
+            return
+
+        self._tasks = [
+            asyncio.create_task(self._worker(idx), name=f"update-lane-{idx}")
+            for idx in range(len(self.lanes))
+        ]
+        logger.info(
+            f"Update lanes started: {len(self.lanes)} lanes, "
+            f"max size {self.lanes[0].maxsize} per lane"
+        )
+
+    async def put(self, raw_update: RawUpdate) -> asyncio.Future:
+        """
+        Ставит обновление в его дорожку, ожидая места, если она заполнена.
+
+        Returns:
+            Future, который завершится True/False после обработки обновления
+            (сразу True, если обновление отброшено при перегрузке)
+        """
+        done = asyncio.get_running_loop().create_future()
+        if self.admission and not self.admission.admit(raw_update, depth=self.qsize()):
+            done.set_result(True)
+            return done
+
+        await self.lanes[self.lane_for(raw_update)].put((time.monotonic(), raw_update, done))
+        return done
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """
+        Дожидается обработки оставшихся обновлений и останавливает воркеры.
+
+        Args:
+            timeout: Сколько секунд ждать опустошения дорожек
+        """
+        if not self._tasks:
+            return
+
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(lane.join() for lane in self.lanes)),
+                timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Update lanes drain timed out, {self.qsize()} updates left unprocessed"
+            )
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Update lanes stopped")
+
+    async def _worker(self, idx: int) -> None:
+        lane = self.lanes[idx]
+        wait_time = self._wait_time[idx]
+        process_time = self._process_time[idx]
+
+        while True:
+            enqueued_at, raw_update, done = await lane.get()
+            started_at = time.monotonic()
+            wait_time.observe(started_at - enqueued_at)
+
+            success = False
+            try:
+                await self._process(raw_update)
+                self._processed.inc()
+                success = True
+            except Exception as e:
+                self._failed.inc()
+                logger.exception(
+                    f"Failed to process update {raw_update.get('update_id')}: {e}"
+                )
+            finally:
+                elapsed = time.monotonic() - started_at
+                process_time.observe(elapsed)
+                if self.admission:
+                    self.admission.observe(elapsed)
+                if not done.done():
+                    done.set_result(success)
+                lane.task_done()
+
+    async def _process(self, raw_update: RawUpdate) -> None:
+        update = build_update(self.bot, raw_update)
+        response = await self.dispatcher.feed_update(self.bot, update)
+
+        # Ответ хендлера в виде метода API здесь уже нельзя вернуть в webhook
+        if isinstance(response, TelegramMethod):
+            await self.dispatcher.silent_call_request(self.bot, response)
+
+
+update_queue = UpdateQueueManager(
+    dispatcher=dispatcher,
+    bot=bot,
+    lanes=settings.update_lanes,
+    lane_size=settings.update_lane_size,
+    admission=admission
+)
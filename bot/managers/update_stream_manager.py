@@ -0,0 +1,362 @@
+import asyncio
+import os
+import socket
+from functools import partial
+
+import msgspec
+from aiogram import Bot
+from loguru import logger
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+
+from core.config import settings
+from core.loader import bot, create_redis, storage
+from core.metrics import metrics
+from utils import decode_update
+from .redis_manager import RedisManager
+from .update_queue_manager import UpdateQueueManager, update_queue
+
+
+class UpdateStreamManager:
+    """
+    Долговечная очередь обновлений на Redis Streams.
+
+    Webhook любой ноды делает XADD сырого тела запроса и сразу отвечает 200.
+    Воркеры на любых нодах читают стрим через consumer group (XREADGROUP),
+    обрабатывают записи через дорожки UpdateQueueManager, подтверждают
+    обработку через XACK, а записи упавших воркеров, висящие
+    в PEL дольше claim_idle_ms, забирают себе через XCLAIM. Записи, которые
+    не удалось обработать max_deliveries раз, переносятся в dead-стрим.
+
+    XREADGROUP блокирует соединение до block_ms, поэтому консьюмеры читают
+    через отдельный клиент reader, а не через общий пул.
+
+    Консьюмер не ждёт обработки пачки: каждая запись подтверждается, как
+    только её обработала дорожка, и медленный чат не задерживает остальные.
+    Число записей в обработке ограничено max_inflight, подтверждения
+    копятся и уходят одним XACK из фоновой задачи.
+    """
+
+    FIELD = b"u"
+
+    def __init__(
+        self,
+        redis: Redis,
+        scheduler: UpdateQueueManager,
+        bot: Bot,
+        group: str = "bot-workers",
+        consumers: int = 1,
+        maxlen: int = 100_000,
+        batch_size: int = 16,
+        block_ms: int = 5000,
+        claim_idle_ms: int = 60_000,
+        max_deliveries: int = 5,
+        max_inflight: int = 256,
+        reader: Redis | None = None
+    ) -> None:
+        self.redis = redis
+        self.reader = reader or redis
+        self.scheduler = scheduler
+        self.group = group
+        self.consumers = consumers
+        self.maxlen = maxlen
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self.claim_idle_ms = claim_idle_ms
+        self.max_deliveries = max_deliveries
+
+        self.stream_key = RedisManager.make_key("updates", bot.id)
+        self.dead_key = RedisManager.make_key("updates", bot.id, "dead")
+        self.consumer_prefix = f"{socket.gethostname()}:{os.getpid()}"
+
+        self._stopping = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+        self._ack_task: asyncio.Task | None = None
+
+        self._slots = asyncio.Semaphore(max_inflight)
+        self._inflight: set[asyncio.Future] = set()
+        # Записи, прочитанные этим процессом и ещё не подтверждённые: claim_stale их не трогает
+        self._owned: set[bytes] = set()
+        self._acks: list[bytes] = []
+        self._ack_wakeup = asyncio.Event()
+
+        self._published = metrics.counter("update_stream_published_total")
+        self._processed = metrics.counter("update_stream_processed_total")
+        self._failed = metrics.counter("update_stream_failed_total")
+        self._claimed = metrics.counter("update_stream_claimed_total")
+        self._dead = metrics.counter("update_stream_dead_total")
+        self._pending = metrics.gauge("update_stream_pending")
+        metrics.gauge("update_stream_inflight", func=lambda: len(self._inflight))
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def publish(self, body: bytes) -> None:
+        """Добавляет сырое тело webhook-запроса в стрим"""
+        await self.redis.xadd(
+            self.stream_key,
+            {self.FIELD: body},
+            maxlen=self.maxlen,
+            approximate=True
+        )
+        self._published.inc()
+
+    async def ensure_group(self) -> None:
+        """Создаёт consumer group (и сам стрим), если их ещё нет"""
+        try:
+            await self.redis.xgroup_create(self.stream_key, self.group, id="0", mkstream=True)
+            logger.info(f"Created consumer group {self.group} for {self.stream_key}")
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def start(self) -> None:
+        """Запускает консьюмеры и периодический захват зависших записей"""
+        if self._tasks or self.consumers <= 0:
+            return
+
+        await self.ensure_group()
+        self._stopping.clear()
+
+        self._tasks = [
+            asyncio.create_task(
+                self._consume(f"{self.consumer_prefix}:{idx}"),
+                name=f"update-stream-consumer-{idx}"
+            )
+            for idx in range(self.consumers)
+        ]
+        self._tasks.append(
+            asyncio.create_task(self._claim_loop(), name="update-stream-claimer")
+        )
+        self._ack_task = asyncio.create_task(self._ack_loop(), name="update-stream-acker")
+        logger.info(
+            f"Update stream consumers started: {self.consumers} on {self.consumer_prefix}"
+        )
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """
+        Останавливает консьюмеры.
+
+        Консьюмеры перестают читать стрим, записи в обработке дорабатываются
+        и подтверждаются; всё, что не успело подтвердиться, останется в PEL
+        и будет забрано другими воркерами.
+        """
+        if not self._tasks:
+            return
+
+        self._stopping.set()
+        _, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        if self._inflight:
+            await asyncio.wait(self._inflight, timeout=timeout)
+        if self._ack_task:
+            self._ack_task.cancel()
+            await asyncio.gather(self._ack_task, return_exceptions=True)
+            self._ack_task = None
+        await self._flush_acks()
+        logger.info("Update stream consumers stopped")
+
+    async def _consume(self, consumer: str) -> None:
+        while not self._stopping.is_set():
+            try:
+                response = await self.reader.xreadgroup(
+                    self.group,
+                    consumer,
+                    {self.stream_key: ">"},
+                    count=self.batch_size,
+                    block=self.block_ms
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Failed to read update stream: {e}")
+                await asyncio.sleep(1)
+                continue
+
+            for _, entries in response or ():
+                await self._handle_entries(entries)
+
+    async def _claim_loop(self) -> None:
+        """Периодически забирает записи, зависшие у упавших воркеров"""
+        consumer = f"{self.consumer_prefix}:claimer"
+        interval = self.claim_idle_ms / 1000 / 2
+
+        while not self._stopping.is_set():
+            try:
+                await self.claim_stale(consumer)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Failed to claim stale updates: {e}")
+
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def claim_stale(self, consumer: str) -> int:
+        """
+        Забирает и обрабатывает записи, не подтверждённые дольше claim_idle_ms.
+
+        Записи, которые этот процесс ещё обрабатывает (или ждут своей очереди
+        в дорожках), не забираются: иначе они обработались бы дважды, а
+        times_delivered довёл бы живое обновление до мёртвого стрима.
+        Необработанные из-за ошибки записи этого процесса забираются как обычно.
+
+        Returns:
+            Количество забранных записей
+        """
+        summary = await self.redis.xpending(self.stream_key, self.group)
+        self._pending.set(summary["pending"])
+        if not summary["pending"]:
+            return 0
+
+        stale = await self.redis.xpending_range(
+            self.stream_key,
+            self.group,
+            min="-",
+            max="+",
+            count=self.batch_size * self.consumers,
+            idle=self.claim_idle_ms
+        )
+        stale = [item for item in stale if item["message_id"] not in self._owned]
+        if not stale:
+            return 0
+
+        deliveries = {item["message_id"]: item["times_delivered"] for item in stale}
+        claimed = await self.redis.xclaim(
+            self.stream_key,
+            self.group,
+            consumer,
+            min_idle_time=self.claim_idle_ms,
+            message_ids=list(deliveries)
+        )
+
+        retry: list[tuple[bytes, dict[bytes, bytes]]] = []
+        for entry_id, fields in claimed:
+            # Запись могла быть удалена тримингом MAXLEN, пока висела в PEL
+            if not fields:
+                await self.redis.xack(self.stream_key, self.group, entry_id)
+                continue
+
+            self._claimed.inc()
+            if deliveries.get(entry_id, 0) >= self.max_deliveries:
+                await self._move_to_dead(entry_id, fields)
+            else:
+                retry.append((entry_id, fields))
+
+        if retry:
+            # Захват редкий: дожидаемся обработки, чтобы не забрать записи повторно
+            submitted = await self._handle_entries(retry)
+            await asyncio.wait(submitted)
+            await self._flush_acks()
+
+        return len(claimed)
+
+    async def _handle_entries(self, entries: list[tuple[bytes, dict[bytes, bytes]]]) -> list[asyncio.Future]:
+        """
+        Передаёт записи в дорожки планировщика, не дожидаясь их обработки.
+
+        Порядок обновлений одного чата сохраняется: записи ставятся в дорожки
+        в порядке стрима. Успешно обработанная запись попадает в очередь
+        подтверждений, как только завершится её future.
+
+        Returns:
+            Future обработки каждой переданной записи
+        """
+        submitted: list[asyncio.Future] = []
+        # Вся пачка — своя, пока записи ждут места в дорожках
+        self._owned.update(entry_id for entry_id, _ in entries)
+        for idx, (entry_id, fields) in enumerate(entries):
+            try:
+                raw_update = decode_update(fields[self.FIELD])
+            except (msgspec.DecodeError, KeyError):
+                logger.error(f"Malformed update in stream entry {entry_id!r}")
+                self._owned.discard(entry_id)
+                await self._move_to_dead(entry_id, fields)
+                continue
+
+            acquired = False
+            try:
+                await self._slots.acquire()
+                acquired = True
+                done = await self.scheduler.put(raw_update)
+            except BaseException:
+                if acquired:
+                    self._slots.release()
+                # Не переданные в дорожки записи остаются в PEL для claim_stale
+                self._owned.difference_update(pending_id for pending_id, _ in entries[idx:])
+                raise
+            self._inflight.add(done)
+            done.add_done_callback(partial(self._on_done, entry_id))
+            submitted.append(done)
+
+        return submitted
+
+    def _on_done(self, entry_id: bytes, done: asyncio.Future) -> None:
+        self._inflight.discard(done)
+        self._slots.release()
+        if not done.cancelled() and done.result():
+            self._acks.append(entry_id)
+            self._ack_wakeup.set()
+        else:
+            # Не подтверждаем: запись останется в PEL и будет переобработана
+            self._owned.discard(entry_id)
+            self._failed.inc()
+
+    async def _ack_loop(self) -> None:
+        while True:
+            await self._ack_wakeup.wait()
+            self._ack_wakeup.clear()
+            try:
+                await self._flush_acks()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Failed to ack stream entries: {e}")
+                await asyncio.sleep(1)
+                self._ack_wakeup.set()
+
+    async def _flush_acks(self) -> None:
+        """Подтверждает накопленные записи одним XACK"""
+        if not self._acks:
+            return
+
+        acks, self._acks = self._acks, []
+        try:
+            await self.redis.xack(self.stream_key, self.group, *acks)
+        except BaseException:
+            # Вернём в очередь: запись без XACK иначе будет обработана повторно
+            self._acks[:0] = acks
+            raise
+        self._owned.difference_update(acks)
+        self._processed.inc(len(acks))
+
+    async def _move_to_dead(self, entry_id: bytes, fields: dict[bytes, bytes]) -> None:
+        pipe = self.redis.pipeline()
+        pipe.xadd(self.dead_key, fields, maxlen=self.maxlen, approximate=True)
+        pipe.xack(self.stream_key, self.group, entry_id)
+        await pipe.execute()
+        self._dead.inc()
+        logger.warning(f"Stream entry {entry_id!r} moved to {self.dead_key}")
+
+
+update_stream = UpdateStreamManager(
+    redis=storage.redis,
+    scheduler=update_queue,
+    bot=bot,
+    group=settings.update_stream_group,
+    consumers=settings.update_stream_consumers,
+    maxlen=settings.update_stream_maxlen,
+    batch_size=settings.update_stream_batch_size,
+    block_ms=settings.update_stream_block_ms,
+    claim_idle_ms=settings.update_stream_claim_idle_ms,
+    max_deliveries=settings.update_stream_max_deliveries,
+    max_inflight=settings.update_stream_max_inflight,
+    reader=create_redis(max(settings.update_stream_consumers, 1))
+)
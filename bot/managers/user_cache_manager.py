@@ -0,0 +1,206 @@
+import time
+from collections import OrderedDict
+from datetime import datetime
+from hashlib import blake2b
+
+import msgspec
+from loguru import logger
+from redis.asyncio import Redis
+
+from core.config import settings
+from core.loader import storage
+from core.metrics import metrics
+from models import BotUser
+from .redis_manager import RedisManager
+
+
+class CachedUser(msgspec.Struct, array_like=True):
+    """Снимок строки users в Redis"""
+    username: str | None
+    full_name: str
+    language_code: str
+    is_banned: bool
+    created_at: datetime
+    updated_at: datetime
+
+
+_encoder = msgspec.msgpack.Encoder()
+_decoder = msgspec.msgpack.Decoder(CachedUser)
+
+
+class UserCacheManager:
+    """
+    Кэш зарегистрированных пользователей для UserRegistrationMiddleware.
+
+    Хранит снимок строки BotUser в два уровня:
+    - LRU в памяти процесса — неизменяемые снимки с коротким TTL,
+      чтобы изменения из других процессов подхватывались быстро;
+    - Redis — тот же снимок, общий для всех процессов и нод.
+
+    get() каждый раз собирает новый BotUser из снимка: одновременные
+    хендлеры не делят один изменяемый экземпляр, а правки вызывающего
+    попадают в кэш только через set() или remember().
+
+    Если отпечаток (username, full_name, language_code, is_banned) данных
+    из Telegram совпадает с отпечатком закэшированной строки, Postgres
+    не трогается вовсе. Любая запись в строку пользователя должна
+    сопровождаться set() или invalidate().
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        max_size: int = 10_000,
+        local_ttl: float = 60.0,
+        ttl: int = 86400
+    ) -> None:
+        self.redis = redis
+        self.max_size = max_size
+        self.local_ttl = local_ttl
+        self.ttl = ttl
+        self._local: OrderedDict[int, tuple[float, CachedUser]] = OrderedDict()
+
+        metrics.gauge("user_cache_size", func=lambda: len(self._local))
+        self._hits_local = metrics.counter("user_cache_hits_total", source="local")
+        self._hits_redis = metrics.counter("user_cache_hits_total", source="redis")
+        self._misses = metrics.counter("user_cache_misses_total")
+
+    @staticmethod
+    def make_fingerprint(
+        username: str | None,
+        full_name: str,
+        language_code: str | None,
+        is_banned: bool
+    ) -> str:
+        """Короткий хэш полей пользователя, которые синхронизируются из Telegram"""
+        raw = "\x1f".join((username or "", full_name, language_code or "", str(int(is_banned))))
+        return blake2b(raw.encode(), digest_size=8).hexdigest()
+
+    @classmethod
+    def fingerprint_of(cls, bot_user: BotUser) -> str:
+        return cls.make_fingerprint(
+            bot_user.username,
+            bot_user.full_name,
+            bot_user.language_code,
+            bot_user.is_banned
+        )
+
+    @staticmethod
+    def key(user_id: int) -> str:
+        """Ключ снимка пользователя в Redis"""
+        return RedisManager.make_key("user", user_id, "row")
+
+    async def get(self, user_id: int) -> BotUser | None:
+        """
+        Возвращает закэшированного пользователя без обращения к БД.
+
+        Ошибки Redis считаются промахом.
+        """
+        entry = self._local.get(user_id)
+        if entry is not None:
+            expires_at, cached = entry
+            if expires_at > time.monotonic():
+                self._local.move_to_end(user_id)
+                self._hits_local.inc()
+                return self._build(user_id, cached)
+            del self._local[user_id]
+
+        try:
+            raw = await self.redis.get(self.key(user_id))
+        except Exception as e:
+            logger.warning(f"User cache read failed for {user_id}: {e}")
+            raw = None
+
+        if raw is None:
+            self._misses.inc()
+            return None
+
+        self._hits_redis.inc()
+        return self.load(user_id, raw)
+
+    def load(self, user_id: int, raw: bytes) -> BotUser:
+        """Восстанавливает пользователя из снимка, прочитанного из Redis, и кладёт снимок в LRU"""
+        cached = _decoder.decode(raw)
+        self._remember(user_id, cached)
+        return self._build(user_id, cached)
+
+    @staticmethod
+    def _snapshot(bot_user: BotUser) -> CachedUser:
+        return CachedUser(
+            username=bot_user.username,
+            full_name=bot_user.full_name,
+            language_code=bot_user.language_code,
+            is_banned=bot_user.is_banned,
+            created_at=bot_user.created_at,
+            updated_at=bot_user.updated_at
+        )
+
+    @staticmethod
+    def _build(user_id: int, cached: CachedUser) -> BotUser:
+        """
+        Новый экземпляр BotUser из снимка.
+
+        Экземпляр не помечен как загруженный из БД, поэтому сохранять его
+        можно только с update_fields (UPDATE по id), как это и делает UserService.
+        """
+        return BotUser(
+            id=user_id,
+            username=cached.username,
+            full_name=cached.full_name,
+            language_code=cached.language_code,
+            is_banned=cached.is_banned,
+            created_at=cached.created_at,
+            updated_at=cached.updated_at
+        )
+
+    async def set(self, bot_user: BotUser) -> None:
+        """Кладёт актуальное состояние пользователя в оба уровня кэша"""
+        cached = self._snapshot(bot_user)
+        self._remember(bot_user.id, cached)
+
+        try:
+            await self.redis.set(self.key(bot_user.id), _encoder.encode(cached), ex=self.ttl)
+        except Exception as e:
+            logger.warning(f"User cache write failed for {bot_user.id}: {e}")
+
+    async def invalidate(self, user_id: int) -> None:
+        """Сбрасывает пользователя из кэша после записи в БД в обход кэша"""
+        self._local.pop(user_id, None)
+        try:
+            await self.redis.delete(self.key(user_id))
+        except Exception as e:
+            logger.warning(f"User cache invalidation failed for {user_id}: {e}")
+
+    async def invalidate_many(self, user_ids: list[int]) -> None:
+        """Сбрасывает пользователей из кэша одним DEL после пакетной записи в БД"""
+        if not user_ids:
+            return
+        for user_id in user_ids:
+            self._local.pop(user_id, None)
+        try:
+            await self.redis.delete(*(self.key(user_id) for user_id in user_ids))
+        except Exception as e:
+            logger.warning(f"User cache invalidation failed for {len(user_ids)} users: {e}")
+
+    def contains(self, user_id: int) -> bool:
+        """Есть ли живая запись о пользователе в LRU процесса"""
+        entry = self._local.get(user_id)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def remember(self, bot_user: BotUser) -> None:
+        """Кладёт снимок пользователя только в LRU процесса, не трогая Redis"""
+        self._remember(bot_user.id, self._snapshot(bot_user))
+
+    def _remember(self, user_id: int, cached: CachedUser) -> None:
+        self._local[user_id] = (time.monotonic() + self.local_ttl, cached)
+        self._local.move_to_end(user_id)
+        if len(self._local) > self.max_size:
+            self._local.popitem(last=False)
+
+
+user_cache = UserCacheManager(
+    redis=storage.redis,
+    max_size=settings.user_cache_size,
+    local_ttl=settings.user_cache_local_ttl,
+    ttl=settings.user_cache_ttl
+)
@@ -0,0 +1,220 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Iterable
+
+from loguru import logger
+
+from core.config import settings
+from core.metrics import metrics
+from models import BotUser
+from .user_cache_manager import UserCacheManager, user_cache
+
+
+FLUSH_SIZE_BUCKETS = (1, 10, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class UserWriteError(Exception):
+    """Буфер записи пользователей заполнен, а БД недоступна"""
+
+
+class UserWriterManager:
+    """
+    Write-behind буфер для записи пользователей в БД.
+
+    Новые и изменённые BotUser копятся в памяти и сбрасываются раз в interval
+    секунд или при накоплении batch_size строк одним
+    INSERT ... ON CONFLICT (id) DO UPDATE на группу строк с одинаковым
+    набором изменённых колонок.
+
+    Пока строка не записана, get() возвращает её из буфера (read-your-writes),
+    а снимок в Redis обновляется только после успешной записи, чтобы
+    другие процессы не считали пользователя сохранённым раньше времени.
+    Если в буфере max_pending строк, put() ждёт сброса. max_pending — жёсткий
+    предел: после неудачного сброса попытки откладываются с растущей паузой
+    (до max_backoff секунд), а put() в заполненный буфер поднимает
+    UserWriteError — обновление завершится ошибкой, но память не растёт,
+    пока Postgres недоступен.
+    """
+
+    SYNCED_FIELDS = ("username", "full_name", "language_code", "is_banned")
+
+    def __init__(
+        self,
+        cache: UserCacheManager,
+        interval: float = 0.3,
+        batch_size: int = 500,
+        max_pending: int = 5000,
+        max_backoff: float = 30.0
+    ) -> None:
+        self.cache = cache
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.max_backoff = max_backoff
+
+        # user_id -> (пользователь, изменённые колонки или None для новой строки)
+        self._pending: dict[int, tuple[BotUser, set[str] | None]] = {}
+        self._flushing: dict[int, tuple[BotUser, set[str] | None]] = {}
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        # После неудачного сброса следующий — не раньше retry_at
+        self._backoff = 0.0
+        self._retry_at = 0.0
+
+        metrics.gauge("user_write_pending", func=lambda: len(self._pending))
+        self._flush_size = metrics.histogram("user_write_flush_size", buckets=FLUSH_SIZE_BUCKETS)
+        self._flush_time = metrics.histogram("user_write_flush_seconds")
+        self._failed = metrics.counter("user_write_failed_total")
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def get(self, user_id: int) -> BotUser | None:
+        """Пользователь, ещё не записанный в БД, или None"""
+        entry = self._pending.get(user_id) or self._flushing.get(user_id)
+        return entry[0] if entry else None
+
+    async def put(self, bot_user: BotUser, fields: Iterable[str] | None = None) -> None:
+        """
+        Ставит пользователя в очередь на запись.
+
+        Args:
+            bot_user: Актуальное состояние пользователя
+            fields: Изменённые колонки; None — новая строка
+
+        Raises:
+            UserWriteError: Буфер заполнен, и сбросить его не удалось
+        """
+        if len(self._pending) >= self.max_pending and bot_user.id not in self._pending:
+            if time.monotonic() >= self._retry_at:
+                await self.flush()
+            if len(self._pending) >= self.max_pending:
+                raise UserWriteError(f"User write buffer is full ({len(self._pending)} rows), database unavailable")
+
+        bot_user.updated_at = datetime.now(timezone.utc)
+        if bot_user.created_at is None:
+            bot_user.created_at = bot_user.updated_at
+
+        self._merge(bot_user, None if fields is None else set(fields))
+
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        """Запускает периодический сброс буфера"""
+        if self._task:
+            return
+        self._task = asyncio.create_task(self._flush_loop(), name="user-writer")
+        logger.info(f"User write-behind started: every {self.interval}s or {self.batch_size} rows")
+
+    async def stop(self) -> None:
+        """Останавливает сброс по таймеру и записывает всё, что осталось в буфере"""
+        if not self._task:
+            return
+
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+        await self.flush()
+        if self._pending:
+            logger.error(f"User write-behind stopped with {len(self._pending)} unsaved users")
+        else:
+            logger.info("User write-behind stopped")
+
+    async def flush(self) -> int:
+        """
+        Записывает накопленных пользователей в БД.
+
+        Returns:
+            Количество записанных строк
+        """
+        async with self._lock:
+            if not self._pending:
+                return 0
+
+            self._flushing, self._pending = self._pending, {}
+            started_at = time.monotonic()
+
+            groups: dict[frozenset[str] | None, list[BotUser]] = {}
+            for bot_user, fields in self._flushing.values():
+                key = None if fields is None else frozenset(fields)
+                groups.setdefault(key, []).append(self._row(bot_user))
+
+            try:
+                for fields, users in groups.items():
+                    update_fields = sorted(fields) if fields is not None else list(self.SYNCED_FIELDS)
+                    await BotUser.bulk_create(
+                        users,
+                        on_conflict=["id"],
+                        update_fields=[*update_fields, "updated_at"],
+                        batch_size=self.batch_size
+                    )
+            except Exception as e:
+                self._failed.inc()
+                self._backoff = min(max(self._backoff * 2, self.interval), self.max_backoff)
+                self._retry_at = time.monotonic() + self._backoff
+                logger.error(f"Failed to flush {len(self._flushing)} users, retrying in {self._backoff:.1f}s: {e}")
+                # Возвращаем строки в буфер, не теряя более новых изменений
+                failed, self._flushing = self._flushing, {}
+                for bot_user, fields in failed.values():
+                    newer = self._pending.get(bot_user.id)
+                    self._merge(newer[0] if newer else bot_user, fields)
+                return 0
+
+            flushed, self._flushing = self._flushing, {}
+            self._backoff = self._retry_at = 0.0
+            self._flush_size.observe(len(flushed))
+            self._flush_time.observe(time.monotonic() - started_at)
+
+        for user_id, (bot_user, _) in flushed.items():
+            # Снова изменённого пользователя в Redis положит следующий сброс
+            if user_id not in self._pending:
+                await self.cache.set(bot_user)
+
+        logger.debug(f"Flushed {len(flushed)} users in {len(groups)} statements")
+        return len(flushed)
+
+    def _row(self, bot_user: BotUser) -> BotUser:
+        """
+        Отдельная копия строки для bulk_create.
+
+        id в модели автоинкрементный, и экземпляр, загруженный из БД,
+        bulk_create вставил бы без id как новую строку. Копия с явным id
+        всегда вставляется с ним и попадает в ON CONFLICT.
+        """
+        return BotUser(
+            id=bot_user.id,
+            created_at=bot_user.created_at,
+            updated_at=bot_user.updated_at,
+            **{field: getattr(bot_user, field) for field in self.SYNCED_FIELDS}
+        )
+
+    def _merge(self, bot_user: BotUser, fields: set[str] | None) -> None:
+        """Объединяет изменённые колонки с уже ждущими записи (None — новая строка)"""
+        pending = self._pending.get(bot_user.id)
+        if pending is not None:
+            pending_fields = pending[1]
+            fields = None if fields is None or pending_fields is None else pending_fields | fields
+        self._pending[bot_user.id] = (bot_user, fields)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if time.monotonic() >= self._retry_at:
+                await self.flush()
+
+
+user_writer = UserWriterManager(
+    cache=user_cache,
+    interval=settings.user_write_interval,
+    batch_size=settings.user_write_batch_size,
+    max_pending=settings.user_write_max_pending
+)
@@ -1,9 +1,24 @@
+from .pipeline import MiddlewareCost, MiddlewarePipeline, TimedMiddleware, UpdateTypeMiddleware
 from .i18n_middleware import i18n_middleware
 from .user_middleware import UserRegistrationMiddleware
 from .antiflood_middleware import AntiFloodMiddleware
+from .preamble_middleware import PreambleMiddleware, UpdatePreamble
+from .webhook_reply_middleware import (
+    WebhookReply, WebhookReplyErrorsMiddleware, WebhookReplyMiddleware, render_webhook_reply
+)
 
 __all__ = [
+    "MiddlewareCost",
+    "MiddlewarePipeline",
+    "TimedMiddleware",
+    "UpdateTypeMiddleware",
     "i18n_middleware",
     "UserRegistrationMiddleware",
-    "AntiFloodMiddleware"
+    "AntiFloodMiddleware",
+    "PreambleMiddleware",
+    "UpdatePreamble",
+    "WebhookReply",
+    "WebhookReplyErrorsMiddleware",
+    "WebhookReplyMiddleware",
+    "render_webhook_reply"
 ]
\ No newline at end of file
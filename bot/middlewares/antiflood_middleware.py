@@ -1,27 +1,48 @@
+import math
+import time
+from collections import Counter
 from typing import Callable, Dict, Any, Awaitable
 from aiogram import BaseMiddleware
-from aiogram.types import Message, CallbackQuery, Update
+from aiogram.types import CallbackQuery, Update
 from loguru import logger
-from redis.asyncio import Redis
-import time
+
+from core.metrics import metrics
+from managers import FloodManager, flood
+from .pipeline import MiddlewareCost
 
 
 class AntiFloodMiddleware(BaseMiddleware):
     """
     Middleware для предотвращения флуда.
-    - Для CallbackQuery: отправляет уведомление через i18n
+    - Для CallbackQuery: отправляет уведомление через i18n со временем ожидания
     - Для Message: просто дропает обновление
+
+    Лимиты проверяются атомарно в Redis через FloodManager (GCRA).
+    Если PreambleMiddleware уже проверил флуд в общем Redis-запросе,
+    берёт результат из data["preamble"] без собственных запросов.
+
+    Отброшенные обновления не логируются по одному: раз в log_interval
+    секунд пишется сводка с числом отброшенных и самыми активными
+    пользователями.
     """
-    def __init__(
-        self,
-        redis: Redis,
-        min_interval: float = 0.2
-    ):
-        self.redis = redis
-        self.min_interval = min_interval
+    cost = MiddlewareCost.REDIS
+
+    # Сколько разных пользователей учитывать в сводке за интервал
+    MAX_TRACKED_USERS = 1000
+
+    def __init__(self, flood: FloodManager = flood, log_interval: float = 60.0):
+        self.flood = flood
+        self.log_interval = log_interval
+        self._dropped: Counter[int] = Counter()
+        self._dropped_total = 0
+        self._window_started = time.monotonic()
+        self._dropped_metrics = {
+            kind: metrics.counter("flood_dropped_total", type=kind)
+            for kind in ("message", "callback")
+        }
         super().__init__()
-        logger.info(f"AntiFloodMiddleware initialized with interval: {min_interval}s")
-    
+        logger.info(f"AntiFloodMiddleware initialized with limits: {flood.limits}")
+
     async def __call__(
         self,
         handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
@@ -29,53 +50,53 @@ class AntiFloodMiddleware(BaseMiddleware):
         data: Dict[str, Any]
     ) -> Any:
         # Извлекаем реальное событие из Update
-        actual_event = None
-        if event.message:
-            actual_event = event.message
-        elif event.callback_query:
-            actual_event = event.callback_query
-        else:
+        actual_event = event.message or event.callback_query
+        if actual_event is None or actual_event.from_user is None:
             # Если это не message и не callback_query, пропускаем
             return await handler(event, data)
-        
-        user_id = actual_event.from_user.id
-        current_time = time.time()
-        
-        key = f"flood:{user_id}"
-        
-        # Получаем время последнего действия
-        last_action_raw = await self.redis.get(key)
-        
-        if last_action_raw is not None:
-            last_action_str = last_action_raw.decode() if isinstance(last_action_raw, bytes) else str(last_action_raw)
-            last_time = float(last_action_str)
-            time_passed = current_time - last_time
-            
-            if time_passed < self.min_interval:
-                # Флуд обнаружен
-                if isinstance(actual_event, CallbackQuery):
-                    i18n = data.get("i18n")
-                    if i18n:
-                        message = i18n.get("antiflood-warning")
-                    else:
-                        message = "⚠️ Too fast!"
-                    
-                    await actual_event.answer(message, show_alert=True)
-                    
-                    logger.warning(
-                        f"User {user_id} FLOOD (callback): interval={time_passed:.3f}s"
-                    )
-                else:
-                    logger.warning(
-                        f"User {user_id} FLOOD (message): interval={time_passed:.3f}s - DROPPED"
-                    )
-                
-                return  # Не вызываем handler
-        
-        # Сохраняем время текущего действия
-        ttl_ms = int(self.min_interval * 3 * 1000)  # Конвертируем в миллисекунды
-        await self.redis.psetex(key, ttl_ms, str(current_time))
-        
-        logger.debug(f"User {user_id} action allowed, TTL: {ttl_ms}ms")
-        
-        return await handler(event, data)
\ No newline at end of file
+
+        preamble = data.get("preamble")
+        if preamble is not None:
+            retry_after = preamble.flood_retry_after
+        else:
+            retry_after = await self.flood.check(event)
+
+        if not retry_after:
+            return await handler(event, data)
+
+        # Флуд обнаружен
+        if isinstance(actual_event, CallbackQuery):
+            seconds = math.ceil(retry_after)
+            i18n = data.get("i18n")
+            if i18n:
+                message = i18n.get("antiflood-warning", seconds=seconds)
+            else:
+                message = f"⚠️ Too fast! Wait {seconds}s"
+
+            await actual_event.answer(message, show_alert=True)
+            self._report(actual_event.from_user.id, "callback")
+        else:
+            self._report(actual_event.from_user.id, "message")
+
+        return  # Не вызываем handler
+
+    def _report(self, user_id: int, kind: str) -> None:
+        """Учитывает отброшенное обновление и раз в интервал пишет сводку"""
+        self._dropped_metrics[kind].inc()
+        self._dropped_total += 1
+        if user_id in self._dropped or len(self._dropped) < self.MAX_TRACKED_USERS:
+            self._dropped[user_id] += 1
+
+        now = time.monotonic()
+        elapsed = now - self._window_started
+        if elapsed < self.log_interval:
+            return
+
+        top = ", ".join(f"{user_id}: {count}" for user_id, count in self._dropped.most_common(5))
+        logger.warning(
+            f"FLOOD: dropped {self._dropped_total} updates from {len(self._dropped)} users "
+            f"in the last {elapsed:.0f}s (top: {top})"
+        )
+        self._dropped.clear()
+        self._dropped_total = 0
+        self._window_started = now
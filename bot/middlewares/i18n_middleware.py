@@ -1,17 +1,139 @@
 from pathlib import Path
-from aiogram_i18n import I18nMiddleware
-from aiogram_i18n.cores import FluentRuntimeCore
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import Dispatcher
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.types import TelegramObject, User
+from aiogram_i18n import I18nContext, I18nMiddleware
+from aiogram_i18n.cores import BaseCore, FluentRuntimeCore
+from aiogram_i18n.managers import BaseManager
 
 from core.config import settings
-from managers import I18nManager
+from core.metrics import metrics
+from managers import I18nManager, locale_cache
+from .pipeline import MiddlewareCost
 
 LOCALES_DIR = Path(__file__).parent.parent / "locales"
 
-i18n_middleware = I18nMiddleware(
+
+class LazyI18nContext(I18nContext):
+    """
+    I18nContext, который определяет локаль только по требованию.
+
+    resolve() выполняет полный поиск через менеджер (Redis/Postgres) один раз
+    за обновление. Если locale прочитали раньше resolve() — например, в
+    фильтре, — используется то, что известно без запросов: преамбула,
+    кэш локалей процесса или локаль по умолчанию.
+    """
+
+    def __init__(
+        self,
+        core: BaseCore[Any],
+        manager: BaseManager,
+        event: TelegramObject,
+        data: dict[str, Any],
+        key_separator: str = "-",
+    ) -> None:
+        self._locale: str | None = None
+        self.event = event
+        super().__init__(locale=None, core=core, manager=manager, data=data, key_separator=key_separator)
+
+    @property
+    def locale(self) -> str:
+        if self._locale is not None:
+            return self._locale
+
+        preamble = self.data.get("preamble")
+        if preamble is not None and preamble.locale:
+            return preamble.locale
+        user: User | None = self.data.get("event_from_user")
+        cached = locale_cache.get(user.id) if user else None
+        return cached or self.core.default_locale
+
+    @locale.setter
+    def locale(self, locale: str | None) -> None:
+        self._locale = locale
+
+    @property
+    def resolved(self) -> bool:
+        return self._locale is not None
+
+    async def resolve(self) -> str:
+        """Определяет локаль через менеджер и запоминает её до конца обновления"""
+        if self._locale is None:
+            self._locale = await self.manager.locale_getter(event=self.event, **self.data)
+        return self._locale
+
+
+class LazyI18nMiddleware(I18nMiddleware):
+    """
+    I18nMiddleware с ленивым определением локали.
+
+    Outer middleware кладёт в data непроинициализированный LazyI18nContext,
+    а inner middleware на всех событиях вызывает resolve() только перед
+    хендлером, который принимает i18n. Обновления, хендлеры которых i18n
+    не используют (например, my_chat_member), обходятся без поиска локали;
+    их число — в метрике i18n_locale_total{resolved="false"}.
+
+    Outer middleware запросов не делает, поэтому стоит в начале цепочки:
+    i18n доступен и звеньям, отбрасывающим обновление (AntiFloodMiddleware).
+    """
+    cost = MiddlewareCost.LOCAL
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._resolved = metrics.counter("i18n_locale_total", resolved="true")
+        self._skipped = metrics.counter("i18n_locale_total", resolved="false")
+
+    def setup(self, dispatcher: Dispatcher) -> None:
+        super().setup(dispatcher)
+        # Inner middleware роутера-диспетчера действуют и во вложенных роутерах
+        for event_name, observer in dispatcher.observers.items():
+            if event_name != "update":
+                observer.middleware(self.resolve_for_handler)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        context = LazyI18nContext(
+            core=self.core,
+            manager=self.manager,
+            event=event,
+            data=data,
+            key_separator=self.key_separator
+        )
+        with I18nContext.with_current(context):
+            data[self.context_key] = context
+            try:
+                return await handler(event, data)
+            finally:
+                (self._resolved if context.resolved else self._skipped).inc()
+
+    async def resolve_for_handler(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        context = data.get(self.context_key)
+        handler_object: HandlerObject | None = data.get("handler")
+        if isinstance(context, LazyI18nContext) and (
+            handler_object is None
+            or handler_object.varkw
+            or self.context_key in handler_object.params
+        ):
+            await context.resolve()
+        return await handler(event, data)
+
+
+i18n_middleware = LazyI18nMiddleware(
     core=FluentRuntimeCore(
-        path=LOCALES_DIR / "{locale}",  
+        path=LOCALES_DIR / "{locale}",
         raise_key_error=False
     ),
     manager=I18nManager(),
     default_locale=settings.default_language
-)
\ No newline at end of file
+)
@@ -0,0 +1,126 @@
+import time
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.types import Update
+from loguru import logger
+
+from core.metrics import metrics
+
+
+# Время middleware — от десятков микросекунд до запроса в БД
+MIDDLEWARE_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+class MiddlewareCost(IntEnum):
+    """Класс стоимости middleware: чем дешевле, тем раньше в цепочке"""
+    LOCAL = 0     # только память процесса
+    REDIS = 1     # запросы к Redis
+    DATABASE = 2  # запросы к Postgres
+
+
+class TimedMiddleware(BaseMiddleware):
+    """
+    Обёртка, замеряющая собственное время middleware без учёта следующих
+    звеньев цепочки и считающая отброшенные им обновления.
+    """
+
+    def __init__(self, middleware: Callable, name: str) -> None:
+        self.middleware = middleware
+        self.name = name
+        self._seconds = metrics.histogram("middleware_seconds", buckets=MIDDLEWARE_BUCKETS, middleware=name)
+        self._rejected = metrics.counter("middleware_rejected_total", middleware=name)
+        super().__init__()
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        inner = None
+
+        async def timed_handler(event: Update, data: Dict[str, Any]) -> Any:
+            nonlocal inner
+            started_at = time.perf_counter()
+            try:
+                return await handler(event, data)
+            finally:
+                inner = time.perf_counter() - started_at
+
+        started_at = time.perf_counter()
+        try:
+            return await self.middleware(timed_handler, event, data)
+        finally:
+            elapsed = time.perf_counter() - started_at
+            if inner is None:
+                self._rejected.inc()
+                self._seconds.observe(elapsed)
+            else:
+                self._seconds.observe(elapsed - inner)
+
+
+class UpdateTypeMiddleware(BaseMiddleware):
+    """
+    Отбрасывает обновления типов, которые не обрабатывает ни один роутер.
+
+    Telegram присылает только allowed_updates из set_webhook, но после смены
+    роутеров старый webhook ещё может доставлять лишние типы.
+    """
+    cost = MiddlewareCost.LOCAL
+
+    def __init__(self, allowed: list[str]) -> None:
+        self.allowed = frozenset(allowed)
+        super().__init__()
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        try:
+            event_type = event.event_type
+        except Exception:
+            return
+        if event_type not in self.allowed:
+            return
+        return await handler(event, data)
+
+
+class MiddlewarePipeline:
+    """
+    Outer-middleware цепочка обновлений, упорядоченная по стоимости.
+
+    Каждое звено объявляет cost (MiddlewareCost); дешёвые звенья выполняются
+    раньше дорогих, при равной стоимости сохраняется порядок добавления.
+    Так отбрасывающие обновление фильтры без I/O и проверки в Redis идут
+    до регистрации пользователя в Postgres, и отброшенное обновление
+    не тратит запросов к БД. Каждое звено оборачивается в TimedMiddleware.
+    """
+
+    def __init__(self) -> None:
+        self._stages: list[tuple[MiddlewareCost, str, Callable]] = []
+
+    def add(self, middleware: Callable, cost: MiddlewareCost | None = None, name: str | None = None) -> None:
+        """
+        Args:
+            middleware: Outer middleware
+            cost: Стоимость, если у middleware нет атрибута cost
+            name: Имя в метриках, по умолчанию имя класса
+        """
+        if cost is None:
+            cost = middleware.cost
+        self._stages.append((cost, name or type(middleware).__name__, middleware))
+
+    @property
+    def names(self) -> list[str]:
+        """Имена звеньев в порядке выполнения"""
+        return [name for _, name, _ in sorted(self._stages, key=lambda stage: stage[0])]
+
+    def setup(self, dispatcher: Dispatcher) -> None:
+        """Регистрирует звенья как outer middleware обновлений"""
+        for cost, name, middleware in sorted(self._stages, key=lambda stage: stage[0]):
+            dispatcher.update.outer_middleware(TimedMiddleware(middleware, name))
+        logger.debug(f"Middleware pipeline: {' -> '.join(self.names)}")
@@ -0,0 +1,108 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update, User
+from loguru import logger
+from redis.asyncio import Redis
+
+from managers import FloodManager, RedisManager, UserCacheManager, flood, locale_cache, user_cache
+from .pipeline import MiddlewareCost
+
+
+class UpdatePreamble:
+    """
+    Результат общего Redis-запроса для одного обновления.
+
+    flood_retry_after — через сколько секунд можно повторить действие или 0,
+    если лимиты FloodManager не превышены (действие уже засчитано);
+    locale — значение user:{id}:locale или None;
+    user_row — снимок пользователя из UserCacheManager или None.
+    """
+    __slots__ = ("flood_retry_after", "locale", "user_row")
+
+    def __init__(self, flood_retry_after: float, locale: str | None, user_row: bytes | None) -> None:
+        self.flood_retry_after = flood_retry_after
+        self.locale = locale
+        self.user_row = user_row
+
+
+class PreambleMiddleware(BaseMiddleware):
+    """
+    Собирает все Redis-запросы middleware для обновления в один EVALSHA.
+
+    Вместо отдельного скрипта антифлуда, GET локали и GET снимка пользователя
+    Lua-скрипт за один round trip проверяет лимиты FloodManager (GCRA)
+    и читает локаль со снимком. Если локальный фильтр FloodManager уже
+    отклонил действие, запроса к Redis нет вовсе. Результат кладётся в data["preamble"] для
+    AntiFloodMiddleware и I18nManager, а снимок пользователя — в LRU
+    UserCacheManager, чтобы регистрация обошлась без запроса к Redis.
+
+    Должен быть зарегистрирован раньше остальных middleware с Redis.
+    """
+    cost = MiddlewareCost.REDIS
+
+    # KEYS: локаль, снимок пользователя, затем ключи областей FloodManager
+    # ARGV: пары (интервал в мс, burst) для областей
+    SCRIPT = FloodManager.GCRA_FUNCTION + """
+    local flood_keys = {}
+    for i = 3, #KEYS do
+        flood_keys[#flood_keys + 1] = KEYS[i]
+    end
+    local retry_after = gcra(flood_keys, ARGV)
+    return {retry_after, redis.call('GET', KEYS[1]), redis.call('GET', KEYS[2])}
+    """
+
+    def __init__(self, redis: Redis, flood: FloodManager = flood) -> None:
+        self.redis = redis
+        self.flood = flood
+        self._script = redis.register_script(self.SCRIPT)
+        super().__init__()
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        user: User | None = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+
+        flood_keys, flood_args = self.flood.scopes(event)
+        local_retry_after = self.flood.precheck(flood_keys, flood_args)
+        if local_retry_after:
+            # Флуд отсечён локально: обновление будет отброшено, Redis не нужен
+            data["preamble"] = UpdatePreamble(flood_retry_after=local_retry_after, locale=None, user_row=None)
+            return await handler(event, data)
+
+        epoch = locale_cache.epoch
+        try:
+            retry_after, locale, user_row = await self._script(
+                keys=[
+                    RedisManager.make_key("user", user.id, "locale"),
+                    UserCacheManager.key(user.id),
+                    *flood_keys
+                ],
+                args=flood_args
+            )
+        except Exception as e:
+            # Без преамбулы middleware сделают свои запросы сами
+            logger.warning(f"Update preamble failed: {e}")
+            return await handler(event, data)
+
+        retry_after /= 1000
+        self.flood.record(flood_keys, flood_args, retry_after)
+
+        if isinstance(locale, bytes):
+            locale = locale.decode()
+        if locale:
+            locale_cache.set(user.id, locale, epoch)
+        if user_row is not None and not user_cache.contains(user.id):
+            user_cache.load(user.id, user_row)
+
+        data["preamble"] = UpdatePreamble(
+            flood_retry_after=retry_after,
+            locale=locale,
+            user_row=user_row
+        )
+        return await handler(event, data)
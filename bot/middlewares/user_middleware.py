@@ -4,6 +4,7 @@ from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject, User
 
 from services import UserService
+from .pipeline import MiddlewareCost
 
 
 # Сервисный ID Телеграмма. Используется для сообщение вроде "Обновлена фотография", "Отправлен подарок"
@@ -11,7 +12,13 @@ TG_SERVICE_USER_ID = 777000
 
 
 class UserRegistrationMiddleware(BaseMiddleware):
-    """Middleware для автоматической регистрации пользователей"""
+    """
+    Middleware для автоматической регистрации пользователей.
+
+    Загруженный BotUser передаётся хендлерам в data["bot_user"],
+    чтобы им не нужно было запрашивать его из БД повторно.
+    """
+    cost = MiddlewareCost.DATABASE
 
     async def __call__(
         self,
@@ -23,6 +30,6 @@ class UserRegistrationMiddleware(BaseMiddleware):
 
         if user and not user.is_bot and user.id != TG_SERVICE_USER_ID:
             # Автоматически регистрируем или обновляем пользователя
-            await UserService.register_user(user)
+            data["bot_user"] = await UserService.register_user(user)
 
         return await handler(event, data)
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import time
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, get_args
+from urllib.parse import urlencode
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramAPIError
+from aiogram.methods import AnswerCallbackQuery, SendChatAction, TelegramMethod
+from aiogram.types import Chat, ErrorEvent, Message
+from loguru import logger
+
+from core.metrics import metrics
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+
+_current_reply: ContextVar[WebhookReply | None] = ContextVar("webhook_reply", default=None)
+
+_captured = metrics.counter("webhook_reply_captured_total")
+_flushed = metrics.counter("webhook_reply_flushed_total")
+
+
+def render_webhook_reply(bot: Bot, method: TelegramMethod) -> bytes | None:
+    """
+    Сериализует метод API в тело ответа на webhook (x-www-form-urlencoded).
+
+    Значения готовятся так же, как в обычном запросе aiogram, включая
+    DefaultBotProperties (например, parse_mode).
+
+    Returns:
+        Тело ответа или None, если метод загружает файлы и не может быть
+        передан в ответе на webhook
+    """
+    files: dict[str, Any] = {}
+    fields = {"method": method.__api_method__}
+    for key, value in method.model_dump(warnings=False).items():
+        value = bot.session.prepare_value(value, bot=bot, files=files)
+        # Пустая строка, 0 и False — тоже значения
+        if value is not None:
+            fields[key] = value
+
+    if files:
+        return None
+    return urlencode(fields).encode()
+
+
+class WebhookReply:
+    """
+    Слот для ответа на webhook в рамках обработки одного обновления.
+
+    Первый подходящий вызов Bot API не уходит в сеть, а сохраняется здесь,
+    чтобы вернуть его Telegram в теле ответа на webhook.
+    """
+    __slots__ = ("method", "body", "closed", "_token")
+
+    def __init__(self) -> None:
+        self.method: TelegramMethod | None = None
+        self.body: bytes | None = None
+        self.closed = False
+
+    def __enter__(self) -> WebhookReply:
+        self._token = _current_reply.set(self)
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        # Хендлер, переживший таймаут webhook, дальше отправляет вызовы сам
+        self.closed = True
+        _current_reply.reset(self._token)
+
+    def take(self) -> tuple[TelegramMethod, bytes] | None:
+        """Забирает захваченный вызов и закрывает слот"""
+        self.closed = True
+        if self.method is None:
+            return None
+        captured = self.method, self.body
+        self.method = self.body = None
+        return captured
+
+
+class WebhookReplyMiddleware(BaseRequestMiddleware):
+    """
+    Request middleware сессии бота для режима ответа в теле webhook.
+
+    Захватывает первый подходящий вызов Bot API во время обработки обновления
+    и возвращает хендлеру заглушку вместо реального результата:
+    - методы, возвращающие bool (и Message | bool для редактирования) — True;
+    - методы, возвращающие Message — Message с message_id=0.
+
+    Если хендлер делает ещё один вызов, захваченный сначала отправляется
+    обычным запросом, чтобы сообщения не поменялись местами. Ответ на
+    callback и chat action от порядка не зависят и такой отправки не вызывают.
+
+    Ограничения: результат захваченного вызова (например, message_id)
+    хендлеру недоступен, а ошибки Telegram по нему не видны.
+    """
+
+    ORDER_INSENSITIVE = (AnswerCallbackQuery, SendChatAction)
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Bot,
+        method: TelegramMethod,
+    ) -> Any:
+        reply = _current_reply.get()
+        if reply is None or reply.closed:
+            return await make_request(bot, method)
+
+        if reply.method is None:
+            placeholder = self._placeholder(method)
+            body = render_webhook_reply(bot, method) if placeholder is not None else None
+            if body is not None:
+                reply.method, reply.body = method, body
+                _captured.inc()
+                return placeholder
+            return await make_request(bot, method)
+
+        if not isinstance(method, self.ORDER_INSENSITIVE):
+            captured, _ = reply.take()
+            _flushed.inc()
+            try:
+                await make_request(bot, captured)
+            except TelegramAPIError as e:
+                logger.error(f"Failed to send deferred {captured.__api_method__}: {e}")
+
+        return await make_request(bot, method)
+
+    @staticmethod
+    def _placeholder(method: TelegramMethod) -> Any:
+        """Заглушка результата для метода или None, если метод нельзя захватить"""
+        returning = method.__returning__
+
+        if returning is bool or bool in get_args(returning):
+            return True
+
+        chat_id = getattr(method, "chat_id", None)
+        if returning is Message and isinstance(chat_id, int):
+            return Message(
+                message_id=0,
+                date=int(time.time()),
+                chat=Chat(id=chat_id, type="private" if chat_id > 0 else "supergroup")
+            )
+
+        return None
+
+
+class WebhookReplyErrorsMiddleware(BaseMiddleware):
+    """
+    Outer middleware обработчиков ошибок (dispatcher.errors).
+
+    Закрывает слот ответа до вызова errors-хендлеров: их отправки (например,
+    отчёт в чат логов) уходят обычными запросами, а не в ответ на webhook.
+    Вызов, захваченный упавшим хендлером, по-прежнему возвращается в ответе.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[ErrorEvent, dict[str, Any]], Awaitable[Any]],
+        event: ErrorEvent,
+        data: dict[str, Any],
+    ) -> Any:
+        reply = _current_reply.get()
+        if reply is not None:
+            reply.closed = True
+        return await handler(event, data)
@@ -1,4 +1,5 @@
 from tortoise import Model, fields
+from tortoise.indexes import PartialIndex
 
 
 class BotUser(Model):
@@ -21,7 +22,9 @@ class BotUser(Model):
         table_description = "Пользователи бота"
         indexes = (
             ("username",),
-            ("is_banned",),  # Индекс для быстрой фильтрации при рассылках
+            # Аудитория рассылок: keyset по id среди неблокированных
+            # Заменил индекс ("is_banned",); шаги обновления БД — в README, «Работа с миграциями»
+            PartialIndex(fields=("id",), condition={"is_banned": False}, name="idx_users_active_id"),
         )
 
     def __str__(self):
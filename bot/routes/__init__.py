@@ -1,3 +1,5 @@
 from .webhook import router as webhook_router
+from .metrics import router as metrics_router
+from .broadcasts import router as broadcasts_router
 
-__all__ = ["webhook_router"]
\ No newline at end of file
+__all__ = ["webhook_router", "metrics_router", "broadcasts_router"]
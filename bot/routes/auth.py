@@ -0,0 +1,20 @@
+import hmac
+
+from fastapi import Header, HTTPException
+
+from core.config import settings
+
+
+async def require_admin_token(x_admin_token: str | None = Header(default=None)) -> None:
+    """
+    Доступ к служебным роутам только по заголовку X-Admin-Token.
+
+    Пока ADMIN_API_TOKEN не задан, роуты отвечают 404, как будто их нет:
+    webhook-приложение публичное, и без токена служебные данные не отдаются.
+    """
+    if settings.admin_api_token is None:
+        raise HTTPException(status_code=404)
+    if x_admin_token is None or not hmac.compare_digest(
+        x_admin_token.encode(), settings.admin_api_token.get_secret_value().encode()
+    ):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
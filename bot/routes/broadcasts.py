@@ -0,0 +1,33 @@
+import msgspec
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+
+from managers import broadcast_progress
+from .auth import require_admin_token
+
+
+router = APIRouter(dependencies=[Depends(require_admin_token)])
+
+
+@router.get("/broadcasts", include_in_schema=False)
+async def broadcasts_endpoint(limit: int = Query(default=20, ge=1, le=100)) -> Response:
+    """
+    Прогресс последних рассылок из Redis, новые первыми.
+    """
+    return Response(
+        content=msgspec.json.encode(await broadcast_progress.recent(limit)),
+        media_type="application/json"
+    )
+
+
+@router.get("/broadcasts/{broadcast_id}", include_in_schema=False)
+async def broadcast_endpoint(broadcast_id: str) -> Response:
+    """
+    Прогресс рассылки: счётчики, скорость, ETA и число 429.
+    """
+    snapshot = await broadcast_progress.get(broadcast_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Broadcast not found")
+    return Response(
+        content=msgspec.json.encode(snapshot),
+        media_type="application/json"
+    )
@@ -0,0 +1,19 @@
+import msgspec
+from fastapi import APIRouter, Depends, Response
+
+from core.metrics import metrics
+from .auth import require_admin_token
+
+
+router = APIRouter(dependencies=[Depends(require_admin_token)])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics_endpoint() -> Response:
+    """
+    Снимок in-process метрик в JSON.
+    """
+    return Response(
+        content=msgspec.json.encode(metrics.snapshot()),
+        media_type="application/json"
+    )
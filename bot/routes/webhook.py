@@ -1,17 +1,106 @@
+import msgspec
+from aiogram.methods import TelegramMethod
 from aiogram.types import Update
 from fastapi import APIRouter, Response
+from starlette.requests import Request
+
 from core.loader import dispatcher, bot
 from core.config import settings
+from managers import admission, update_dedup, update_queue, update_stream
+from middlewares import WebhookReply, render_webhook_reply
+from utils import decode_update, decode_update_id, build_update
 
 
 router = APIRouter()
 
 
-@router.post(f"/{settings.bot_token.get_secret_value()}")
-async def webhook_endpoint(update: dict):
+async def webhook_endpoint(request: Request) -> Response:
     """
     Обработчик webhook от Telegram.
+
+    Зарегистрирован как голый Starlette-роут: FastAPI не парсит и не валидирует
+    тело запроса, JSON декодируется один раз через msgspec, а Update
+    валидируется один раз уже с привязкой к боту.
+
+    Повторные доставки уже принятого update_id подтверждаются без обработки.
+    Если обновление не удалось передать дальше, отметка update_id снимается,
+    и повтор от Telegram будет обработан.
+    В режиме queue обновление ставится в очередь и Telegram сразу получает 200,
+    в режиме stream сырое тело без полного декодирования уходит в Redis Stream.
+    При перегрузке низкоприоритетные обновления отбрасываются с ответом 200
+    (в режимах queue и stream — при постановке в дорожку).
     """
-    telegram_update = Update(**update)
-    await dispatcher.feed_webhook_update(bot, telegram_update)
-    return Response(status_code=200)
\ No newline at end of file
+    body = await request.body()
+
+    try:
+        if settings.update_mode == "stream":
+            raw_update = None
+            update_id = decode_update_id(body)
+        else:
+            raw_update = decode_update(body)
+            update_id = raw_update["update_id"]
+    except (msgspec.DecodeError, KeyError):
+        return Response(status_code=400)
+
+    if await update_dedup.is_duplicate(update_id):
+        return Response(status_code=200)
+
+    try:
+        return await hand_off(raw_update, body)
+    except BaseException:
+        # Telegram повторит доставку — повтор не должен считаться дубликатом
+        await update_dedup.forget(update_id)
+        raise
+
+
+async def hand_off(raw_update: dict | None, body: bytes) -> Response:
+    """Передаёт обновление в Redis Stream, очередь или диспетчер"""
+    if settings.update_mode == "stream":
+        await update_stream.publish(body)
+        return Response(status_code=200)
+
+    if settings.update_mode == "queue":
+        await update_queue.put(raw_update)
+        return Response(status_code=200)
+
+    if not admission.admit(raw_update, depth=admission.inflight):
+        return Response(status_code=200)
+
+    with admission.track():
+        return await feed_with_reply(build_update(bot, raw_update))
+
+
+async def feed_with_reply(telegram_update: Update) -> Response:
+    """
+    Синхронная обработка обновления с ответом методом API в теле webhook.
+
+    В ответ уходит метод, который хендлер вернул сам, либо вызов, захваченный
+    WebhookReplyMiddleware (если включён WEBHOOK_REPLY).
+    """
+    with WebhookReply() as reply:
+        result = await dispatcher.feed_webhook_update(bot, telegram_update)
+    captured = reply.take()
+
+    if isinstance(result, TelegramMethod):
+        if captured:
+            await dispatcher.silent_call_request(bot, captured[0])
+            captured = None
+
+        body = render_webhook_reply(bot, result)
+        if body is None:
+            # Метод с загрузкой файлов нельзя вернуть в ответе на webhook
+            await dispatcher.silent_call_request(bot, result)
+        else:
+            captured = result, body
+
+    if captured:
+        return Response(content=captured[1], media_type="application/x-www-form-urlencoded")
+    return Response(status_code=200)
+
+
+router.add_route(
+    f"/{settings.bot_token.get_secret_value()}",
+    webhook_endpoint,
+    methods=["POST"],
+    include_in_schema=False
+)
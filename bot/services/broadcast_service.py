@@ -1,40 +1,19 @@
 """Сервис для рассылки сообщений пользователям"""
 
 import asyncio
-import time
-from typing import List
-from collections import deque
+import json
+import uuid
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable, Sized
 
 from aiogram import Bot
 from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter, TelegramBadRequest
 from loguru import logger
 
+from core.config import settings
+from managers import DeliveryLedger, RateLimiter, broadcast_jobs, broadcast_limiter, broadcast_progress
 from models import BotUser
 from utils import Template
-
-
-class RateLimiter:
-    def __init__(self, max_rate: int = 20):
-        self.max_rate = max_rate
-        self.timestamps = deque()
-        self.lock = asyncio.Lock()
-    
-    async def acquire(self):
-        async with self.lock:
-            now = time.time()
-            
-            while self.timestamps and now - self.timestamps[0] >= 1.0:
-                self.timestamps.popleft()
-            
-            if len(self.timestamps) >= self.max_rate:
-                sleep_time = 1.0 - (now - self.timestamps[0])
-                if sleep_time > 0:
-                    await asyncio.sleep(sleep_time)
-                    now = time.time()
-                    while self.timestamps and now - self.timestamps[0] >= 1.0:
-                        self.timestamps.popleft()
-            
-            self.timestamps.append(now)
+from .user_service import UserService
 
 
 class BroadcastService:
@@ -43,32 +22,156 @@ class BroadcastService:
         template_with_bot: Template,
         user_id: int,
         rate_limiter: RateLimiter,
-        user_obj=None
+        max_retries: int = 3
+    ) -> dict:
+        for attempt in range(max_retries + 1):
+            await rate_limiter.acquire()
+
+            try:
+                await template_with_bot.send(user_id)
+                rate_limiter.on_success()
+                return {'status': 'success', 'user_id': user_id}
+
+            except TelegramRetryAfter as e:
+                # Пауза общая для всей рассылки: остальные отправки тоже ждут
+                await rate_limiter.on_retry_after(e.retry_after)
+                if attempt < max_retries:
+                    logger.debug(f"Flood control for user {user_id}, retry {attempt + 1}/{max_retries}")
+                    continue
+                logger.warning(f"Flood control for user {user_id}, retries exhausted")
+                return {'status': 'failed', 'user_id': user_id}
+
+            except TelegramForbiddenError:
+                logger.debug(f"User {user_id} blocked the bot")
+                # Запись в БД — у вызывающего, пачкой через UserService.set_user_banned
+                return {'status': 'blocked', 'user_id': user_id}
+
+            except TelegramBadRequest as e:
+                logger.error(f"Failed to send to user {user_id}: {e}")
+                return {'status': 'failed', 'user_id': user_id}
+
+            except Exception as e:
+                logger.error(f"Unexpected error sending to user {user_id}: {e}")
+                return {'status': 'failed', 'user_id': user_id}
+
+    @staticmethod
+    async def _run_pipeline(
+        users: AsyncIterator[int],
+        send: Callable[[int], Awaitable[dict]],
+        workers: int,
+        queue_size: int
     ) -> dict:
-        await rate_limiter.acquire()
-        
+        """
+        Конвейер рассылки: продюсер кладёт ID пользователей в ограниченную
+        очередь, фиксированный пул отправителей разбирает её.
+
+        Медленная отправка занимает одного отправителя, а не останавливает
+        пачку целиком, и выборка следующей страницы идёт параллельно с
+        отправками, пока в очереди есть пользователи.
+        """
+        queue: asyncio.Queue[int | None] = asyncio.Queue(maxsize=queue_size)
+        stats = {"success": 0, "failed": 0, "blocked": 0}
+
+        async def consume() -> None:
+            while (user_id := await queue.get()) is not None:
+                try:
+                    result = await send(user_id)
+                except Exception as e:
+                    logger.error(f"Exception in broadcast: {e}")
+                    stats["failed"] += 1
+                    continue
+                stats[result['status'] if result['status'] in stats else "failed"] += 1
+
+        consumers = [asyncio.create_task(consume()) for _ in range(max(1, workers))]
         try:
-            await template_with_bot.send(user_id)
-            return {'status': 'success', 'user_id': user_id}
+            async for user_id in users:
+                await queue.put(user_id)
+            for _ in consumers:
+                await queue.put(None)
+            await asyncio.gather(*consumers)
+        except BaseException:
+            for consumer in consumers:
+                consumer.cancel()
+            await asyncio.gather(*consumers, return_exceptions=True)
+            raise
 
-        except TelegramForbiddenError:
-            logger.debug(f"User {user_id} blocked the bot")
-            if user_obj:
-                user_obj.is_banned = True
-                await user_obj.save()
-            return {'status': 'blocked', 'user_id': user_id}
+        return stats
+
+    @staticmethod
+    async def _iter_query(query, batch_size: int, after: int = 0) -> AsyncIterator[int]:
+        """
+        ID пользователей запроса страницами по keyset (id > последнего).
 
-        except TelegramRetryAfter as e:
-            logger.warning(f"Rate limit for user {user_id}, skipping")
-            return {'status': 'failed', 'user_id': user_id}
+        Выбирается только id, без объектов BotUser; для неблокированных
+        пользователей запрос покрывается частичным индексом idx_users_active_id.
+        after — с какого id (не включая) начать, например с контрольной точки.
+        """
+        last_id = after
+        while True:
+            user_ids = await query.filter(id__gt=last_id).order_by('id').limit(batch_size).values_list('id', flat=True)
+            if not user_ids:
+                return
+            for user_id in user_ids:
+                yield user_id
+            last_id = user_ids[-1]
 
-        except TelegramBadRequest as e:
-            logger.error(f"Failed to send to user {user_id}: {e}")
-            return {'status': 'failed', 'user_id': user_id}
+    @staticmethod
+    async def _preload_media(bot: Bot, template: Template) -> Template:
+        """
+        Загружает медиа шаблона в MEDIA_UPLOAD_CHAT_ID до рассылки.
 
+        Без этого файл загружали бы первый получатель и все, кому
+        сообщение уходит одновременно с ним. Возвращает шаблон с file_id
+        или исходный, если загрузить не удалось.
+        """
+        if settings.media_upload_chat_id is None or not template.has_uploads:
+            return template
+        try:
+            return await template.with_bot(bot).upload(settings.media_upload_chat_id)
         except Exception as e:
-            logger.error(f"Unexpected error sending to user {user_id}: {e}")
-            return {'status': 'failed', 'user_id': user_id}
+            logger.warning(f"Failed to preload broadcast media: {e}")
+            return template
+
+    @staticmethod
+    def _status_chat(status_chat_id: int | None) -> int | None:
+        return status_chat_id if status_chat_id is not None else settings.broadcast_status_chat_id
+
+    @staticmethod
+    def _audience(exclude_banned: bool):
+        query = BotUser.all()
+        if exclude_banned:
+            query = query.filter(is_banned=False)
+        return query
+
+    @staticmethod
+    async def _estimate_count(query) -> int:
+        """
+        Оценка числа получателей для прогресса.
+
+        В PostgreSQL берётся из плана запроса (EXPLAIN) без сканирования
+        таблицы, в остальных СУБД — точный COUNT.
+        """
+        db = BotUser._meta.db
+        if getattr(db.capabilities, "dialect", None) == "postgres":
+            try:
+                rows = await db.execute_query_dict(f"EXPLAIN (FORMAT JSON) {query.sql(params_inline=True)}")
+                plan = rows[0]["QUERY PLAN"]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                return int(plan[0]["Plan"]["Plan Rows"])
+            except Exception as e:
+                logger.warning(f"Failed to estimate broadcast audience: {e}")
+        return await query.count()
+
+    @staticmethod
+    async def _iter_ids(user_ids: Iterable[int] | AsyncIterable[int]) -> AsyncIterator[int]:
+        """ID из списка, генератора или асинхронного итератора — по одному, без копии в памяти"""
+        if isinstance(user_ids, AsyncIterable):
+            async for user_id in user_ids:
+                yield int(user_id)
+        else:
+            for user_id in user_ids:
+                yield int(user_id)
 
     @staticmethod
     async def broadcast_template(
@@ -77,108 +180,276 @@ class BroadcastService:
         exclude_banned: bool = True,
         batch_size: int = 100,
         concurrent_limit: int = 30,
-        max_rate: int = 20
+        max_rate: float = 20,
+        max_retries: int = 3,
+        status_chat_id: int | None = None
     ) -> dict:
-        query = BotUser.all()
-        if exclude_banned:
-            query = query.filter(is_banned=False)
+        """
+        Рассылка всем пользователям (или только не заблокировавшим бота).
 
-        total = await query.count()
-        logger.info(f"Starting broadcast to {total} users")
+        Прогресс публикуется в Redis (GET /broadcasts), а в status_chat_id
+        (по умолчанию BROADCAST_STATUS_CHAT_ID) ведётся сообщение о статусе.
+        """
+        query = BroadcastService._audience(exclude_banned)
 
-        success = failed = blocked = 0
+        estimated = await BroadcastService._estimate_count(query)
+        logger.info(f"Starting broadcast to ~{estimated} users")
+
+        template = await BroadcastService._preload_media(bot, template)
         template_with_bot = template.with_bot(bot)
-        semaphore = asyncio.Semaphore(concurrent_limit)
-        rate_limiter = RateLimiter(max_rate=max_rate)
+        # Бюджет общий для всех рассылок бота во всех процессах
+        rate_limiter = broadcast_limiter.limiter(max_rate=max_rate)
+        progress = broadcast_progress.track(
+            uuid.uuid4().hex, estimated, rate_limiter,
+            chat_id=BroadcastService._status_chat(status_chat_id), bot=bot
+        )
 
-        async def send_with_limits(user):
-            async with semaphore:
-                return await BroadcastService._send_to_user(
-                    template_with_bot, user.id, rate_limiter, user
-                )
+        async def send(user_id: int) -> dict:
+            result = await BroadcastService._send_to_user(
+                template_with_bot, user_id, rate_limiter, max_retries=max_retries
+            )
+            if result['status'] == 'blocked':
+                await UserService.set_user_banned(user_id, True)
+            progress.record(result['status'])
+            return result
 
-        last_id = 0
-        while True:
-            users = await query.filter(id__gt=last_id).order_by('id').limit(batch_size).all()
-            if not users:
-                break
+        # Очередь на страницу: следующая выбирается, пока отправляется текущая
+        async with progress:
+            stats = await BroadcastService._run_pipeline(
+                BroadcastService._iter_query(query, batch_size),
+                send,
+                workers=concurrent_limit,
+                queue_size=batch_size
+            )
 
-            results = await asyncio.gather(
-                *[send_with_limits(user) for user in users],
-                return_exceptions=True
+        # Точное число получателей известно после прохода бесплатно
+        total = stats['success'] + stats['failed'] + stats['blocked']
+        logger.info(
+            f"Broadcast completed: {stats['success']}/{total} successful, "
+            f"{stats['blocked']} blocked, {stats['failed']} failed"
+        )
+
+        return {"total": total, **stats}
+
+    @staticmethod
+    async def start_job(
+        bot: Bot,
+        template: Template,
+        exclude_banned: bool = True,
+        batch_size: int = 100,
+        concurrent_limit: int = 30,
+        max_rate: float = 20,
+        max_retries: int = 3,
+        status_chat_id: int | None = None
+    ) -> str:
+        """
+        Сохраняет рассылку в Redis и запускает её в фоне.
+
+        В отличие от broadcast_template, прогресс переживает перезапуск:
+        on_startup продолжает незавершённые рассылки (resume_jobs), а
+        получатели, которым сообщение уже отправлено, пропускаются.
+
+        Returns:
+            ID рассылки
+        """
+        estimated = await BroadcastService._estimate_count(BroadcastService._audience(exclude_banned))
+        # В задаче хранятся file_id: возобновлённая рассылка не загружает медиа снова
+        template = await BroadcastService._preload_media(bot, template)
+        job = await broadcast_jobs.create(
+            template=template.to_dict(),
+            params={
+                "exclude_banned": exclude_banned,
+                "batch_size": batch_size,
+                "concurrent_limit": concurrent_limit,
+                "max_rate": max_rate,
+                "max_retries": max_retries,
+                "status_chat_id": BroadcastService._status_chat(status_chat_id)
+            },
+            estimated=estimated
+        )
+        logger.info(f"Broadcast job {job.id} created for ~{estimated} users")
+        broadcast_jobs.spawn(BroadcastService.run_job(bot, job.id), job.id)
+        return job.id
+
+    @staticmethod
+    async def resume_jobs(bot: Bot) -> int:
+        """
+        Запускает в фоне незавершённые рассылки; выполнит их тот процесс, что возьмёт лок.
+
+        Лок упавшего процесса может пережить лок лидера, поэтому claim
+        повторяется, пока не истечёт TTL лока рассылки.
+        """
+        job_ids = await broadcast_jobs.active()
+        # С запасом на задержку последнего продления лока
+        claim_wait = broadcast_jobs.lock_ttl_ms / 1000 + 1
+        for job_id in job_ids:
+            broadcast_jobs.spawn(BroadcastService.run_job(bot, job_id, claim_wait=claim_wait), job_id)
+        return len(job_ids)
+
+    @staticmethod
+    async def run_job(bot: Bot, job_id: str, claim_wait: float = 0) -> dict | None:
+        """
+        Выполняет (или продолжает) сохранённую рассылку.
+
+        Выборка начинается после контрольной точки, получатели из журнала
+        пропускаются. Прогресс сохраняется раз в BROADCAST_CHECKPOINT_INTERVAL
+        секунд и при отмене задачи, поэтому после падения процесса повторно
+        получат сообщение только отправленные за последний интервал.
+
+        Args:
+            claim_wait: Сколько секунд ждать освобождения лока рассылки
+
+        Returns:
+            Итоговая статистика или None, если рассылка завершена,
+            не найдена или выполняется другим процессом
+        """
+        job = await broadcast_jobs.get(job_id)
+        if job is None or job.status != "running":
+            return None
+        if not await broadcast_jobs.claim(job_id, wait=claim_wait):
+            logger.info(f"Broadcast job {job_id} is running in another process")
+            return None
+
+        try:
+            params = job.params
+            ledger = DeliveryLedger(
+                checkpoint=job.checkpoint,
+                delivered=await broadcast_jobs.delivered(job_id),
+                counters=job.counters
+            )
+            if job.checkpoint:
+                logger.info(f"Resuming broadcast job {job_id} after user {job.checkpoint}, {ledger.total} done")
+
+            template_with_bot = Template.from_dict(job.template, bot_instance=bot)
+            rate_limiter = broadcast_limiter.limiter(max_rate=params["max_rate"])
+            progress = broadcast_progress.track(
+                job_id, job.estimated, rate_limiter,
+                chat_id=params.get("status_chat_id"), counters=job.counters, bot=bot
             )
 
-            for result in results:
-                if isinstance(result, Exception):
-                    logger.error(f"Exception in broadcast: {result}")
-                    failed += 1
-                elif result['status'] == 'success':
-                    success += 1
-                elif result['status'] == 'blocked':
-                    blocked += 1
-                else:
-                    failed += 1
+            async def audience() -> AsyncIterator[int]:
+                users = BroadcastService._iter_query(
+                    BroadcastService._audience(params["exclude_banned"]),
+                    params["batch_size"],
+                    after=ledger.checkpoint
+                )
+                async for user_id in users:
+                    if ledger.begin(user_id):
+                        yield user_id
+
+            async def send(user_id: int) -> dict:
+                # Отменённая отправка не попадает в журнал и повторится после возобновления
+                try:
+                    result = await BroadcastService._send_to_user(
+                        template_with_bot, user_id, rate_limiter, max_retries=params["max_retries"]
+                    )
+                    if result['status'] == 'blocked':
+                        await UserService.set_user_banned(user_id, True)
+                except Exception as e:
+                    logger.error(f"Exception in broadcast: {e}")
+                    result = {'status': 'failed', 'user_id': user_id}
+                ledger.finish(user_id, result['status'])
+                progress.record(result['status'])
+                return result
+
+            pipeline = asyncio.create_task(BroadcastService._run_pipeline(
+                audience(),
+                send,
+                workers=params["concurrent_limit"],
+                queue_size=params["batch_size"]
+            ))
+            lost = False
+
+            async def checkpoints() -> None:
+                nonlocal lost
+                while True:
+                    await asyncio.sleep(settings.broadcast_checkpoint_interval)
+                    if not await broadcast_jobs.checkpoint(job_id, ledger):
+                        lost = True
+                        pipeline.cancel()
+                        return
 
-            last_id = users[-1].id
+            checkpointer = asyncio.create_task(checkpoints())
+            try:
+                async with progress:
+                    await pipeline
+            except asyncio.CancelledError:
+                if not lost:
+                    raise
+                logger.error(f"Broadcast job {job_id} was taken over by another process, stopping")
+                return None
+            finally:
+                checkpointer.cancel()
+                await asyncio.gather(checkpointer, return_exceptions=True)
+                if not lost:
+                    await broadcast_jobs.checkpoint(job_id, ledger)
 
+            await broadcast_jobs.complete(job_id)
+        finally:
+            await broadcast_jobs.release(job_id)
+
+        stats = {"total": ledger.total, **ledger.counters}
         logger.info(
-            f"Broadcast completed: {success}/{total} successful, "
-            f"{blocked} blocked, {failed} failed"
+            f"Broadcast job {job_id} completed: {stats['success']}/{stats['total']} successful, "
+            f"{stats['blocked']} blocked, {stats['failed']} failed"
         )
-
-        return {
-            "total": total,
-            "success": success,
-            "failed": failed,
-            "blocked": blocked
-        }
+        return stats
 
     @staticmethod
     async def broadcast_to_users(
         bot: Bot,
-        user_ids: List[int],
+        user_ids: Iterable[int] | AsyncIterable[int],
         template: Template,
         concurrent_limit: int = 30,
-        max_rate: int = 20
+        max_rate: float = 20,
+        max_retries: int = 3,
+        status_chat_id: int | None = None
     ) -> dict:
-        total = len(user_ids)
-        logger.info(f"Starting broadcast to {total} specific users")
+        """
+        Рассылка по явному набору ID.
 
-        template_with_bot = template.with_bot(bot)
-        semaphore = asyncio.Semaphore(concurrent_limit)
-        rate_limiter = RateLimiter(max_rate=max_rate)
-
-        async def send_with_limits(user_id):
-            async with semaphore:
-                return await BroadcastService._send_to_user(
-                    template_with_bot, user_id, rate_limiter
-                )
+        user_ids — любой итерируемый или асинхронный итератор: список,
+        генератор строк файла, SSCAN множества в Redis. ID читаются по мере
+        освобождения отправителей, а результаты копятся в счётчиках, так что
+        память не зависит от числа получателей.
+        """
+        # Для потока число получателей неизвестно — прогресс без ETA
+        estimated = len(user_ids) if isinstance(user_ids, Sized) else 0
+        if isinstance(user_ids, Sized):
+            logger.info(f"Starting broadcast to {estimated} specific users")
+        else:
+            logger.info("Starting broadcast to a stream of specific users")
 
-        results = await asyncio.gather(
-            *[send_with_limits(user_id) for user_id in user_ids],
-            return_exceptions=True
+        template = await BroadcastService._preload_media(bot, template)
+        template_with_bot = template.with_bot(bot)
+        # Бюджет общий для всех рассылок бота во всех процессах
+        rate_limiter = broadcast_limiter.limiter(max_rate=max_rate)
+        progress = broadcast_progress.track(
+            uuid.uuid4().hex, estimated, rate_limiter,
+            chat_id=BroadcastService._status_chat(status_chat_id), bot=bot
         )
 
-        success = failed = blocked = 0
-        for result in results:
-            if isinstance(result, Exception):
-                logger.error(f"Exception in broadcast: {result}")
-                failed += 1
-            elif result['status'] == 'success':
-                success += 1
-            elif result['status'] == 'blocked':
-                blocked += 1
-            else:
-                failed += 1
+        async def send(user_id: int) -> dict:
+            result = await BroadcastService._send_to_user(
+                template_with_bot, user_id, rate_limiter, max_retries=max_retries
+            )
+            if result['status'] == 'blocked':
+                await UserService.set_user_banned(user_id, True)
+            progress.record(result['status'])
+            return result
+
+        async with progress:
+            stats = await BroadcastService._run_pipeline(
+                BroadcastService._iter_ids(user_ids),
+                send,
+                workers=concurrent_limit,
+                queue_size=concurrent_limit
+            )
 
+        total = stats['success'] + stats['failed'] + stats['blocked']
         logger.info(
-            f"Broadcast completed: {success}/{total} successful, "
-            f"{blocked} blocked, {failed} failed"
+            f"Broadcast completed: {stats['success']}/{total} successful, "
+            f"{stats['blocked']} blocked, {stats['failed']} failed"
         )
 
-        return {
-            "total": total,
-            "success": success,
-            "failed": failed,
-            "blocked": blocked
-        }
\ No newline at end of file
+        return {"total": total, **stats}
@@ -3,21 +3,63 @@ from loguru import logger
 from redis.asyncio import Redis
 
 from core.config import settings
-from managers import RedisManager
+from managers import RedisManager, UserCacheManager, ban_writer, locale_cache, user_cache, user_writer
 from models import BotUser
 
 
 class UserService:
     """Сервис для работы с пользователями (Redis + БД)"""
+
+    @staticmethod
+    async def get_user(user_id: int) -> BotUser | None:
+        """Пользователь с учётом ещё не записанных в БД изменений (read-your-writes)"""
+        return user_writer.get(user_id) or await BotUser.get_or_none(id=user_id)
+
+    @staticmethod
+    async def save_user(bot_user: BotUser, fields: list[str] | None = None) -> None:
+        """
+        Сохраняет пользователя и обновляет кэш.
+
+        При запущенном write-behind буфере строка записывается пачкой позже,
+        иначе — сразу.
+
+        Args:
+            bot_user: Пользователь
+            fields: Изменённые колонки; None — новая строка
+        """
+        if user_writer.running:
+            await user_writer.put(bot_user, fields)
+            user_cache.remember(bot_user)
+            return
+
+        if fields is None:
+            await bot_user.save()
+        else:
+            await bot_user.save(update_fields=[*fields, "updated_at"])
+        await user_cache.set(bot_user)
     
     @staticmethod
-    async def set_user_banned(user_id: int, banned: bool) -> BotUser:
-        bot_user = await BotUser.get_or_none(id=user_id)
+    async def set_user_banned(user_id: int, banned: bool) -> None:
+        """
+        Отмечает, что пользователь заблокировал бота (или вернулся).
+
+        При запущенном BanWriterManager переход записывается пачкой позже
+        без чтения строки, иначе — сразу.
+        """
+        if ban_writer.running:
+            # Строка в write-behind буфере не должна перезаписать переход старым значением
+            pending = user_writer.get(user_id)
+            if pending is not None:
+                pending.is_banned = banned
+            ban_writer.put(user_id, banned)
+            return
+
+        bot_user = await UserService.get_user(user_id)
         
         if bot_user:
             if bot_user.is_banned is not banned:
                 bot_user.is_banned = banned
-                await bot_user.save()
+                await UserService.save_user(bot_user, ["is_banned"])
 
     @staticmethod
     async def register_user(user: User) -> BotUser:
@@ -25,49 +67,68 @@ class UserService:
         Регистрирует нового пользователя или возвращает существующего.
         Автоматически разбанивает пользователя, если он вернулся после блокировки бота.
 
+        Сначала пользователь ищется в кэше: если отпечаток данных из Telegram
+        не изменился, БД не трогается. Иначе в БД записываются только
+        изменившиеся колонки.
+
         Args:
             user: Объект пользователя из Telegram
 
         Returns:
             Объект пользователя из БД
         """
-        bot_user = await BotUser.get_or_none(id=user.id)
+        language_code = user.language_code or settings.default_language
+        # Пишет боту — значит, не заблокировал: незаписанная блокировка устарела
+        if ban_writer.pending(user.id):
+            ban_writer.put(user.id, False)
+        bot_user = user_writer.get(user.id) or await user_cache.get(user.id)
+
+        if bot_user and UserCacheManager.fingerprint_of(bot_user) == UserCacheManager.make_fingerprint(
+            user.username, user.full_name, language_code, False
+        ):
+            return bot_user
+
+        if bot_user is None:
+            bot_user = await BotUser.get_or_none(id=user.id)
 
         if bot_user:
             # Обновляем данные существующего пользователя
-            updated = False
+            changed: list[str] = []
 
             # Если пользователь был забанен (заблокировал бота), но теперь вернулся - разбаниваем
             if bot_user.is_banned:
                 bot_user.is_banned = False
-                updated = True
+                changed.append("is_banned")
                 logger.info(f"User {user.id} unbanned (returned after blocking the bot)")
 
             if bot_user.username != user.username:
                 bot_user.username = user.username
-                updated = True
+                changed.append("username")
 
             if bot_user.full_name != user.full_name:
                 bot_user.full_name = user.full_name
-                updated = True
+                changed.append("full_name")
 
-            if bot_user.language_code != user.language_code:
-                bot_user.language_code = user.language_code
-                updated = True
+            if bot_user.language_code != language_code:
+                bot_user.language_code = language_code
+                changed.append("language_code")
 
-            if updated:
-                await bot_user.save()
-                logger.info(f"Updated user {user.id} data")
+            if changed:
+                await UserService.save_user(bot_user, changed)
+                logger.info(f"Updated user {user.id} data: {', '.join(changed)}")
+            else:
+                await user_cache.set(bot_user)
 
             return bot_user
 
         # Создаём нового пользователя
-        bot_user = await BotUser.create(
+        bot_user = BotUser(
             id=user.id,
             username=user.username,
             full_name=user.full_name,
-            language_code=user.language_code or settings.default_language
+            language_code=language_code
         )
+        await UserService.save_user(bot_user)
 
         logger.info(f"Registered new user {user.id} (@{user.username})")
         return bot_user
@@ -76,15 +137,21 @@ class UserService:
     async def get_user_locale(redis: Redis, user_id: int) -> str:
         """
         Получает локаль пользователя.
-        Приоритет: Redis → БД → default locale
+        Приоритет: память процесса → Redis → БД → default locale
         """
+        cached_locale = locale_cache.get(user_id)
+        if cached_locale:
+            return cached_locale
+
+        epoch = locale_cache.epoch
         redis_key = RedisManager.make_key("user", user_id, "locale")
         redis_locale = await RedisManager.get_string(redis, redis_key)
         
         if redis_locale:
+            locale_cache.set(user_id, redis_locale, epoch)
             return redis_locale
         
-        user = await BotUser.get_or_none(id=user_id)
+        user = await UserService.get_user(user_id)
         if user and user.language_code:
             # Кешируем в Redis
             await RedisManager.set_string(
@@ -92,6 +159,7 @@ class UserService:
                 redis_key, 
                 user.language_code
             )
+            locale_cache.set(user_id, user.language_code, epoch)
             return user.language_code
         
         return settings.default_language
@@ -110,12 +178,14 @@ class UserService:
             redis_key, 
             locale
         )
+        # Сбрасываем старую локаль из памяти всех процессов
+        await locale_cache.invalidate(user_id)
         
         # Сохраняем в БД
-        user = await BotUser.get_or_none(id=user_id)
+        user = await UserService.get_user(user_id)
         if user:
             user.language_code = locale
-            await user.save()
+            await UserService.save_user(user, ["language_code"])
             return True
         
         return False
\ No newline at end of file
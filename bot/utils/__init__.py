@@ -1,10 +1,24 @@
 from .text import truncate, escape_html, escape_markdown
 from .template import Template, TemplateError
+from .updates import (
+    RawUpdate,
+    decode_update,
+    decode_update_id,
+    build_update,
+    get_event_type,
+    get_routing_key
+)
 
 __all__ = [
     "truncate",
     "escape_html",
     "escape_markdown",
     "Template",
-    "TemplateError"
+    "TemplateError",
+    "RawUpdate",
+    "decode_update",
+    "decode_update_id",
+    "build_update",
+    "get_event_type",
+    "get_routing_key"
 ]
@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, List, Union
+from typing import TYPE_CHECKING, Any, List, Protocol, Union
 
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.types import (
@@ -34,6 +34,24 @@ ReplyMarkup = Union[
 MediaType = Union[InputFile, str, BufferedInputFile, FSInputFile]
 TargetType = Union[int, str, Message, CallbackQuery]
 
+# Слот медиа в шаблоне: ("photo", None), ("document", None) или ("photos", индекс)
+MediaSlot = tuple[str, int | None]
+
+
+class MediaRegistry(Protocol):
+    """Реестр file_id загруженных медиа (managers.MediaRegistryManager)"""
+
+    async def resolve(self, items: list[tuple[Any, str]]) -> list[str | None]: ...
+
+    async def remember(self, items: list[tuple[Any, str, str]]) -> None: ...
+
+
+# Клавиатуры, которые восстанавливает Template.from_dict()
+_MARKUP_TYPES = {
+    markup.__name__: markup
+    for markup in (InlineKeyboardMarkup, ReplyKeyboardMarkup, ReplyKeyboardRemove, ForceReply)
+}
+
 
 class TemplateError(Exception):
     """Базовое исключение для ошибок Template."""
@@ -84,8 +102,22 @@ class Template:
             .with_photo("photo.jpg")
             .with_buttons(keyboard)
             .send(message))
+
+    Если подключён реестр медиа (use_media_registry), файлы и URL
+    загружаются один раз: дальше send() подставляет их file_id.
     """
 
+    # Общий для всех шаблонов реестр file_id, подключается при старте бота
+    media_registry: MediaRegistry | None = None
+
+    # Ответы Telegram, после которых file_id из реестра заменяется повторной загрузкой
+    FILE_ID_ERRORS = (
+        "wrong file identifier",
+        "wrong remote file identifier",
+        "file reference expired",
+        "file_reference_expired",
+    )
+
     def __init__(
         self,
         bot_instance: Bot | None = None,
@@ -207,16 +239,93 @@ class Template:
             buttons=self.buttons,
         )
 
+    @classmethod
+    def use_media_registry(cls, registry: MediaRegistry | None) -> None:
+        """Подключает реестр file_id ко всем шаблонам (None — отключает)."""
+        cls.media_registry = registry
+
     async def send(self, target: TargetType) -> Message | List[Message]:
         """
         Отправляет сообщение.
 
+        Медиа, уже загруженные ботом, подставляются из реестра по file_id,
+        а file_id новых загрузок запоминаются после успешной отправки.
+
         Args:
             target: Message, CallbackQuery или chat_id
 
         Returns:
             Отправленное сообщение или список сообщений (для медиагруппы)
         """
+        registry = self.media_registry
+        if registry is None:
+            return await self._send(target)
+
+        slots = self._media_slots()
+        if not slots:
+            return await self._send(target)
+
+        file_ids = await registry.resolve([(media, kind) for _, media, kind in slots])
+        cached = {slot: file_id for (slot, _, _), file_id in zip(slots, file_ids) if file_id is not None}
+        try:
+            result = await (self._with_media(cached) if cached else self)._send(target)
+        except TelegramBadRequest as e:
+            # Остальные ошибки (разметка, длина текста, чат) загрузка не исправит
+            if not cached or not any(error in str(e).lower() for error in self.FILE_ID_ERRORS):
+                raise
+            # file_id из реестра не принят — загружаем исходные медиа заново
+            logger.warning("Cached media file_id rejected, uploading again")
+            cached = {}
+            result = await self._send(target)
+
+        uploaded = self._uploaded_file_ids(result)
+        await registry.remember([
+            (media, kind, uploaded[slot])
+            for slot, media, kind in slots
+            if slot not in cached and slot in uploaded
+        ])
+        return result
+
+    async def upload(self, chat_id: int | str) -> Template:
+        """
+        Загружает медиа шаблона в служебный чат и возвращает шаблон с file_id.
+
+        Нужен перед рассылкой: иначе файл загружает первый получатель,
+        а все одновременно с ним отправленные — тоже. Сообщения в
+        служебном чате удаляются сразу после загрузки.
+        """
+        if self.bot_instance is None:
+            raise TemplateError("bot_instance is required for uploading media")
+        if not self.has_uploads:
+            return self
+
+        media_only = self.__class__(
+            bot_instance=self.bot_instance,
+            photo=self.photo,
+            photos=self.photos,
+            document=self.document,
+        )
+        result = await media_only.send(chat_id)
+        messages = result if isinstance(result, list) else [result]
+        try:
+            await self.bot_instance.delete_messages(
+                chat_id=chat_id,
+                message_ids=[message.message_id for message in messages]
+            )
+        except TelegramBadRequest as e:
+            logger.warning(f"Failed to delete uploaded media in chat {chat_id}: {e}")
+
+        return self._with_media(media_only._uploaded_file_ids(result))
+
+    @property
+    def has_uploads(self) -> bool:
+        """Есть ли медиа, которые Telegram загрузит, а не возьмёт по file_id."""
+        return any(
+            not isinstance(media, str) or media.startswith(("http://", "https://"))
+            for _, media, _ in self._media_slots()
+        )
+
+    async def _send(self, target: TargetType) -> Message | List[Message]:
         if isinstance(target, CallbackQuery):
             return await self._send_via_callback(target)
 
@@ -502,6 +611,100 @@ class Template:
             logger.error(f"Failed to edit message in chat {chat_id}: {e}")
             raise
 
+    # === Сериализация ===
+
+    def to_dict(self) -> dict:
+        """
+        Сериализует шаблон в словарь для JSON (без bot_instance).
+
+        Медиа — file_id/URL или путь FSInputFile; BufferedInputFile
+        и другие InputFile с данными в памяти не сериализуются.
+        """
+        return {
+            "text": self.text,
+            "photo": self._dump_media(self.photo),
+            "photos": [self._dump_media(photo) for photo in self.photos],
+            "document": self._dump_media(self.document),
+            "buttons": {
+                "type": type(self.buttons).__name__,
+                "data": self.buttons.model_dump(mode="json", exclude_none=True),
+            } if self.buttons is not None else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, bot_instance: Bot | None = None) -> Template:
+        """Восстанавливает шаблон, сериализованный to_dict()."""
+        buttons = data.get("buttons")
+        if buttons is not None:
+            markup_type = _MARKUP_TYPES.get(buttons["type"])
+            if markup_type is None:
+                raise TemplateError(f"Unknown reply markup type: {buttons['type']}")
+            buttons = markup_type.model_validate(buttons["data"])
+
+        return cls(
+            bot_instance=bot_instance,
+            text=data.get("text"),
+            photo=cls._load_media(data.get("photo")),
+            photos=[cls._load_media(photo) for photo in data.get("photos") or []],
+            document=cls._load_media(data.get("document")),
+            buttons=buttons,
+        )
+
+    @staticmethod
+    def _dump_media(media: MediaType | None) -> str | dict | None:
+        if media is None or isinstance(media, str):
+            return media
+        if isinstance(media, FSInputFile):
+            return {"path": str(media.path), "filename": media.filename}
+        raise TemplateError(f"Cannot serialize media of type {type(media).__name__}")
+
+    @staticmethod
+    def _load_media(media: str | dict | None) -> MediaType | None:
+        if isinstance(media, dict):
+            return FSInputFile(media["path"], filename=media.get("filename"))
+        return media
+
+    # === Медиа и реестр file_id ===
+
+    def _media_slots(self) -> list[tuple[MediaSlot, MediaType, str]]:
+        """Медиа шаблона: (слот, медиа, вид) для реестра file_id."""
+        if self.photos:
+            return [(("photos", idx), photo, "photo") for idx, photo in enumerate(self.photos)]
+        if self.document:
+            return [(("document", None), self.document, "document")]
+        if self.photo:
+            return [(("photo", None), self.photo, "photo")]
+        return []
+
+    def _with_media(self, file_ids: dict[MediaSlot, str]) -> Template:
+        """Копия шаблона, где медиа из file_ids заменены на file_id."""
+        photos = [file_ids.get(("photos", idx), photo) for idx, photo in enumerate(self.photos)]
+        return self.__class__(
+            bot_instance=self.bot_instance,
+            text=self.text,
+            photo=file_ids.get(("photo", None), self.photo),
+            photos=photos,
+            document=file_ids.get(("document", None), self.document),
+            buttons=self.buttons,
+        )
+
+    def _uploaded_file_ids(self, result: Message | List[Message] | None) -> dict[MediaSlot, str]:
+        """file_id медиа из ответа Telegram на отправку этого шаблона."""
+        try:
+            if self.photos:
+                return {
+                    ("photos", idx): message.photo[-1].file_id
+                    for idx, message in enumerate(result[:len(self.photos)])
+                    if message.photo
+                }
+            if self.document and result.document:
+                return {("document", None): result.document.file_id}
+            if self.photo and result.photo:
+                return {("photo", None): result.photo[-1].file_id}
+        except (AttributeError, IndexError, TypeError):
+            pass
+        return {}
+
     # === Вспомогательные методы ===
 
     def _build_media_group(self) -> List[InputMediaPhoto]:
@@ -0,0 +1,98 @@
+"""Быстрое декодирование входящих обновлений Telegram"""
+
+from typing import Any
+
+import msgspec
+from aiogram import Bot
+from aiogram.types import Update
+
+
+RawUpdate = dict[str, Any]
+
+class UpdateHeader(msgspec.Struct):
+    """Минимальная часть обновления, которую можно достать без разбора всего тела"""
+    update_id: int
+
+
+# Переиспользуемые декодеры: msgspec не создаёт парсер заново на каждый запрос
+_decoder = msgspec.json.Decoder(RawUpdate)
+_header_decoder = msgspec.json.Decoder(UpdateHeader)
+
+
+def decode_update(body: bytes) -> RawUpdate:
+    """
+    Декодирует сырое тело webhook-запроса за один проход msgspec
+
+    Args:
+        body: Байты тела запроса от Telegram
+
+    Returns:
+        Словарь с данными обновления
+
+    Raises:
+        msgspec.DecodeError: Если тело не является JSON-объектом
+    """
+    return _decoder.decode(body)
+
+
+def decode_update_id(body: bytes) -> int:
+    """
+    Достаёт update_id из сырого тела, не создавая объекты для остальных полей
+
+    Raises:
+        msgspec.DecodeError: Если тело не является обновлением Telegram
+    """
+    return _header_decoder.decode(body).update_id
+
+
+def build_update(bot: Bot, raw_update: RawUpdate) -> Update:
+    """
+    Строит aiogram Update из декодированного словаря
+
+    Update сразу привязывается к боту через контекст валидации, поэтому
+    dispatcher.feed_update не делает повторный model_dump → model_validate.
+
+    Args:
+        bot: Экземпляр бота
+        raw_update: Декодированное обновление
+
+    Returns:
+        Объект Update, готовый для передачи в диспетчер
+    """
+    return Update.model_validate(raw_update, context={"bot": bot})
+
+
+def get_event_type(raw_update: RawUpdate) -> str | None:
+    """
+    Возвращает тип события обновления (message, callback_query, ...)
+
+    Telegram присылает в обновлении ровно одно поле кроме update_id.
+    """
+    for key in raw_update:
+        if key != "update_id":
+            return key
+    return None
+
+
+def get_routing_key(raw_update: RawUpdate) -> int:
+    """
+    Возвращает ключ упорядочивания обновления: chat_id, иначе user_id, иначе update_id
+
+    Обновления с одинаковым ключом должны обрабатываться строго по порядку.
+    """
+    event_type = get_event_type(raw_update)
+    event = raw_update.get(event_type) if event_type else None
+
+    if isinstance(event, dict):
+        chat = event.get("chat")
+        if chat is None and isinstance(event.get("message"), dict):
+            # callback_query: чат берём из сообщения с кнопкой
+            chat = event["message"].get("chat")
+        if chat:
+            return chat["id"]
+
+        user = event.get("from") or event.get("user")
+        if user:
+            return user["id"]
+
+    return raw_update.get("update_id", 0)
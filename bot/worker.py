@@ -0,0 +1,44 @@
+"""
+Отдельный процесс-обработчик обновлений из Redis Stream (update_mode=stream).
+
+Не поднимает HTTP-сервер и не трогает webhook: только читает стрим через
+consumer group. Таких процессов можно запустить сколько угодно на любых нодах.
+
+Запуск:
+    python bot/worker.py
+"""
+
+import asyncio
+import signal
+
+from loguru import logger
+
+from managers import update_queue, update_stream
+from core import setup_logging
+from core.loader import dispatcher
+from handlers import routers
+from main import start_services, stop_services
+
+
+async def main() -> None:
+    dispatcher.include_routers(*routers)
+
+    await start_services()
+    await update_queue.start()
+    await update_stream.start()
+    logger.info("Stream worker started")
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    await stop_event.wait()
+
+    await stop_services()
+    logger.info("Stream worker stopped")
+
+
+if __name__ == "__main__":
+    setup_logging()
+    asyncio.run(main())
@@ -16,3 +16,37 @@ def event_loop_policy():
     """Set the event loop policy for pytest-asyncio."""
     import asyncio
     return asyncio.DefaultEventLoopPolicy()
+
+
+@pytest.fixture
+async def redis_client():
+    """
+    Redis client for integration tests against a local redis-server.
+
+    Uses TEST_REDIS_URL (default: redis://localhost:6379/15) and skips the test
+    if the server is unreachable. The database is flushed after the test.
+    """
+    from redis.asyncio import Redis
+
+    client = Redis.from_url(os.getenv("TEST_REDIS_URL", "redis://localhost:6379/15"))
+    try:
+        await client.ping()
+    except Exception:
+        await client.aclose()
+        pytest.skip("redis-server is not available")
+
+    await client.flushdb()
+    yield client
+    await client.flushdb()
+    await client.aclose()
+
+
+@pytest.fixture
+async def db():
+    """In-memory SQLite database with the bot models for service tests."""
+    from tortoise import Tortoise
+
+    await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["models"]})
+    await Tortoise.generate_schemas()
+    yield
+    await Tortoise.close_connections()
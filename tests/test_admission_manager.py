@@ -0,0 +1,61 @@
+"""Tests for AdmissionManager (priority load shedding)."""
+
+import pytest
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.metrics import metrics
+from managers.admission_manager import AdmissionManager
+
+
+def make_update(event_type: str, update_id: int = 1) -> dict:
+    return {"update_id": update_id, event_type: {"chat": {"id": 42, "type": "private"}}}
+
+
+class TestAdmissionManager:
+    """Tests for AdmissionManager class."""
+
+    @pytest.fixture
+    def admission(self):
+        return AdmissionManager(enabled=True, soft_depth=10, hard_depth=20, soft_latency=1.0, hard_latency=3.0)
+
+    def test_everything_admitted_without_load(self, admission):
+        for event_type in ("callback_query", "message", "my_chat_member"):
+            assert admission.admit(make_update(event_type), depth=0) is True
+
+    def test_soft_threshold_sheds_low_priority(self, admission):
+        assert admission.admit(make_update("chat_member"), depth=10) is False
+        assert admission.admit(make_update("message"), depth=10) is True
+        assert admission.admit(make_update("callback_query"), depth=10) is True
+
+    def test_hard_threshold_keeps_only_callbacks(self, admission):
+        assert admission.admit(make_update("message"), depth=20) is False
+        assert admission.admit(make_update("callback_query"), depth=1000) is True
+
+    def test_my_chat_member_is_never_shed(self, admission):
+        """Test that block/unblock events survive overload, since is_banned depends on them."""
+        admission.latency = 5.0
+
+        assert admission.admit(make_update("my_chat_member"), depth=1000) is True
+
+    def test_latency_counts_only_with_pending_work(self, admission):
+        admission.latency = 5.0
+
+        assert admission.admit(make_update("message"), depth=1) is False
+        # Без очереди устаревшее среднее не держит бота в перегрузке
+        assert admission.admit(make_update("message"), depth=0) is True
+
+    def test_shed_counted_per_type(self, admission):
+        counter = metrics.counter("update_shed_total", type="chat_member")
+        before = counter.value
+
+        admission.admit(make_update("chat_member"), depth=15)
+
+        assert counter.value == before + 1
+
+    def test_disabled_admits_everything(self):
+        admission = AdmissionManager(enabled=False, soft_depth=0, hard_depth=0)
+
+        assert admission.admit(make_update("my_chat_member"), depth=100) is True
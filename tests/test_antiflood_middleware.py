@@ -0,0 +1,105 @@
+"""Tests for AntiFloodMiddleware (sampled flood logging)."""
+
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from aiogram import Bot, Dispatcher
+from aiogram.methods import AnswerCallbackQuery
+from aiogram.types import Update
+from aiogram_i18n.cores import FluentRuntimeCore
+from aiogram_i18n.managers import BaseManager
+from loguru import logger
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from middlewares.antiflood_middleware import AntiFloodMiddleware
+from middlewares.i18n_middleware import LazyI18nMiddleware
+from middlewares.pipeline import MiddlewarePipeline
+
+
+LOCALES_DIR = Path(__file__).parent.parent / "bot" / "locales"
+
+
+class StaticManager(BaseManager):
+    async def get_locale(self) -> str:
+        return self.default_locale
+
+    async def set_locale(self, locale: str) -> None:
+        ...
+
+
+def make_update(update_id: int, user_id: int = 42) -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 1700000000,
+            "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+            "chat": {"id": user_id, "type": "private"},
+            "text": "spam",
+        },
+    })
+
+
+@pytest.mark.asyncio
+async def test_dropped_updates_are_logged_as_summary():
+    flood = MagicMock(limits={}, check=AsyncMock(return_value=0.5))
+    middleware = AntiFloodMiddleware(flood=flood, log_interval=3600)
+    handler = AsyncMock()
+    lines: list[str] = []
+    sink_id = logger.add(lines.append, level="WARNING")
+
+    try:
+        for idx in range(100):
+            await middleware(handler, make_update(idx, user_id=idx % 2), {})
+        middleware._window_started -= 3600
+        await middleware(handler, make_update(100), {})
+    finally:
+        logger.remove(sink_id)
+
+    handler.assert_not_awaited()
+    assert len(lines) == 1
+    assert "dropped 101 updates from 3 users" in lines[0]
+
+
+@pytest.mark.asyncio
+async def test_callback_warning_is_localized_in_pipeline_order():
+    bot = Bot(token="123456:TEST")
+    bot.session.make_request = AsyncMock()
+    dispatcher = Dispatcher()
+    i18n = LazyI18nMiddleware(
+        core=FluentRuntimeCore(path=LOCALES_DIR / "{locale}", raise_key_error=False),
+        manager=StaticManager(default_locale="ru"),
+        default_locale="ru"
+    )
+    i18n.setup(dispatcher=dispatcher)
+    dispatcher.update.outer_middleware.unregister(i18n)
+    await i18n.core.startup()
+
+    # Тот же порядок добавления, что и в main.register_middlewares
+    pipeline = MiddlewarePipeline()
+    pipeline.add(i18n, name="I18nMiddleware")
+    pipeline.add(AntiFloodMiddleware(flood=MagicMock(limits={}, check=AsyncMock(return_value=2.5))))
+    pipeline.setup(dispatcher)
+
+    @dispatcher.callback_query()
+    async def on_callback(callback):
+        raise AssertionError("flood must be dropped")
+
+    await dispatcher.feed_update(bot, Update.model_validate({
+        "update_id": 1,
+        "callback_query": {
+            "id": "cb1",
+            "chat_instance": "ci",
+            "from": {"id": 42, "is_bot": False, "first_name": "Test"},
+            "data": "press",
+        },
+    }))
+
+    assert pipeline.names == ["I18nMiddleware", "AntiFloodMiddleware"]
+    method = bot.session.make_request.await_args.args[1]
+    assert isinstance(method, AnswerCallbackQuery)
+    assert method.text == "⚠️ Подождите 3 сек. перед повторным нажатием"
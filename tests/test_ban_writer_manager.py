@@ -0,0 +1,118 @@
+"""Tests for BanWriterManager (batched is_banned writes)."""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from aiogram.types import User
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from managers.ban_writer_manager import BanWriterManager
+from managers.user_cache_manager import UserCacheManager
+from models import BotUser
+from services import user_service
+from services.user_service import UserService
+from handlers.private.blocking import user_blocked_bot
+
+
+@pytest.fixture
+def cache():
+    redis = MagicMock()
+    redis.delete = AsyncMock()
+    return UserCacheManager(redis=redis)
+
+
+@pytest.mark.asyncio
+async def test_flush_writes_last_transition_per_user(db, cache):
+    for user_id in (1, 2, 3):
+        await BotUser.create(id=user_id, full_name="Test", language_code="en", is_banned=user_id == 3)
+    writer = BanWriterManager(cache=cache)
+
+    writer.put(1, True)
+    writer.put(2, True)
+    writer.put(2, False)
+    writer.put(3, False)
+
+    assert await writer.flush() == 3
+    banned = dict(await BotUser.all().values_list("id", "is_banned"))
+    assert banned == {1: True, 2: False, 3: False}
+    # Снимки в Redis сбрасываются одним DEL
+    cache.redis.delete.assert_awaited_once_with("user:1:row", "user:2:row", "user:3:row")
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_newer_transitions(cache):
+    writer = BanWriterManager(cache=cache)
+    writer.put(1, True)
+    writer.put(2, True)
+
+    async def update(user_ids, banned):
+        # Пока пачка пишется, пользователь 1 вернулся
+        writer.put(1, False)
+        raise ConnectionError("db down")
+
+    with patch.object(writer, "_update", update):
+        assert await writer.flush() == 0
+
+    assert writer.pending(1) is False
+    assert writer.pending(2) is True
+
+
+@pytest.mark.asyncio
+async def test_blocking_handler_queues_transition(db, cache):
+    await BotUser.create(id=42, full_name="Test", language_code="en")
+    writer = BanWriterManager(cache=cache)
+    event = MagicMock()
+    event.chat.type = "private"
+    event.from_user.id = 42
+
+    with patch.object(user_service, "ban_writer", writer):
+        await writer.start()
+        try:
+            await user_blocked_bot(event)
+            assert writer.pending(42) is True
+        finally:
+            await writer.stop()
+
+    assert (await BotUser.get(id=42)).is_banned is True
+
+
+@pytest.mark.asyncio
+async def test_returning_user_cancels_pending_ban(db, cache):
+    await BotUser.create(id=42, username="test", full_name="Test", language_code="en")
+    cache.redis.get = AsyncMock(return_value=None)
+    cache.redis.set = AsyncMock()
+    writer = BanWriterManager(cache=cache)
+    writer.put(42, True)
+
+    with patch.object(user_service, "ban_writer", writer), patch.object(user_service, "user_cache", cache):
+        await UserService.register_user(User(id=42, is_bot=False, first_name="Test", username="test", language_code="en"))
+
+    assert writer.pending(42) is False
+
+
+@pytest.mark.asyncio
+async def test_user_returning_during_flush_cancels_ban(db, cache):
+    """Test that a ban already moved to the flushing batch is still seen and overridden."""
+    await BotUser.create(id=42, username="test", full_name="Test", language_code="en")
+    cache.redis.get = AsyncMock(return_value=None)
+    cache.redis.set = AsyncMock()
+    writer = BanWriterManager(cache=cache)
+    writer.put(42, True)
+    update = writer._update
+
+    async def slow_update(user_ids, banned):
+        # Пока пачка с блокировкой пишется, пользователь снова пишет боту
+        assert writer.pending(42) is True
+        with patch.object(user_service, "ban_writer", writer), patch.object(user_service, "user_cache", cache):
+            await UserService.register_user(User(id=42, is_bot=False, first_name="Test", username="test", language_code="en"))
+        await update(user_ids, banned)
+
+    with patch.object(writer, "_update", slow_update):
+        await writer.flush()
+    assert writer.pending(42) is False
+
+    await writer.flush()
+    assert (await BotUser.get(id=42)).is_banned is False
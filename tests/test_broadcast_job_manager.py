@@ -0,0 +1,135 @@
+"""Tests for resumable broadcast jobs (BroadcastJobManager, DeliveryLedger)."""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from aiogram import Bot
+from aiogram.types import BufferedInputFile, FSInputFile, InlineKeyboardButton, InlineKeyboardMarkup
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from managers.broadcast_job_manager import BroadcastJobManager, DeliveryLedger
+from services import broadcast_service
+from services.broadcast_service import BroadcastService
+from utils import Template, TemplateError
+
+
+def test_ledger_checkpoint_waits_for_slowest_recipient():
+    ledger = DeliveryLedger()
+    for user_id in (1, 2, 3, 4):
+        assert ledger.begin(user_id)
+
+    ledger.finish(2, "success")
+    ledger.finish(4, "blocked")
+    assert ledger.checkpoint == 0
+    assert ledger.drain() == [2, 4]
+
+    ledger.finish(1, "success")
+    assert ledger.checkpoint == 2
+    ledger.finish(3, "failed")
+    assert ledger.checkpoint == 4
+    # Всё покрыто контрольной точкой — журналу нечего добавлять
+    assert ledger.drain() == []
+    assert ledger.counters == {"success": 2, "failed": 1, "blocked": 1}
+
+
+def test_resumed_ledger_skips_delivered():
+    ledger = DeliveryLedger(checkpoint=2, delivered=[4], counters={"success": 3})
+
+    assert ledger.begin(3)
+    assert not ledger.begin(4)
+    assert ledger.begin(5)
+    ledger.finish(3, "success")
+
+    assert ledger.checkpoint == 4
+    assert ledger.total == 4
+
+
+def test_template_round_trip():
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="Go", url="https://example.com")]])
+    template = Template(text="Hi", photos=["file-id", FSInputFile("/tmp/photo.jpg")], buttons=keyboard)
+
+    restored = Template.from_dict(template.to_dict())
+
+    assert restored.text == "Hi"
+    assert restored.photos[0] == "file-id"
+    assert restored.photos[1].path == "/tmp/photo.jpg"
+    assert restored.buttons == keyboard
+
+    with pytest.raises(TemplateError):
+        Template(photo=BufferedInputFile(b"data", filename="photo.jpg")).to_dict()
+
+
+@pytest.mark.asyncio
+async def test_checkpoint_is_fenced_by_lock(redis_client):
+    first = BroadcastJobManager(redis=redis_client, prefix="broadcast:1")
+    second = BroadcastJobManager(redis=redis_client, prefix="broadcast:1")
+    job = await first.create(template={"text": "Hi"}, params={}, estimated=10)
+    assert await first.claim(job.id)
+    assert not await second.claim(job.id)
+
+    ledger = DeliveryLedger()
+    for user_id in (1, 2, 3):
+        ledger.begin(user_id)
+    ledger.finish(1, "success")
+    ledger.finish(3, "success")
+
+    assert await first.checkpoint(job.id, ledger)
+    assert not await second.checkpoint(job.id, DeliveryLedger(checkpoint=100))
+
+    saved = await first.get(job.id)
+    assert (saved.checkpoint, saved.success) == (1, 2)
+    assert await first.delivered(job.id) == [3]
+    assert await first.active() == [job.id]
+
+
+@pytest.mark.asyncio
+async def test_claim_waits_for_dead_owner_lock(redis_client):
+    dead = BroadcastJobManager(redis=redis_client, prefix="broadcast:1", lock_ttl_ms=200)
+    leader = BroadcastJobManager(redis=redis_client, prefix="broadcast:1", lock_ttl_ms=200)
+    job = await dead.create(template={"text": "Hi"}, params={}, estimated=10)
+    assert await dead.claim(job.id)
+
+    assert not await leader.claim(job.id)
+    # Лок упавшего процесса не продлевается и истекает в пределах ожидания
+    assert await leader.claim(job.id, wait=1)
+    assert not await dead.checkpoint(job.id, DeliveryLedger())
+
+
+@pytest.mark.asyncio
+async def test_run_job_resumes_after_checkpoint(redis_client, db):
+    from models import BotUser
+
+    for user_id in range(1, 7):
+        await BotUser.create(id=user_id, full_name="Test", language_code="en")
+
+    jobs = BroadcastJobManager(redis=redis_client, prefix="broadcast:1")
+    job = await jobs.create(
+        template=Template(text="Hi").to_dict(),
+        params={"exclude_banned": True, "batch_size": 2, "concurrent_limit": 3, "max_rate": 1000, "max_retries": 0}
+    )
+
+    # Прерванный запуск: 1, 2 и 4 отправлены, 3 не завершён
+    assert await jobs.claim(job.id)
+    ledger = DeliveryLedger()
+    for user_id in (1, 2, 3, 4):
+        ledger.begin(user_id)
+    for user_id in (1, 2, 4):
+        ledger.finish(user_id, "success")
+    await jobs.checkpoint(job.id, ledger)
+    await jobs.release(job.id)
+
+    send = AsyncMock()
+    with patch.object(broadcast_service, "broadcast_jobs", jobs), \
+            patch.object(Template, "send", send):
+        stats = await BroadcastService.run_job(MagicMock(spec=Bot), job.id)
+        # Завершённая рассылка повторно не выполняется
+        assert await BroadcastService.run_job(MagicMock(spec=Bot), job.id) is None
+
+    assert sorted(call.args[0] for call in send.call_args_list) == [3, 5, 6]
+    assert stats == {"total": 6, "success": 6, "failed": 0, "blocked": 0}
+    assert (await jobs.get(job.id)).status == "done"
+    assert await jobs.active() == []
+    assert await jobs.delivered(job.id) == []
@@ -0,0 +1,101 @@
+"""Tests for BroadcastLimiterManager (shared broadcast budget in Redis)."""
+
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from managers import broadcast_limiter_manager
+from managers.broadcast_limiter_manager import BroadcastLimiterManager, RateLimiter, SharedRateLimiter
+
+
+@pytest.mark.asyncio
+async def test_processes_share_one_budget(redis_client):
+    # Два менеджера — как два процесса с одним ботом
+    first = BroadcastLimiterManager(redis=redis_client, key="broadcast:1:budget", lease_size=5)
+    second = BroadcastLimiterManager(redis=redis_client, key="broadcast:1:budget", lease_size=5)
+    leases = first._leases.value
+
+    started_at = time.monotonic()
+    await asyncio.gather(*(
+        manager.acquire(rate=50)
+        for manager in (first, second)
+        for _ in range(10)
+    ))
+    elapsed = time.monotonic() - started_at
+
+    # 20 токенов при 50/с арендами по 5: первая сразу, ещё три — через 100 мс каждая
+    assert elapsed >= 0.25
+    assert first._leases.value - leases == 4
+
+
+@pytest.mark.asyncio
+async def test_redis_failure_falls_back_to_local_limiter():
+    redis = MagicMock()
+    redis.register_script.return_value = AsyncMock(side_effect=ConnectionError("down"))
+    manager = BroadcastLimiterManager(redis=redis, key="broadcast:1:budget")
+
+    started_at = time.monotonic()
+    await asyncio.gather(*(manager.acquire(rate=5) for _ in range(6)))
+
+    assert time.monotonic() - started_at >= 0.9
+    # Пока действует fallback, Redis не спрашивают
+    assert redis.register_script.return_value.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_local_limiter_keeps_fractional_rate():
+    limiter = RateLimiter(max_rate=0.5)
+    sleep = AsyncMock()
+
+    with patch.object(broadcast_limiter_manager.asyncio, "sleep", sleep):
+        for _ in range(3):
+            await limiter.acquire()
+
+    # 0.5/s — слот раз в 2 секунды, а не раз в секунду
+    waits = [call.args[0] for call in sleep.await_args_list]
+    assert waits == [pytest.approx(2.0, abs=0.05), pytest.approx(4.0, abs=0.05)]
+
+
+@pytest.mark.asyncio
+async def test_pause_blocks_all_processes(redis_client):
+    first = BroadcastLimiterManager(redis=redis_client, key="broadcast:1:budget", lease_size=5)
+    second = BroadcastLimiterManager(redis=redis_client, key="broadcast:1:budget", lease_size=5)
+    await first.acquire(rate=1000)
+
+    await first.pause(0.3)
+    started_at = time.monotonic()
+    await second.acquire(rate=1000)
+
+    assert first._tokens == 0
+    assert time.monotonic() - started_at >= 0.25
+
+
+class TestAimd:
+    @pytest.fixture
+    def limiter(self):
+        manager = MagicMock(spec=BroadcastLimiterManager)
+        return SharedRateLimiter(manager, max_rate=20)
+
+    @pytest.mark.asyncio
+    async def test_concurrent_429s_decrease_rate_once(self, limiter):
+        await asyncio.gather(*(limiter.on_retry_after(1) for _ in range(10)))
+
+        assert limiter.rate == 10
+        assert limiter.manager.pause.await_count == 10
+
+    def test_rate_recovers_up_to_max(self, limiter):
+        limiter.rate = 10
+
+        for _ in range(10):
+            limiter.on_success()
+        assert 10.9 < limiter.rate < 11
+
+        for _ in range(1000):
+            limiter.on_success()
+        assert limiter.rate == 20
@@ -0,0 +1,131 @@
+"""Tests for BroadcastProgressManager and the /broadcasts route."""
+
+import asyncio
+import os
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import EditMessageText
+from fastapi import FastAPI
+from pydantic import SecretStr
+
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.config import settings
+from managers.broadcast_progress_manager import BroadcastProgressManager
+from routes import broadcasts as broadcasts_module
+
+
+def make_bot() -> MagicMock:
+    bot = MagicMock(spec=Bot)
+    bot.send_message = AsyncMock(return_value=MagicMock(message_id=7))
+    bot.edit_message_text = AsyncMock()
+    return bot
+
+
+def make_manager(bot=None, redis=None, **kwargs) -> BroadcastProgressManager:
+    manager = BroadcastProgressManager(redis=redis or MagicMock(), bot=bot or make_bot(), prefix="broadcast:1:progress", **kwargs)
+    manager.publish = AsyncMock()
+    return manager
+
+
+def test_snapshot_rate_and_eta():
+    progress = make_manager().track("b1", estimated=1000, counters={"success": 100})
+    progress._samples.extend([(0.0, 100), (10.0, 300)])
+    progress.record("success")
+    progress.record("blocked")
+
+    snapshot = progress.snapshot()
+    assert snapshot["processed"] == 102
+    assert snapshot["blocked"] == 1
+    assert snapshot["rate"] == 20.0
+    # (1000 - 102) / 20
+    assert snapshot["eta"] == 45
+
+
+@pytest.mark.asyncio
+async def test_status_edits_are_coalesced():
+    bot = make_bot()
+    manager = make_manager(bot, interval=0.01, status_interval=0.5)
+
+    async with manager.track("b1", estimated=10, chat_id=-100) as progress:
+        for _ in range(5):
+            progress.record("success")
+            await asyncio.sleep(0.02)
+        # Интервал не прошёл — промежуточные снимки не правят сообщение
+        assert bot.edit_message_text.await_count == 0
+        progress._next_edit_at = 0
+        await progress._edit_status()
+        await progress._edit_status()
+        # Текст не изменился — повторной правки нет
+        assert bot.edit_message_text.await_count == 1
+
+    bot.send_message.assert_awaited_once()
+    # Итоговая правка ждёт конца интервала, а не пропускается
+    assert bot.edit_message_text.await_count == 2
+    assert progress.status == "done"
+    assert "✅" in bot.edit_message_text.await_args.kwargs["text"]
+
+
+@pytest.mark.asyncio
+async def test_retry_after_delays_next_edit():
+    bot = make_bot()
+    bot.edit_message_text.side_effect = TelegramRetryAfter(
+        method=EditMessageText(chat_id=-100, message_id=7, text=""), message="Too Many Requests", retry_after=30
+    )
+    progress = make_manager(bot, status_interval=1).track("b1", estimated=10, chat_id=-100)
+    await progress._send_status()
+    progress._next_edit_at = 0
+
+    progress.record("success")
+    await progress._edit_status()
+    progress.record("success")
+    await progress._edit_status()
+
+    assert bot.edit_message_text.await_count == 1
+    assert progress._next_edit_at > time.monotonic() + 20
+
+
+@pytest.mark.asyncio
+async def test_broadcasts_route(redis_client):
+    manager = BroadcastProgressManager(redis=redis_client, bot=make_bot(), prefix="broadcast:1:progress")
+    progress = manager.track("b1", estimated=3)
+    progress.record("success")
+    await manager.publish(progress.snapshot())
+
+    app = FastAPI()
+    app.include_router(broadcasts_module.router)
+    with patch.object(broadcasts_module, "broadcast_progress", manager), \
+            patch.object(settings, "admin_api_token", SecretStr("secret")):
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://test", headers={"X-Admin-Token": "secret"}
+        ) as client:
+            listed = await client.get("/broadcasts")
+            found = await client.get("/broadcasts/b1")
+            missing = await client.get("/broadcasts/b2")
+
+    assert [snapshot["id"] for snapshot in listed.json()] == ["b1"]
+    assert found.json()["success"] == 1
+    assert found.json()["status"] == "running"
+    assert missing.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_broadcasts_route_requires_token():
+    app = FastAPI()
+    app.include_router(broadcasts_module.router)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        with patch.object(settings, "admin_api_token", None):
+            disabled = await client.get("/broadcasts", headers={"X-Admin-Token": "secret"})
+        with patch.object(settings, "admin_api_token", SecretStr("secret")):
+            missing = await client.get("/broadcasts")
+            wrong = await client.get("/broadcasts/b1", headers={"X-Admin-Token": "guess"})
+
+    assert disabled.status_code == 404
+    assert missing.status_code == 401
+    assert wrong.status_code == 401
@@ -135,22 +135,14 @@ class TestBroadcastService:
             message="Forbidden: bot was blocked by the user"
         )
 
-        # Create mock user object
-        mock_user = MagicMock()
-        mock_user.is_banned = False
-        mock_user.save = AsyncMock()
-
         result = await BroadcastService._send_to_user(
             mock_template,
             user_id=12345,
-            rate_limiter=mock_rate_limiter,
-            user_obj=mock_user
+            rate_limiter=mock_rate_limiter
         )
 
         assert result['status'] == 'blocked'
         assert result['user_id'] == 12345
-        assert mock_user.is_banned is True
-        mock_user.save.assert_called_once()
 
     @pytest.mark.asyncio
     async def test_send_to_user_retry_after(self, mock_template, mock_rate_limiter):
@@ -170,6 +162,28 @@ class TestBroadcastService:
         assert result['status'] == 'failed'
         assert result['user_id'] == 12345
 
+    @pytest.mark.asyncio
+    async def test_send_to_user_retries_after_flood_control(self, mock_template, mock_rate_limiter):
+        """Test that the user is retried after the broadcast pauses for retry_after."""
+        mock_template.send.side_effect = [
+            TelegramRetryAfter(
+                method="sendMessage",
+                message="Too Many Requests: retry after 3",
+                retry_after=3
+            ),
+            None
+        ]
+
+        result = await BroadcastService._send_to_user(
+            mock_template,
+            user_id=12345,
+            rate_limiter=mock_rate_limiter
+        )
+
+        assert result['status'] == 'success'
+        mock_rate_limiter.on_retry_after.assert_awaited_once_with(3)
+        assert mock_rate_limiter.acquire.call_count == 2
+
     @pytest.mark.asyncio
     async def test_send_to_user_bad_request(self, mock_template, mock_rate_limiter):
         """Test handling of bad request errors."""
@@ -252,17 +266,68 @@ class TestBroadcastService:
 
         mock_template.send.side_effect = mock_send
 
+        with patch('bot.services.broadcast_service.UserService.set_user_banned', AsyncMock()) as set_user_banned:
+            stats = await BroadcastService.broadcast_to_users(
+                bot=mock_bot,
+                user_ids=user_ids,
+                template=mock_template,
+                max_rate=100
+            )
+
+        assert stats['total'] == 4
+        assert stats['success'] == 2  # Users 1 and 3
+        assert stats['blocked'] == 1  # User 2
+        assert stats['failed'] == 1   # User 4
+        # Заблокировавший бота выпадает из следующих рассылок
+        set_user_banned.assert_awaited_once_with(2, True)
+
+    @pytest.mark.asyncio
+    async def test_broadcast_to_users_reads_ids_lazily(self, mock_bot, mock_template):
+        """Test that a generator of ids is consumed only as workers free up."""
+        read = 0
+        max_ahead = 0
+
+        def user_ids():
+            nonlocal read
+            for user_id in range(1, 201):
+                read += 1
+                yield user_id
+
+        async def send(user_id):
+            nonlocal max_ahead
+            max_ahead = max(max_ahead, read - mock_template.send.await_count)
+            await asyncio.sleep(0)
+
+        mock_template.send.side_effect = send
+
         stats = await BroadcastService.broadcast_to_users(
             bot=mock_bot,
-            user_ids=user_ids,
+            user_ids=user_ids(),
+            template=mock_template,
+            concurrent_limit=5,
+            max_rate=10_000
+        )
+
+        assert stats == {"total": 200, "success": 200, "failed": 0, "blocked": 0}
+        # Впереди отправок — не больше очереди и отправителей, а не весь список
+        assert max_ahead <= 5 + 5 + 1
+
+    @pytest.mark.asyncio
+    async def test_broadcast_to_users_accepts_async_iterator(self, mock_bot, mock_template):
+        """Test broadcast over an async iterator of ids (e.g. SSCAN results)."""
+        async def user_ids():
+            for user_id in (b"1", b"2", b"3"):
+                yield user_id
+
+        stats = await BroadcastService.broadcast_to_users(
+            bot=mock_bot,
+            user_ids=user_ids(),
             template=mock_template,
             max_rate=100
         )
 
-        assert stats['total'] == 4
-        assert stats['success'] == 2  # Users 1 and 3
-        assert stats['blocked'] == 1  # User 2
-        assert stats['failed'] == 1   # User 4
+        assert stats['total'] == 3
+        assert sorted(call.args[0] for call in mock_template.send.call_args_list) == [1, 2, 3]
 
     @pytest.mark.asyncio
     @patch('bot.services.broadcast_service.BotUser')
@@ -273,7 +338,7 @@ class TestBroadcastService:
         mock_query.count = AsyncMock(return_value=0)
         mock_query.order_by = MagicMock(return_value=mock_query)
         mock_query.limit = MagicMock(return_value=mock_query)
-        mock_query.all = AsyncMock(return_value=[])
+        mock_query.values_list = AsyncMock(return_value=[])
 
         mock_bot_user.all = MagicMock(return_value=mock_query)
 
@@ -291,23 +356,14 @@ class TestBroadcastService:
     @patch('bot.services.broadcast_service.BotUser')
     async def test_broadcast_template_with_users(self, mock_bot_user, mock_bot, mock_template):
         """Test broadcast_template with users in database."""
-        # Create mock users
-        mock_users = []
-        for i in range(1, 6):
-            user = MagicMock()
-            user.id = i
-            user.is_banned = False
-            user.save = AsyncMock()
-            mock_users.append(user)
-
         mock_query = MagicMock()
         mock_query.filter = MagicMock(return_value=mock_query)
         mock_query.count = AsyncMock(return_value=5)
         mock_query.order_by = MagicMock(return_value=mock_query)
         mock_query.limit = MagicMock(return_value=mock_query)
 
-        # First call returns all users, second call returns empty (pagination)
-        mock_query.all = AsyncMock(side_effect=[mock_users, []])
+        # First call returns all user ids, second call returns empty (pagination)
+        mock_query.values_list = AsyncMock(side_effect=[[1, 2, 3, 4, 5], []])
 
         mock_bot_user.all = MagicMock(return_value=mock_query)
 
@@ -331,7 +387,7 @@ class TestBroadcastService:
         mock_query.count = AsyncMock(return_value=3)
         mock_query.order_by = MagicMock(return_value=mock_query)
         mock_query.limit = MagicMock(return_value=mock_query)
-        mock_query.all = AsyncMock(return_value=[])
+        mock_query.values_list = AsyncMock(return_value=[])
 
         mock_bot_user.all = MagicMock(return_value=mock_query)
 
@@ -348,14 +404,8 @@ class TestBroadcastService:
     @patch('bot.services.broadcast_service.BotUser')
     async def test_broadcast_template_batching(self, mock_bot_user, mock_bot, mock_template):
         """Test that broadcast_template processes users in batches."""
-        # Create 250 mock users
-        all_users = []
-        for i in range(1, 251):
-            user = MagicMock()
-            user.id = i
-            user.is_banned = False
-            user.save = AsyncMock()
-            all_users.append(user)
+        # 250 user ids
+        all_users = list(range(1, 251))
 
         mock_query = MagicMock()
         mock_query.filter = MagicMock(return_value=mock_query)
@@ -368,7 +418,7 @@ class TestBroadcastService:
         batch2 = all_users[100:200]
         batch3 = all_users[200:]
 
-        mock_query.all = AsyncMock(side_effect=[batch1, batch2, batch3, []])
+        mock_query.values_list = AsyncMock(side_effect=[batch1, batch2, batch3, []])
         mock_bot_user.all = MagicMock(return_value=mock_query)
 
         stats = await BroadcastService.broadcast_template(
@@ -380,8 +430,72 @@ class TestBroadcastService:
 
         assert stats['total'] == 250
         assert stats['success'] == 250
-        # Verify query.all() was called multiple times for batching
-        assert mock_query.all.call_count == 4  # 3 batches + 1 empty
+        # Verify query.values_list() was called multiple times for batching
+        assert mock_query.values_list.call_count == 4  # 3 batches + 1 empty
+
+    @pytest.mark.asyncio
+    @patch('bot.services.broadcast_service.BotUser')
+    async def test_broadcast_template_prefetches_while_sending(self, mock_bot_user, mock_bot, mock_template):
+        """Test that a slow send does not hold back fetching and sending the next page."""
+        events = []
+        pages = [[1, 2], [3], []]
+
+        async def fetch_page(*args, **kwargs):
+            events.append("fetch")
+            return pages.pop(0)
+
+        async def send(user_id):
+            if user_id == 1:
+                await asyncio.sleep(0.2)
+            events.append(f"sent:{user_id}")
+
+        mock_query = MagicMock()
+        mock_query.filter = MagicMock(return_value=mock_query)
+        mock_query.count = AsyncMock(return_value=3)
+        mock_query.order_by = MagicMock(return_value=mock_query)
+        mock_query.limit = MagicMock(return_value=mock_query)
+        mock_query.values_list = AsyncMock(side_effect=fetch_page)
+        mock_bot_user.all = MagicMock(return_value=mock_query)
+        mock_template.send.side_effect = send
+
+        stats = await BroadcastService.broadcast_template(
+            bot=mock_bot,
+            template=mock_template,
+            batch_size=2,
+            max_rate=1000
+        )
+
+        assert stats['success'] == 3
+        # Пользователь со второй страницы отправлен раньше медленного с первой
+        assert events.index("sent:3") < events.index("sent:1")
+
+    @pytest.mark.asyncio
+    async def test_broadcast_template_streams_active_ids(self, db, mock_bot, mock_template):
+        """Test id-only streaming against a real database and banning blocked users."""
+        from models import BotUser
+
+        for user_id in range(1, 8):
+            await BotUser.create(
+                id=user_id, full_name="Test", language_code="en", is_banned=user_id in (2, 5)
+            )
+
+        async def send(user_id):
+            if user_id == 4:
+                raise TelegramForbiddenError(method="sendMessage", message="Bot was blocked")
+
+        mock_template.send.side_effect = send
+
+        stats = await BroadcastService.broadcast_template(
+            bot=mock_bot,
+            template=mock_template,
+            batch_size=2,
+            max_rate=1000
+        )
+
+        sent_to = [call.args[0] for call in mock_template.send.call_args_list]
+        assert sorted(sent_to) == [1, 3, 4, 6, 7]
+        assert stats == {"total": 5, "success": 4, "failed": 0, "blocked": 1}
+        assert (await BotUser.get(id=4)).is_banned is True
 
     @pytest.mark.asyncio
     async def test_broadcast_respects_concurrent_limit(self, mock_bot, mock_template):
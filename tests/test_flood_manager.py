@@ -0,0 +1,162 @@
+"""Tests for FloodManager (GCRA rate limiter in Redis)."""
+
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+from aiogram.types import Update
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from managers.flood_manager import FloodManager
+
+
+LIMITS = {"message": (1.0, 3), "callback": (1.0, 1), "chat": (1.0, 2)}
+
+
+def make_message(update_id: int, user_id: int = 42, chat_id: int = 42, chat_type: str = "private") -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 1700000000,
+            "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+            "chat": {"id": chat_id, "type": chat_type},
+            "text": "hello",
+        },
+    })
+
+
+def make_callback(update_id: int, user_id: int = 42) -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "chat_instance": "1",
+            "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+            "data": "button",
+        },
+    })
+
+
+class _NoScriptRedis:
+    def register_script(self, script):
+        return None
+
+
+class TestScopes:
+    def test_private_message_has_only_user_scope(self):
+        flood = FloodManager(redis=_NoScriptRedis(), limits=LIMITS)
+
+        keys, args = flood.scopes(make_message(1))
+
+        assert keys == ["flood:42:message"]
+        assert args == [1000, 3]
+
+    def test_group_message_adds_chat_scope(self):
+        flood = FloodManager(redis=_NoScriptRedis(), limits=LIMITS)
+
+        keys, args = flood.scopes(make_message(1, chat_id=-100, chat_type="supergroup"))
+
+        assert keys == ["flood:42:message", "flood:chat:-100"]
+        assert args == [1000, 3, 1000, 2]
+
+    def test_callback_has_own_scope(self):
+        flood = FloodManager(redis=_NoScriptRedis(), limits=LIMITS)
+
+        keys, _ = flood.scopes(make_callback(1))
+
+        assert keys == ["flood:42:callback"]
+
+
+class TestLocalFilter:
+    def test_rejected_keys_are_blocked_locally(self):
+        flood = FloodManager(redis=_NoScriptRedis(), limits=LIMITS)
+        keys, args = flood.scopes(make_message(1))
+
+        flood.record(keys, args, retry_after=0.5)
+
+        assert 0 < flood.precheck(keys, args) <= 0.5
+
+    def test_chat_rejection_does_not_block_private_messages(self):
+        flood = FloodManager(redis=_NoScriptRedis(), limits=LIMITS)
+        group_keys, group_args = flood.scopes(make_message(1, chat_id=-100, chat_type="group"))
+        keys, args = flood.scopes(make_message(2))
+
+        flood.record(group_keys, group_args, retry_after=0.5)
+
+        assert flood.precheck(keys, args) == 0
+
+    def test_window_rejects_only_after_burst(self):
+        flood = FloodManager(redis=_NoScriptRedis(), limits=LIMITS)
+        keys, args = flood.scopes(make_message(1))
+
+        for _ in range(3):
+            assert flood.precheck(keys, args) == 0
+            flood.record(keys, args, retry_after=0)
+
+        assert 0 < flood.precheck(keys, args) <= 1
+
+    def test_disabled_filter_always_asks_redis(self):
+        flood = FloodManager(redis=_NoScriptRedis(), limits=LIMITS, local_size=0)
+        keys, args = flood.scopes(make_message(1))
+
+        flood.record(keys, args, retry_after=0.5)
+
+        assert flood.precheck(keys, args) == 0
+
+
+@pytest.mark.asyncio
+async def test_local_filter_skips_redis_while_flooding(redis_client):
+    flood = FloodManager(redis=redis_client, limits=LIMITS)
+    script = flood._script
+
+    async def call_script(**kwargs):
+        return await script(**kwargs)
+
+    flood._script = AsyncMock(side_effect=call_script)
+
+    results = [await flood.check(make_message(idx)) for idx in range(100)]
+
+    assert results[:3] == [0, 0, 0]
+    assert all(retry_after > 0 for retry_after in results[3:])
+    # Три разрешённых действия заполнили окно — дальше Redis не нужен
+    assert flood._script.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_burst_then_retry_after(redis_client):
+    flood = FloodManager(redis=redis_client, limits=LIMITS, local_size=0)
+
+    results = [await flood.check(make_message(idx)) for idx in range(4)]
+
+    assert results[:3] == [0, 0, 0]
+    assert 0 < results[3] <= 1
+    # Хранится одно целое число — TAT в миллисекундах
+    assert int(await redis_client.get("flood:42:message")) > 0
+
+
+@pytest.mark.asyncio
+async def test_chat_scope_is_shared_by_members(redis_client):
+    flood = FloodManager(redis=redis_client, limits=LIMITS, local_size=0)
+
+    results = [
+        await flood.check(make_message(idx, user_id=idx, chat_id=-100, chat_type="group"))
+        for idx in range(1, 4)
+    ]
+
+    assert results[:2] == [0, 0]
+    assert results[2] > 0
+    # Отклонённое действие не засчитывается пользователю
+    assert await redis_client.get("flood:3:message") is None
+
+
+@pytest.mark.asyncio
+async def test_concurrent_updates_are_atomic(redis_client):
+    flood = FloodManager(redis=redis_client, limits=LIMITS, local_size=0)
+
+    results = await asyncio.gather(*(flood.check(make_callback(idx)) for idx in range(10)))
+
+    assert sum(1 for retry_after in results if retry_after == 0) == 1
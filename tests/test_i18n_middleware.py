@@ -0,0 +1,103 @@
+"""Tests for LazyI18nMiddleware (locale resolved only for handlers using i18n)."""
+
+from pathlib import Path
+
+import pytest
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.types import Update
+from aiogram_i18n import I18nContext
+from aiogram_i18n.cores import FluentRuntimeCore
+from aiogram_i18n.managers import BaseManager
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.metrics import metrics
+from middlewares.i18n_middleware import LazyI18nContext, LazyI18nMiddleware
+
+
+LOCALES_DIR = Path(__file__).parent.parent / "bot" / "locales"
+
+
+class CountingManager(BaseManager):
+    def __init__(self) -> None:
+        super().__init__(default_locale="en")
+        self.calls = 0
+
+    async def get_locale(self) -> str:
+        self.calls += 1
+        return "ru"
+
+    async def set_locale(self, locale: str) -> None:
+        ...
+
+
+def make_update() -> Update:
+    return Update.model_validate({
+        "update_id": 1,
+        "message": {
+            "message_id": 1,
+            "date": 1700000000,
+            "from": {"id": 42, "is_bot": False, "first_name": "Test"},
+            "chat": {"id": 42, "type": "private"},
+            "text": "hello",
+        },
+    })
+
+
+async def dispatch(middleware: LazyI18nMiddleware, callback) -> list:
+    """Outer middleware -> inner resolve_for_handler -> хендлер, как в диспетчере"""
+    results = []
+    handler_object = HandlerObject(callback=callback)
+
+    async def handler(event, data):
+        results.append(await handler_object.call(event, **data))
+
+    async def routed(event, data):
+        data["handler"] = handler_object
+        return await middleware.resolve_for_handler(handler, event, data)
+
+    await middleware(routed, make_update(), {})
+    return results
+
+
+@pytest.fixture
+def middleware():
+    return LazyI18nMiddleware(
+        core=FluentRuntimeCore(path=LOCALES_DIR / "{locale}", raise_key_error=False),
+        manager=CountingManager(),
+        default_locale="en"
+    )
+
+
+@pytest.mark.asyncio
+async def test_handler_without_i18n_skips_lookup(middleware):
+    skipped = metrics.counter("i18n_locale_total", resolved="false").value
+
+    async def on_member(event):
+        return "ok"
+
+    assert await dispatch(middleware, on_member) == ["ok"]
+    assert middleware.manager.calls == 0
+    assert metrics.counter("i18n_locale_total", resolved="false").value == skipped + 1
+
+
+@pytest.mark.asyncio
+async def test_handler_with_i18n_resolves_once(middleware):
+    async def on_start(event, i18n: I18nContext):
+        await i18n.resolve()
+        return i18n.locale
+
+    assert await dispatch(middleware, on_start) == ["ru"]
+    assert middleware.manager.calls == 1
+
+
+def test_unresolved_locale_uses_preamble_without_lookup(middleware):
+    preamble = type("Preamble", (), {"locale": "ru"})()
+    context = LazyI18nContext(
+        core=middleware.core, manager=middleware.manager, event=make_update(), data={"preamble": preamble}
+    )
+
+    assert context.locale == "ru"
+    assert not context.resolved
@@ -0,0 +1,71 @@
+"""Integration tests for LeaderManager (require a running redis-server)."""
+
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+from aiogram import Bot
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from managers.leader_manager import LeaderManager
+
+
+@pytest.fixture
+def bot():
+    return Bot(token="123456:TEST")
+
+
+@pytest.mark.asyncio
+async def test_only_one_process_becomes_leader(redis_client, bot):
+    first = LeaderManager(redis_client, bot)
+    second = LeaderManager(redis_client, bot)
+
+    assert await first.acquire() is True
+    assert await second.acquire() is False
+
+    await first.release()
+    await second.release()
+
+
+@pytest.mark.asyncio
+async def test_release_hands_over_leadership(redis_client, bot):
+    first = LeaderManager(redis_client, bot)
+    second = LeaderManager(redis_client, bot)
+
+    await first.acquire()
+    await second.release()  # follower must not drop someone else's lock
+    assert await redis_client.exists(first.key) == 1
+
+    await first.release()
+    assert await second.acquire() is True
+
+    await second.release()
+
+
+@pytest.mark.asyncio
+async def test_follower_takes_over_after_leader_dies(redis_client, bot):
+    """Test that a follower keeps retrying and runs the leader work once the lock expires."""
+    first = LeaderManager(redis_client, bot, ttl_ms=300)
+    second = LeaderManager(redis_client, bot, ttl_ms=300)
+    on_elected = AsyncMock()
+
+    assert await first.acquire() is True
+    assert await second.acquire(on_elected=on_elected) is False
+    on_elected.assert_not_called()
+
+    # Лидер "упал": лок больше не продлевается, но и не снят
+    first._task.cancel()
+    await asyncio.gather(first._task, return_exceptions=True)
+    first._task = None
+    for _ in range(50):
+        if second.is_leader:
+            break
+        await asyncio.sleep(0.05)
+
+    assert second.is_leader is True
+    on_elected.assert_awaited_once()
+
+    await second.release()
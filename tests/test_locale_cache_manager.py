@@ -0,0 +1,73 @@
+"""Tests for LocaleCacheManager."""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from managers.locale_cache_manager import LocaleCacheManager
+
+
+@pytest.fixture
+def cache():
+    redis = MagicMock()
+    redis.publish = AsyncMock()
+    cache = LocaleCacheManager(redis=redis, channel="locale:test")
+    cache._subscribed = True
+    return cache
+
+
+class TestLocalCache:
+    """Tests for the in-process tier."""
+
+    def test_hit_after_set(self, cache):
+        cache.set(1, "en", cache.epoch)
+
+        assert cache.get(1) == "en"
+        assert cache.get(2) is None
+
+    def test_not_used_without_subscription(self, cache):
+        cache._subscribed = False
+        cache.set(1, "en", cache.epoch)
+
+        assert cache.get(1) is None
+
+    @pytest.mark.asyncio
+    async def test_stale_read_is_not_cached(self, cache):
+        """Test that a value read before an invalidation does not land after it."""
+        epoch = cache.epoch
+        await cache.invalidate(1)
+        cache.set(1, "ru", epoch)
+
+        assert cache.get(1) is None
+        cache.redis.publish.assert_awaited_once()
+
+    def test_size_is_bounded(self, cache):
+        cache.max_size = 10
+        for user_id in range(100):
+            cache.set(user_id, "en", cache.epoch)
+
+        assert len(cache._local) == 10
+        assert cache.get(99) == "en"
+
+
+@pytest.mark.asyncio
+async def test_invalidation_reaches_other_process(redis_client):
+    first = LocaleCacheManager(redis=redis_client, channel="locale:test")
+    second = LocaleCacheManager(redis=redis_client, channel="locale:test")
+    await first.start()
+    await second.start()
+    await asyncio.sleep(0.05)
+
+    second.set(1, "ru", second.epoch)
+    await first.invalidate(1)
+    await asyncio.sleep(0.05)
+
+    assert second.get(1) is None
+
+    await first.stop()
+    await second.stop()
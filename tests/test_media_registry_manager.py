@@ -0,0 +1,137 @@
+"""Tests for MediaRegistryManager and Template file_id substitution."""
+
+import os
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import SendPhoto
+from aiogram.types import BufferedInputFile, FSInputFile
+
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from managers.media_registry_manager import MediaRegistryManager
+from utils import Template
+
+
+class DictRegistry:
+    """Реестр в памяти с интерфейсом MediaRegistryManager"""
+
+    def __init__(self) -> None:
+        self.manager = MediaRegistryManager(redis=MagicMock(), prefix="media:1")
+        self.file_ids: dict[str, str] = {}
+
+    async def resolve(self, items):
+        return [self.file_ids.get(self.manager.key(media, kind)) for media, kind in items]
+
+    async def remember(self, items):
+        for media, kind, file_id in items:
+            self.file_ids[self.manager.key(media, kind)] = file_id
+
+
+def sent_photo(file_id: str) -> MagicMock:
+    message = MagicMock()
+    message.photo = [MagicMock(file_id=f"{file_id}-small"), MagicMock(file_id=file_id)]
+    return message
+
+
+@pytest.fixture
+def registry():
+    registry = DictRegistry()
+    Template.use_media_registry(registry)
+    yield registry
+    Template.use_media_registry(None)
+
+
+def test_keys_follow_media_source(tmp_path):
+    manager = MediaRegistryManager(redis=MagicMock(), prefix="media:1")
+    path = tmp_path / "photo.jpg"
+    path.write_bytes(b"v1")
+
+    key = manager.key(FSInputFile(path), "photo")
+    assert key.startswith("media:1:photo:")
+    assert manager.key(FSInputFile(path), "photo") == key
+    assert manager.key(FSInputFile(path), "document") != key
+    os.utime(path, ns=(0, 1))
+    assert manager.key(FSInputFile(path), "photo") != key
+
+    assert manager.key(BufferedInputFile(b"data", "a.jpg"), "photo") == manager.key(BufferedInputFile(b"data", "b.jpg"), "photo")
+    assert manager.key("https://example.com/a.jpg", "photo") is not None
+    # Строка без схемы — уже file_id
+    assert manager.key("AgACAgIAAx", "photo") is None
+
+
+@pytest.mark.asyncio
+async def test_second_send_uses_cached_file_id(registry, tmp_path):
+    path = tmp_path / "photo.jpg"
+    path.write_bytes(b"image")
+    bot = MagicMock(spec=Bot)
+    bot.send_photo = AsyncMock(return_value=sent_photo("AgAC1"))
+    template = Template(bot_instance=bot, text="Hi", photo=FSInputFile(path))
+
+    await template.send(1)
+    await template.send(2)
+
+    first, second = bot.send_photo.await_args_list
+    assert isinstance(first.kwargs["photo"], FSInputFile)
+    assert second.kwargs["photo"] == "AgAC1"
+
+
+@pytest.mark.asyncio
+async def test_only_file_id_errors_trigger_reupload(registry, tmp_path):
+    path = tmp_path / "photo.jpg"
+    path.write_bytes(b"image")
+    bot = MagicMock(spec=Bot)
+    bot.send_photo = AsyncMock(return_value=sent_photo("AgAC1"))
+    template = Template(bot_instance=bot, text="Hi", photo=FSInputFile(path))
+    await template.send(1)
+
+    method = SendPhoto(chat_id=2, photo="AgAC1")
+    bot.send_photo.side_effect = TelegramBadRequest(method=method, message="Bad Request: message caption is too long")
+    with pytest.raises(TelegramBadRequest):
+        await template.send(2)
+    # Ошибка не про file_id — файл повторно не загружается
+    assert bot.send_photo.await_count == 2
+
+    bot.send_photo.side_effect = [
+        TelegramBadRequest(method=method, message="Bad Request: wrong file identifier/HTTP URL specified"),
+        sent_photo("AgAC2"),
+    ]
+    await template.send(2)
+
+    assert isinstance(bot.send_photo.await_args.kwargs["photo"], FSInputFile)
+    assert registry.file_ids[registry.manager.key(template.photo, "photo")] == "AgAC2"
+
+
+@pytest.mark.asyncio
+async def test_upload_preloads_album(registry):
+    bot = MagicMock(spec=Bot)
+    bot.send_media_group = AsyncMock(return_value=[sent_photo("AgAC1"), sent_photo("AgAC2")])
+    bot.delete_messages = AsyncMock()
+    photos = [BufferedInputFile(b"one", "1.jpg"), "https://example.com/2.jpg"]
+    template = Template(bot_instance=bot, text="Album", photos=photos)
+
+    uploaded = await template.upload(-100)
+
+    assert uploaded.photos == ["AgAC1", "AgAC2"]
+    assert uploaded.text == "Album"
+    assert not uploaded.has_uploads
+    bot.delete_messages.assert_awaited_once()
+    # Исходный шаблон тоже отправляется по file_id
+    await template.send(1)
+    assert [media.media for media in bot.send_media_group.await_args.kwargs["media"]] == ["AgAC1", "AgAC2"]
+
+
+@pytest.mark.asyncio
+async def test_registry_round_trip(redis_client):
+    manager = MediaRegistryManager(redis=redis_client, prefix="media:1")
+    url = "https://example.com/a.jpg"
+
+    assert await manager.resolve([(url, "photo"), ("AgAC", "photo")]) == [None, None]
+    await manager.remember([(url, "photo", "AgAC1")])
+
+    # Другой процесс — пустой LRU, file_id берётся из Redis
+    other = MediaRegistryManager(redis=redis_client, prefix="media:1")
+    assert await other.resolve([(url, "photo")]) == ["AgAC1"]
@@ -0,0 +1,38 @@
+"""Tests for the /metrics route."""
+
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from pydantic import SecretStr
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.config import settings
+from routes import metrics as metrics_module
+
+
+@pytest.fixture
+def app():
+    application = FastAPI()
+    application.include_router(metrics_module.router)
+    return application
+
+
+@pytest.mark.asyncio
+async def test_metrics_require_admin_token(app):
+    """Test that metrics are hidden from the public webhook app without the token."""
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        with patch.object(settings, "admin_api_token", None):
+            disabled = await client.get("/metrics")
+        with patch.object(settings, "admin_api_token", SecretStr("secret")):
+            missing = await client.get("/metrics")
+            allowed = await client.get("/metrics", headers={"X-Admin-Token": "secret"})
+
+    assert disabled.status_code == 404
+    assert missing.status_code == 401
+    assert allowed.status_code == 200
+    assert isinstance(allowed.json(), dict)
@@ -0,0 +1,102 @@
+"""Tests for MiddlewarePipeline (cost-ordered outer middlewares)."""
+
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+from aiogram import Dispatcher
+from aiogram.types import Update
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.metrics import metrics
+from middlewares.pipeline import MiddlewareCost, MiddlewarePipeline, TimedMiddleware, UpdateTypeMiddleware
+
+
+def make_update(update_id: int = 1) -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 1700000000,
+            "from": {"id": 42, "is_bot": False, "first_name": "Test"},
+            "chat": {"id": 42, "type": "private"},
+            "text": "hello",
+        },
+    })
+
+
+class Stage:
+    def __init__(self, cost: MiddlewareCost, calls: list[str], name: str, reject: bool = False) -> None:
+        self.cost = cost
+        self.calls = calls
+        self.name = name
+        self.reject = reject
+
+    async def __call__(self, handler, event, data):
+        self.calls.append(self.name)
+        if not self.reject:
+            return await handler(event, data)
+
+
+async def run_chain(dispatcher: Dispatcher, update: Update) -> AsyncMock:
+    handler = AsyncMock()
+    # Встроенные middleware диспетчера требуют бота — прогоняем только звенья pipeline
+    stages = [middleware for middleware in dispatcher.update.outer_middleware if isinstance(middleware, TimedMiddleware)]
+    chain = dispatcher.update.outer_middleware.wrap_middlewares(stages, lambda event, data: handler(event, data))
+    await chain(update, {})
+    return handler
+
+
+def test_stages_are_ordered_by_cost_then_insertion():
+    calls: list[str] = []
+    pipeline = MiddlewarePipeline()
+    pipeline.add(Stage(MiddlewareCost.DATABASE, calls, "db"), name="db")
+    pipeline.add(Stage(MiddlewareCost.REDIS, calls, "preamble"), name="preamble")
+    pipeline.add(Stage(MiddlewareCost.REDIS, calls, "flood"), name="flood")
+    pipeline.add(Stage(MiddlewareCost.LOCAL, calls, "types"), name="types")
+
+    assert pipeline.names == ["types", "preamble", "flood", "db"]
+
+
+@pytest.mark.asyncio
+async def test_rejected_update_skips_expensive_stages():
+    calls: list[str] = []
+    dispatcher = Dispatcher()
+    pipeline = MiddlewarePipeline()
+    pipeline.add(Stage(MiddlewareCost.DATABASE, calls, "db"), name="pipeline_test_db")
+    pipeline.add(Stage(MiddlewareCost.REDIS, calls, "flood", reject=True), name="pipeline_test_flood")
+    pipeline.setup(dispatcher)
+
+    handler = await run_chain(dispatcher, make_update())
+
+    assert calls == ["flood"]
+    handler.assert_not_awaited()
+    assert metrics.counter("middleware_rejected_total", middleware="pipeline_test_flood").value == 1
+    assert metrics.histogram("middleware_seconds", middleware="pipeline_test_flood").count == 1
+    assert metrics.histogram("middleware_seconds", middleware="pipeline_test_db").count == 0
+
+
+@pytest.mark.asyncio
+async def test_timing_excludes_next_stages():
+    async def slow_handler(event, data):
+        await asyncio.sleep(0.05)
+
+    timed = TimedMiddleware(Stage(MiddlewareCost.LOCAL, [], "fast"), "pipeline_test_fast")
+
+    await timed(slow_handler, make_update(), {})
+
+    assert metrics.histogram("middleware_seconds", middleware="pipeline_test_fast").max < 0.05
+
+
+@pytest.mark.asyncio
+async def test_unused_update_types_are_dropped():
+    handler = AsyncMock()
+
+    await UpdateTypeMiddleware(allowed=["callback_query"])(handler, make_update(), {})
+    handler.assert_not_awaited()
+
+    await UpdateTypeMiddleware(allowed=["message"])(handler, make_update(), {})
+    handler.assert_awaited_once()
@@ -0,0 +1,78 @@
+"""Tests for PreambleMiddleware (single-EVALSHA Redis preamble)."""
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from aiogram.types import Update
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from managers.flood_manager import FloodManager
+from middlewares.preamble_middleware import PreambleMiddleware
+
+
+def make_update(update_id: int = 1, user_id: int = 42) -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 1700000000,
+            "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+            "chat": {"id": user_id, "type": "private"},
+            "text": "hello",
+        },
+    })
+
+
+async def run(middleware: PreambleMiddleware, update: Update) -> dict:
+    data = {"event_from_user": update.message.from_user}
+    handler = AsyncMock()
+    await middleware(handler, update, data)
+    handler.assert_awaited_once()
+    return data
+
+
+@pytest.mark.asyncio
+async def test_flood_check_and_reads_in_one_call(redis_client):
+    await redis_client.set("user:42:locale", "en")
+    flood = FloodManager(redis=redis_client, limits={"message": (0.1, 1), "chat": (0.1, 1)})
+    middleware = PreambleMiddleware(redis=redis_client, flood=flood)
+
+    first = (await run(middleware, make_update(1)))["preamble"]
+    second = (await run(middleware, make_update(2)))["preamble"]
+
+    assert first.flood_retry_after == 0
+    assert first.locale == "en"
+    assert first.user_row is None
+    assert 0 < second.flood_retry_after <= 10
+    assert await redis_client.pttl("flood:42:message") > 0
+
+
+@pytest.mark.asyncio
+async def test_local_flood_reject_skips_redis():
+    redis = MagicMock()
+    script = redis.register_script.return_value = AsyncMock()
+    flood = MagicMock(scopes=MagicMock(return_value=(["flood:42:message"], [1000, 1])))
+    flood.precheck.return_value = 0.5
+    middleware = PreambleMiddleware(redis=redis, flood=flood)
+
+    data = await run(middleware, make_update())
+
+    assert data["preamble"].flood_retry_after == 0.5
+    script.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_redis_error_falls_back_to_middlewares():
+    redis = MagicMock()
+    redis.register_script.return_value = AsyncMock(side_effect=ConnectionError("down"))
+    middleware = PreambleMiddleware(redis=redis, flood=MagicMock(
+        scopes=MagicMock(return_value=([], [])),
+        precheck=MagicMock(return_value=0)
+    ))
+
+    data = await run(middleware, make_update())
+
+    assert "preamble" not in data
@@ -0,0 +1,95 @@
+"""Tests for UpdateDedupManager."""
+
+import pytest
+from aiogram import Bot
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from managers.update_dedup_manager import UpdateDedupManager
+
+
+@pytest.fixture
+def bot():
+    return Bot(token="123456:TEST")
+
+
+class TestLocalWindow:
+    """Tests for the in-process fast path."""
+
+    @pytest.mark.asyncio
+    async def test_first_delivery_is_not_duplicate(self, bot):
+        dedup = UpdateDedupManager(redis=None, bot=bot)
+
+        assert await dedup.is_duplicate(1) is False
+        assert await dedup.is_duplicate(1) is True
+        assert await dedup.is_duplicate(2) is False
+
+    @pytest.mark.asyncio
+    async def test_window_is_bounded(self, bot):
+        """Test that old ids are evicted so memory stays bounded."""
+        dedup = UpdateDedupManager(redis=None, bot=bot, window=100)
+
+        for update_id in range(1000):
+            await dedup.is_duplicate(update_id)
+
+        assert len(dedup._seen) == 100
+        assert await dedup.is_duplicate(999) is True
+        assert await dedup.is_duplicate(0) is False
+
+    @pytest.mark.asyncio
+    async def test_forgotten_update_is_not_duplicate(self, bot):
+        dedup = UpdateDedupManager(redis=None, bot=bot)
+
+        await dedup.is_duplicate(1)
+        await dedup.forget(1)
+
+        assert await dedup.is_duplicate(1) is False
+        assert await dedup.is_duplicate(1) is True
+
+    @pytest.mark.asyncio
+    async def test_disabled_never_reports_duplicates(self, bot):
+        dedup = UpdateDedupManager(redis=None, bot=bot, enabled=False)
+
+        assert await dedup.is_duplicate(1) is False
+        assert await dedup.is_duplicate(1) is False
+
+
+@pytest.mark.integration
+class TestRedisBitmap:
+    """Tests for the shared Redis bitmap (require a local redis-server)."""
+
+    @pytest.mark.asyncio
+    async def test_duplicate_seen_by_another_node(self, redis_client, bot):
+        """Test that a redelivery to a different node is caught through Redis."""
+        node_a = UpdateDedupManager(redis=redis_client, bot=bot)
+        node_b = UpdateDedupManager(redis=redis_client, bot=bot)
+
+        assert await node_a.is_duplicate(123456789) is False
+        assert await node_b.is_duplicate(123456789) is True
+        assert await node_b.is_duplicate(123456790) is False
+
+    @pytest.mark.asyncio
+    async def test_forget_clears_shared_bit(self, redis_client, bot):
+        """Test that a failed handoff on one node lets another node take the retry."""
+        node_a = UpdateDedupManager(redis=redis_client, bot=bot)
+        node_b = UpdateDedupManager(redis=redis_client, bot=bot)
+
+        await node_a.is_duplicate(42)
+        await node_a.forget(42)
+
+        assert await node_b.is_duplicate(42) is False
+
+    @pytest.mark.asyncio
+    async def test_chunks_expire(self, redis_client, bot):
+        dedup = UpdateDedupManager(redis=redis_client, bot=bot, ttl=60)
+
+        await dedup.is_duplicate(5)
+
+        key = f"dedup:{bot.id}:0"
+        assert 0 < await redis_client.ttl(key) <= 60
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
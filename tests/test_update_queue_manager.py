@@ -0,0 +1,174 @@
+"""Tests for UpdateQueueManager (per-chat update lanes)."""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from aiogram import Bot, Dispatcher
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from managers.update_queue_manager import UpdateQueueManager
+
+
+def make_raw_update(update_id: int, chat_id: int = 42) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 1700000000,
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Test"},
+            "chat": {"id": chat_id, "type": "private"},
+            "text": "hello",
+        },
+    }
+
+
+class TestUpdateQueueManager:
+    """Tests for UpdateQueueManager class."""
+
+    @pytest.fixture
+    def bot(self):
+        return Bot(token="123456:TEST")
+
+    @pytest.fixture
+    def mock_dispatcher(self):
+        dispatcher = MagicMock(spec=Dispatcher)
+        dispatcher.feed_update = AsyncMock(return_value=None)
+        dispatcher.silent_call_request = AsyncMock()
+        return dispatcher
+
+    @pytest.mark.asyncio
+    async def test_workers_feed_all_updates(self, bot, mock_dispatcher):
+        """Test that every queued update reaches the dispatcher."""
+        manager = UpdateQueueManager(mock_dispatcher, bot, lanes=3, lane_size=10)
+        await manager.start()
+
+        for update_id in range(1, 21):
+            await manager.put(make_raw_update(update_id, chat_id=update_id))
+
+        await manager.stop(timeout=5)
+
+        fed_ids = sorted(call.args[1].update_id for call in mock_dispatcher.feed_update.call_args_list)
+        assert fed_ids == list(range(1, 21))
+        assert not manager.running
+
+    @pytest.mark.asyncio
+    async def test_same_chat_is_processed_in_order(self, bot, mock_dispatcher):
+        """Test that updates of one chat never overlap and keep their order."""
+        processed = []
+        in_flight = set()
+
+        async def slow_feed(bot, update):
+            chat_id = update.message.chat.id
+            assert chat_id not in in_flight
+            in_flight.add(chat_id)
+            await asyncio.sleep(0.005)
+            in_flight.discard(chat_id)
+            processed.append((chat_id, update.update_id))
+
+        mock_dispatcher.feed_update.side_effect = slow_feed
+        manager = UpdateQueueManager(mock_dispatcher, bot, lanes=4, lane_size=100)
+        await manager.start()
+
+        for update_id in range(30):
+            await manager.put(make_raw_update(update_id, chat_id=100 + update_id % 3))
+
+        await manager.stop(timeout=5)
+
+        assert len(processed) == 30
+        for chat_id in (100, 101, 102):
+            chat_updates = [update_id for cid, update_id in processed if cid == chat_id]
+            assert chat_updates == sorted(chat_updates)
+
+    @pytest.mark.asyncio
+    async def test_different_lanes_run_in_parallel(self, bot, mock_dispatcher):
+        """Test that a slow chat does not block other lanes."""
+        release = asyncio.Event()
+        fast_done = asyncio.Event()
+
+        async def feed(bot, update):
+            if update.message.chat.id == 0:
+                await release.wait()
+            else:
+                fast_done.set()
+
+        mock_dispatcher.feed_update.side_effect = feed
+        manager = UpdateQueueManager(mock_dispatcher, bot, lanes=2, lane_size=10)
+        await manager.start()
+
+        await manager.put(make_raw_update(1, chat_id=0))
+        await manager.put(make_raw_update(2, chat_id=1))
+
+        await asyncio.wait_for(fast_done.wait(), timeout=1)
+        release.set()
+        await manager.stop(timeout=5)
+
+    @pytest.mark.asyncio
+    async def test_put_future_reports_result(self, bot, mock_dispatcher):
+        """Test that the returned future resolves with the processing outcome."""
+        mock_dispatcher.feed_update.side_effect = [RuntimeError("boom"), None]
+        manager = UpdateQueueManager(mock_dispatcher, bot, lanes=1, lane_size=10)
+        await manager.start()
+
+        failed = await manager.put(make_raw_update(1))
+        succeeded = await manager.put(make_raw_update(2))
+
+        assert await failed is False
+        assert await succeeded is True
+        await manager.stop(timeout=5)
+
+    @pytest.mark.asyncio
+    async def test_put_blocks_when_lane_full(self, bot, mock_dispatcher):
+        """Test that the bounded lane applies backpressure when no worker is running."""
+        manager = UpdateQueueManager(mock_dispatcher, bot, lanes=1, lane_size=1)
+
+        await manager.put(make_raw_update(1))
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(manager.put(make_raw_update(2)), timeout=0.05)
+
+
+    @pytest.mark.asyncio
+    async def test_shed_update_is_not_queued(self, bot, mock_dispatcher):
+        """Test that an update rejected by admission resolves without processing."""
+        from managers.admission_manager import AdmissionManager
+
+        admission = AdmissionManager(enabled=True, soft_depth=0, hard_depth=0)
+        manager = UpdateQueueManager(mock_dispatcher, bot, lanes=1, lane_size=10, admission=admission)
+
+        done = await manager.put(make_raw_update(1))
+
+        assert done.done() and done.result() is True
+        assert manager.qsize() == 0
+
+    @pytest.mark.asyncio
+    async def test_my_chat_member_is_processed_under_overload(self, bot, mock_dispatcher):
+        """Test that a block/unblock event is queued and processed even at the hard threshold."""
+        from managers.admission_manager import AdmissionManager
+
+        admission = AdmissionManager(enabled=True, soft_depth=0, hard_depth=0)
+        manager = UpdateQueueManager(mock_dispatcher, bot, lanes=1, lane_size=10, admission=admission)
+        await manager.start()
+
+        done = await manager.put({
+            "update_id": 1,
+            "my_chat_member": {
+                "chat": {"id": 42, "type": "private"},
+                "from": {"id": 42, "is_bot": False, "first_name": "Test"},
+                "date": 1700000000,
+                "old_chat_member": {"status": "member", "user": {"id": 1, "is_bot": True, "first_name": "Bot"}},
+                "new_chat_member": {
+                    "status": "kicked", "until_date": 0, "user": {"id": 1, "is_bot": True, "first_name": "Bot"}
+                },
+            },
+        })
+        assert await asyncio.wait_for(done, timeout=1) is True
+        await manager.stop(timeout=1)
+
+        mock_dispatcher.feed_update.assert_called_once()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,182 @@
+"""Integration tests for UpdateStreamManager (require a local redis-server)."""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import msgspec
+import pytest
+from aiogram import Bot, Dispatcher
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from managers.update_queue_manager import UpdateQueueManager
+from managers.update_stream_manager import UpdateStreamManager
+
+
+pytestmark = pytest.mark.integration
+
+
+def make_body(update_id: int, chat_id: int = 42) -> bytes:
+    return msgspec.json.encode({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 1700000000,
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Test"},
+            "chat": {"id": chat_id, "type": "private"},
+            "text": "hello",
+        },
+    })
+
+
+class TestUpdateStreamManager:
+    """Tests for UpdateStreamManager class."""
+
+    @pytest.fixture
+    def bot(self):
+        return Bot(token="123456:TEST")
+
+    @pytest.fixture
+    def mock_dispatcher(self):
+        dispatcher = MagicMock(spec=Dispatcher)
+        dispatcher.feed_update = AsyncMock(return_value=None)
+        dispatcher.silent_call_request = AsyncMock()
+        return dispatcher
+
+    @pytest.fixture
+    async def scheduler(self, mock_dispatcher, bot):
+        scheduler = UpdateQueueManager(mock_dispatcher, bot, lanes=2, lane_size=10)
+        await scheduler.start()
+        yield scheduler
+        await scheduler.stop(timeout=1)
+
+    @pytest.fixture
+    def manager(self, redis_client, scheduler, bot):
+        return UpdateStreamManager(
+            redis=redis_client,
+            scheduler=scheduler,
+            bot=bot,
+            consumers=2,
+            block_ms=50,
+            claim_idle_ms=10,
+            max_deliveries=3
+        )
+
+    @pytest.mark.asyncio
+    async def test_published_updates_are_processed_and_acked(self, manager, mock_dispatcher, redis_client):
+        """Test that consumers process every entry and leave nothing pending."""
+        await manager.ensure_group()
+        for update_id in range(1, 6):
+            await manager.publish(make_body(update_id))
+
+        await manager.start()
+        for _ in range(100):
+            if mock_dispatcher.feed_update.call_count == 5:
+                break
+            await asyncio.sleep(0.02)
+        await manager.stop(timeout=1)
+
+        fed_ids = sorted(call.args[1].update_id for call in mock_dispatcher.feed_update.call_args_list)
+        assert fed_ids == [1, 2, 3, 4, 5]
+        summary = await redis_client.xpending(manager.stream_key, manager.group)
+        assert summary["pending"] == 0
+
+    @pytest.mark.asyncio
+    async def test_slow_chat_does_not_delay_other_acks(self, manager, mock_dispatcher, redis_client):
+        """Test that an entry is acked as soon as its lane finishes, not with the whole batch."""
+        release = asyncio.Event()
+
+        async def feed_update(bot, update):
+            if update.message.chat.id == 42:
+                await release.wait()
+
+        mock_dispatcher.feed_update.side_effect = feed_update
+        await manager.ensure_group()
+        # Чаты 42 и 43 попадают в разные дорожки
+        await manager.publish(make_body(1, chat_id=42))
+        await manager.publish(make_body(2, chat_id=43))
+
+        await manager.start()
+        pending = None
+        for _ in range(100):
+            pending = (await redis_client.xpending(manager.stream_key, manager.group))["pending"]
+            if mock_dispatcher.feed_update.call_count == 2 and pending == 1:
+                break
+            await asyncio.sleep(0.02)
+
+        assert pending == 1
+        release.set()
+        await manager.stop(timeout=1)
+        summary = await redis_client.xpending(manager.stream_key, manager.group)
+        assert summary["pending"] == 0
+
+    @pytest.mark.asyncio
+    async def test_stale_entries_are_claimed(self, manager, mock_dispatcher, redis_client):
+        """Test that entries read by a crashed consumer are reclaimed and processed."""
+        await manager.ensure_group()
+        await manager.publish(make_body(1))
+
+        # "Упавший" воркер прочитал запись, но не подтвердил её
+        await redis_client.xreadgroup(manager.group, "crashed", {manager.stream_key: ">"})
+        await asyncio.sleep(0.02)
+
+        claimed = await manager.claim_stale("survivor")
+
+        assert claimed == 1
+        mock_dispatcher.feed_update.assert_called_once()
+        summary = await redis_client.xpending(manager.stream_key, manager.group)
+        assert summary["pending"] == 0
+
+    @pytest.mark.asyncio
+    async def test_own_inflight_entries_are_not_claimed(self, manager, mock_dispatcher, redis_client):
+        """Test that entries still queued in this process's lanes are not claimed again."""
+        release = asyncio.Event()
+
+        async def feed_update(bot, update):
+            await release.wait()
+
+        mock_dispatcher.feed_update.side_effect = feed_update
+        await manager.ensure_group()
+        # Один чат — одна дорожка: вторая запись ждёт первую
+        await manager.publish(make_body(1))
+        await manager.publish(make_body(2))
+
+        await manager.start()
+        for _ in range(100):
+            if mock_dispatcher.feed_update.call_count == 1 and len(manager._owned) == 2:
+                break
+            await asyncio.sleep(0.02)
+        # Обе записи простаивают дольше claim_idle_ms
+        await asyncio.sleep(0.05)
+
+        assert await asyncio.wait_for(manager.claim_stale("claimer"), timeout=1) == 0
+        release.set()
+        await manager.stop(timeout=1)
+
+        fed_ids = [call.args[1].update_id for call in mock_dispatcher.feed_update.call_args_list]
+        assert fed_ids == [1, 2]
+        summary = await redis_client.xpending(manager.stream_key, manager.group)
+        assert summary["pending"] == 0
+        assert not manager._owned
+
+    @pytest.mark.asyncio
+    async def test_failed_entry_moves_to_dead_stream(self, manager, mock_dispatcher, redis_client):
+        """Test that an entry exceeding max_deliveries ends up in the dead stream."""
+        mock_dispatcher.feed_update.side_effect = RuntimeError("boom")
+        await manager.ensure_group()
+        await manager.publish(make_body(1))
+
+        await redis_client.xreadgroup(manager.group, "crashed", {manager.stream_key: ">"})
+        for _ in range(manager.max_deliveries):
+            await asyncio.sleep(0.02)
+            await manager.claim_stale("survivor")
+
+        assert await redis_client.xlen(manager.dead_key) == 1
+        summary = await redis_client.xpending(manager.stream_key, manager.group)
+        assert summary["pending"] == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
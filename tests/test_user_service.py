@@ -0,0 +1,172 @@
+"""Tests for cached user registration in UserService."""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from aiogram.types import User
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from managers.user_cache_manager import UserCacheManager
+from managers.user_writer_manager import UserWriteError, UserWriterManager
+from models import BotUser
+from services import user_service
+from services.user_service import UserService
+
+
+def make_user(**overrides) -> User:
+    fields = {"id": 42, "is_bot": False, "first_name": "Test", "username": "test", "language_code": "en"}
+    fields.update(overrides)
+    return User(**fields)
+
+
+@pytest.fixture
+def cache():
+    redis = MagicMock()
+    redis.get = AsyncMock(return_value=None)
+    redis.set = AsyncMock()
+    redis.delete = AsyncMock()
+    cache = UserCacheManager(redis=redis)
+    with patch.object(user_service, "user_cache", cache):
+        yield cache
+
+
+class TestRegisterUser:
+    """Tests for UserService.register_user."""
+
+    @pytest.mark.asyncio
+    async def test_unchanged_user_skips_database(self, db, cache):
+        first = await UserService.register_user(make_user())
+
+        with patch.object(BotUser, "get_or_none", AsyncMock()) as get_or_none, \
+                patch.object(BotUser, "save", AsyncMock()) as save:
+            second = await UserService.register_user(make_user())
+
+        assert UserCacheManager.fingerprint_of(second) == UserCacheManager.fingerprint_of(first)
+        get_or_none.assert_not_called()
+        save.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_cached_user_is_a_copy_per_call(self, db, cache):
+        """Test that concurrent handlers never share a mutable cached instance."""
+        await UserService.register_user(make_user())
+
+        first = await cache.get(42)
+        first.is_banned = True
+        second = await cache.get(42)
+
+        assert second is not first
+        assert second.is_banned is False
+
+    @pytest.mark.asyncio
+    async def test_only_changed_columns_written(self, db, cache):
+        await UserService.register_user(make_user())
+
+        with patch.object(BotUser, "save", AsyncMock()) as save:
+            bot_user = await UserService.register_user(make_user(username="renamed"))
+
+        save.assert_awaited_once_with(update_fields=["username", "updated_at"])
+        assert bot_user.username == "renamed"
+
+    @pytest.mark.asyncio
+    async def test_changes_reach_database(self, db, cache):
+        await UserService.register_user(make_user())
+        await UserService.set_user_banned(42, True)
+
+        await UserService.register_user(make_user(first_name="New"))
+
+        stored = await BotUser.get(id=42)
+        assert stored.full_name == "New"
+        assert stored.is_banned is False
+
+    @pytest.mark.asyncio
+    async def test_cache_miss_loads_from_database(self, db, cache):
+        await BotUser.create(id=42, username="test", full_name="Test", language_code="en")
+
+        bot_user = await UserService.register_user(make_user())
+
+        assert bot_user.id == 42
+        cache.redis.set.assert_awaited_once()
+
+
+class TestWriteBehind:
+    """Tests for registration through the write-behind buffer."""
+
+    @pytest.fixture
+    async def writer(self, cache):
+        writer = UserWriterManager(cache=cache, interval=60, batch_size=100)
+        await writer.start()
+        with patch.object(user_service, "user_writer", writer):
+            yield writer
+        await writer.stop()
+
+    @pytest.mark.asyncio
+    async def test_new_users_written_in_one_flush(self, db, writer):
+        for user_id in range(1, 4):
+            await UserService.register_user(make_user(id=user_id))
+
+        assert await BotUser.all().count() == 0
+        # До записи сервис видит пользователя из буфера
+        assert (await UserService.get_user(2)).username == "test"
+
+        assert await writer.flush() == 3
+        assert await BotUser.all().count() == 3
+
+    @pytest.mark.asyncio
+    async def test_upsert_updates_only_changed_columns(self, db, writer):
+        await BotUser.create(id=42, username="test", full_name="Test", language_code="en", is_banned=True)
+
+        await UserService.register_user(make_user(username="renamed"))
+        # Изменение в БД в обход буфера не должно затереться
+        await BotUser.filter(id=42).update(full_name="Edited")
+        await writer.flush()
+
+        stored = await BotUser.get(id=42)
+        assert stored.username == "renamed"
+        assert stored.is_banned is False
+        assert stored.full_name == "Edited"
+
+    @pytest.mark.asyncio
+    async def test_stop_flushes_pending_users(self, db, writer):
+        await UserService.register_user(make_user())
+
+        await writer.stop()
+
+        assert await BotUser.filter(id=42).exists()
+
+    @pytest.mark.asyncio
+    async def test_buffer_is_bounded_while_database_is_down(self, db, cache):
+        """Test that a full buffer rejects new rows instead of growing after a failed flush."""
+        writer = UserWriterManager(cache=cache, interval=60, batch_size=100, max_pending=2)
+        for user_id in (1, 2):
+            await writer.put(BotUser(id=user_id, full_name="Test", language_code="en"))
+
+        with patch.object(BotUser, "bulk_create", AsyncMock(side_effect=ConnectionError("db is down"))) as bulk_create:
+            with pytest.raises(UserWriteError):
+                await writer.put(BotUser(id=3, full_name="Test", language_code="en"))
+            # Повторная попытка ждёт паузы, а не бьётся в БД на каждый put()
+            with pytest.raises(UserWriteError):
+                await writer.put(BotUser(id=4, full_name="Test", language_code="en"))
+
+        assert bulk_create.await_count == 1
+        assert sorted(writer._pending) == [1, 2]
+        # Изменение уже ждущей строки не растит буфер и принимается
+        await writer.put(BotUser(id=1, full_name="Renamed", language_code="en"), ["full_name"])
+        assert writer.get(1).full_name == "Renamed"
+
+
+@pytest.mark.asyncio
+async def test_redis_snapshot_restores_user(redis_client, db):
+    """Test that another process can rebuild BotUser from the Redis snapshot."""
+    writer = UserCacheManager(redis=redis_client)
+    reader = UserCacheManager(redis=redis_client)
+    bot_user = await BotUser.create(id=7, username=None, full_name="Seven", language_code="ru")
+
+    await writer.set(bot_user)
+    restored = await reader.get(7)
+
+    assert restored is not None
+    assert UserCacheManager.fingerprint_of(restored) == UserCacheManager.fingerprint_of(bot_user)
+    assert restored.created_at == bot_user.created_at
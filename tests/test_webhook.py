@@ -0,0 +1,228 @@
+"""Tests for the webhook ingestion route."""
+
+from unittest.mock import AsyncMock, patch
+from urllib.parse import parse_qs
+
+import httpx
+import msgspec
+import pytest
+from aiogram import Bot, Dispatcher
+from aiogram.filters import CommandStart
+from aiogram.methods import SendMessage
+from aiogram.types import ErrorEvent, Message, Update
+from fastapi import FastAPI
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.config import settings
+from managers.update_dedup_manager import UpdateDedupManager
+from middlewares.webhook_reply_middleware import (
+    WebhookReplyErrorsMiddleware, WebhookReplyMiddleware, render_webhook_reply
+)
+from routes import webhook as webhook_module
+
+
+SAMPLE_UPDATE = {
+    "update_id": 1,
+    "message": {
+        "message_id": 10,
+        "date": 1700000000,
+        "from": {"id": 42, "is_bot": False, "first_name": "Test"},
+        "chat": {"id": 42, "type": "private"},
+        "text": "/start",
+    },
+}
+
+
+@pytest.fixture
+def app():
+    """FastAPI app with the webhook router mounted."""
+    application = FastAPI()
+    application.include_router(webhook_module.router)
+    return application
+
+
+@pytest.fixture(autouse=True)
+def local_dedup():
+    """Replace the Redis-backed dedup stage with an in-process one."""
+    from aiogram import Bot
+
+    dedup = UpdateDedupManager(redis=None, bot=Bot(token="123456:TEST"))
+    with patch.object(webhook_module, "update_dedup", dedup):
+        yield dedup
+
+
+@pytest.fixture
+def webhook_path():
+    return f"/{settings.bot_token.get_secret_value()}"
+
+
+class TestWebhookEndpoint:
+    """Tests for webhook_endpoint."""
+
+    @pytest.mark.asyncio
+    async def test_valid_update_is_fed_to_dispatcher(self, app, webhook_path):
+        """Test that a valid body is decoded once and fed as a bound Update."""
+        with patch.object(webhook_module, "dispatcher") as mock_dispatcher:
+            mock_dispatcher.feed_webhook_update = AsyncMock()
+
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                response = await client.post(webhook_path, content=msgspec.json.encode(SAMPLE_UPDATE))
+
+        assert response.status_code == 200
+        mock_dispatcher.feed_webhook_update.assert_called_once()
+        fed_bot, fed_update = mock_dispatcher.feed_webhook_update.call_args.args
+        assert isinstance(fed_update, Update)
+        assert fed_update.update_id == 1
+        assert fed_update.bot is fed_bot
+
+    @pytest.mark.asyncio
+    async def test_malformed_body_returns_400(self, app, webhook_path):
+        """Test that a malformed body is rejected without touching the dispatcher."""
+        with patch.object(webhook_module, "dispatcher") as mock_dispatcher:
+            mock_dispatcher.feed_webhook_update = AsyncMock()
+
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                response = await client.post(webhook_path, content=b"not json")
+
+        assert response.status_code == 400
+        mock_dispatcher.feed_webhook_update.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_redelivered_update_is_acked_without_dispatch(self, app, webhook_path):
+        """Test that a second delivery of the same update_id is not dispatched."""
+        with patch.object(webhook_module, "dispatcher") as mock_dispatcher:
+            mock_dispatcher.feed_webhook_update = AsyncMock()
+
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                body = msgspec.json.encode(SAMPLE_UPDATE)
+                first = await client.post(webhook_path, content=body)
+                second = await client.post(webhook_path, content=body)
+
+        assert first.status_code == 200
+        assert second.status_code == 200
+        mock_dispatcher.feed_webhook_update.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_failed_handoff_is_retried(self, app, webhook_path):
+        """Test that a delivery whose XADD failed is processed when Telegram retries it."""
+        publish = AsyncMock(side_effect=[ConnectionError("redis is down"), None])
+        with patch.object(settings, "update_mode", "stream"), \
+                patch.object(webhook_module.update_stream, "publish", publish):
+            transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                body = msgspec.json.encode(SAMPLE_UPDATE)
+                first = await client.post(webhook_path, content=body)
+                second = await client.post(webhook_path, content=body)
+
+        assert first.status_code == 500
+        assert second.status_code == 200
+        assert publish.await_count == 2
+
+
+class TestWebhookReply:
+    """Tests for answering with a Bot API call in the webhook response body."""
+
+    @pytest.fixture
+    def reply_bot(self):
+        bot = Bot(token="123456:TEST")
+        bot.session.make_request = AsyncMock()
+        bot.session.middleware(WebhookReplyMiddleware())
+        return bot
+
+    async def post_update(self, app, webhook_path, reply_bot, dispatcher):
+        with patch.object(webhook_module, "dispatcher", dispatcher), \
+                patch.object(webhook_module, "bot", reply_bot):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.post(webhook_path, content=msgspec.json.encode(SAMPLE_UPDATE))
+
+    @pytest.mark.asyncio
+    async def test_first_call_is_returned_in_response(self, app, webhook_path, reply_bot):
+        """Test that a single reply goes into the webhook response instead of the network."""
+        dispatcher = Dispatcher()
+
+        @dispatcher.message(CommandStart())
+        async def start(message: Message):
+            result = await message.answer("hi")
+            assert result.message_id == 0
+
+        response = await self.post_update(app, webhook_path, reply_bot, dispatcher)
+
+        assert response.status_code == 200
+        body = parse_qs(response.text)
+        assert body["method"] == ["sendMessage"]
+        assert body["chat_id"] == ["42"]
+        assert body["text"] == ["hi"]
+        reply_bot.session.make_request.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_second_call_flushes_captured_in_order(self, app, webhook_path, reply_bot):
+        """Test that a second send makes the captured call go out first."""
+        dispatcher = Dispatcher()
+
+        @dispatcher.message(CommandStart())
+        async def start(message: Message):
+            await message.answer("first")
+            await message.answer("second")
+
+        response = await self.post_update(app, webhook_path, reply_bot, dispatcher)
+
+        assert response.status_code == 200
+        assert response.content == b""
+        sent = [call.args[1].text for call in reply_bot.session.make_request.call_args_list]
+        assert sent == ["first", "second"]
+
+    @pytest.mark.asyncio
+    async def test_handler_returned_method_is_used_as_response(self, app, webhook_path, reply_bot):
+        """Test that a TelegramMethod returned by the handler is sent as the response."""
+        dispatcher = Dispatcher()
+
+        @dispatcher.message(CommandStart())
+        async def start(message: Message):
+            return message.answer("returned")
+
+        response = await self.post_update(app, webhook_path, reply_bot, dispatcher)
+
+        assert parse_qs(response.text)["text"] == ["returned"]
+        reply_bot.session.make_request.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_error_handler_sends_are_not_captured(self, app, webhook_path, reply_bot):
+        """Test that a send from an errors handler goes over the network, not into the response."""
+        dispatcher = Dispatcher()
+        dispatcher.errors.outer_middleware(WebhookReplyErrorsMiddleware())
+
+        @dispatcher.message(CommandStart())
+        async def start(message: Message):
+            raise RuntimeError("boom")
+
+        @dispatcher.errors()
+        async def on_error(event: ErrorEvent, bot: Bot):
+            await bot.send_message(chat_id=-100, text="error report")
+
+        response = await self.post_update(app, webhook_path, reply_bot, dispatcher)
+
+        assert response.status_code == 200
+        assert response.content == b""
+        sent = reply_bot.session.make_request.call_args_list
+        assert [call.args[1].text for call in sent] == ["error report"]
+
+    def test_falsy_values_are_kept(self, reply_bot):
+        """Test that empty strings and False are serialized instead of being dropped."""
+        method = SendMessage(chat_id=42, text="", disable_notification=False)
+
+        body = parse_qs(render_webhook_reply(reply_bot, method).decode(), keep_blank_values=True)
+
+        assert body["text"] == [""]
+        assert body["disable_notification"] == ["false"]
+        assert "reply_markup" not in body
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])